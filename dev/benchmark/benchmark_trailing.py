@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: dev/benchmark/benchmark_trailing.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+#
+# Benchmark of the per-tick hot path of `BinanceTrailingStopLossManager` with an in-process stub of the exchange:
+#
+#   - `ticks_no_change`: `process_price_feed_stream()` with prices that never move the stop/loss order
+#   - `ticks_trailing`: `process_price_feed_stream()` with a rising price that moves the stop/loss price every tick,
+#                       the order worker thread is running
+#   - `tick_to_order`: Latency from the arrival of a tick until the cancel-replace request carrying its stop/loss price
+#                      leaves the process
+#   - `frames_unicornfy`: Raw aggTrade frames converted with UnicornFy and passed to `process_price_feed_stream()`, the
+#                         default price feed (skipped if `unicorn_fy` is not installed)
+#   - `frames_raw`: The same frames passed to `process_raw_price_feed_stream()` of `raw_price_feed=True`
+#
+# Each scenario reports ticks/sec, p50/p99/p999 in microseconds, the peak memory and the memory retained per tick. The
+# source build (a temporary copy of the `.py` files) and the Cython build (`python setup.py build_ext --inplace`) are
+# measured in separate processes and compared:
+#
+#   $ python setup.py build_ext --inplace
+#   $ python dev/benchmark/benchmark_trailing.py --ticks 200000 --output benchmark.json
+#
+# A valid UNICORN Binance Suite license is needed like for every other use of the manager.
+
+import argparse
+import gc
+import glob
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+PACKAGE_NAME = "unicorn_binance_trailing_stop_loss"
+
+
+class BenchmarkRestApi(object):
+    """
+    In-process stub of the `BinanceRestApiManager` methods used on the hot path. It records the time and the price of
+    every cancel-replace request, which the manager sends as signed `POST order/cancelReplace` via `_post()`.
+    """
+    def __init__(self):
+        self.order_id = 1
+        self.requests: list = []
+
+    def _post(self, path: str = None, signed: bool = False, **kwargs) -> dict:
+        params = kwargs['data']
+        self.requests.append((time.perf_counter_ns(), params['price']))
+        self.order_id += 1
+        return {'cancelResult': "SUCCESS",
+                'newOrderResult': "SUCCESS",
+                'newOrderResponse': {'symbol': params['symbol'], 'orderId': self.order_id}}
+
+    def get_used_weight(self, cached: bool = False) -> dict:
+        return {}
+
+    def stop_manager(self) -> bool:
+        return True
+
+
+class BenchmarkWebSocketApi(object):
+    """
+    In-process stub of the `BinanceWebSocketApiManager`, the ticks are passed directly to the manager.
+    """
+    def stop_manager(self) -> bool:
+        return True
+
+
+def create_manager(stop_loss_price: float = None, raw_price_feed: bool = False):
+    """
+    Create a manager that trails an already placed stop/loss order via cancel-replace against the stubs.
+    """
+    from unicorn_binance_trailing_stop_loss.manager import BinanceTrailingStopLossManager
+    from unicorn_binance_trailing_stop_loss.rate_limit_scheduler import RateLimitScheduler
+    manager = BinanceTrailingStopLossManager(api_key="benchmark",
+                                             api_secret="benchmark",
+                                             exchange="binance.com",
+                                             market="BTCUSDT",
+                                             raw_price_feed=raw_price_feed,
+                                             start_engine=False,
+                                             stop_loss_limit="0.5%",
+                                             stop_loss_price=stop_loss_price,
+                                             ubra_manager=BenchmarkRestApi(),
+                                             ubwa_manager=BenchmarkWebSocketApi(),
+                                             warn_on_update=False)
+    manager.rate_limit_scheduler = RateLimitScheduler(rate_limits=[{'rateLimitType': "ORDERS",
+                                                                    'interval': "SECOND",
+                                                                    'intervalNum': 1,
+                                                                    'limit': 10 ** 9}])
+    manager.stop_loss_order_id = 1
+    manager.stop_loss_quantity = 1.0
+    return manager
+
+
+def get_percentiles(durations_ns: list = None) -> dict:
+    """
+    Get p50, p99 and p999 of a list of durations in nanoseconds as microseconds.
+    """
+    durations_ns = sorted(durations_ns)
+    if not durations_ns:
+        return {'p50_us': None, 'p99_us': None, 'p999_us': None}
+    return {f"{name}_us": durations_ns[min(len(durations_ns) - 1, int(quantile * len(durations_ns)))] / 1000
+            for name, quantile in (("p50", 0.5), ("p99", 0.99), ("p999", 0.999))}
+
+
+def measure_ticks(manager=None,
+                  prices: list = None,
+                  memory_prices: list = None) -> dict:
+    """
+    Feed the prices into `process_price_feed_stream()` and measure every call, then feed `memory_prices` (default
+    `prices`) with tracemalloc.
+    """
+    process_price_feed_stream = manager.process_price_feed_stream
+    ticks = [{'price': price} for price in prices]
+    durations_ns = [0] * len(ticks)
+    gc.collect()
+    gc.disable()
+    start_time = time.perf_counter_ns()
+    for index, tick in enumerate(ticks):
+        tick_start_time = time.perf_counter_ns()
+        process_price_feed_stream(stream_data=tick)
+        durations_ns[index] = time.perf_counter_ns() - tick_start_time
+    total_ns = time.perf_counter_ns() - start_time
+    gc.enable()
+    result = {'ticks': len(ticks), 'ticks_per_second': len(ticks) / (total_ns / 1e9)}
+    result.update(get_percentiles(durations_ns))
+    tracemalloc.start()
+    start_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for price in memory_prices or prices:
+        process_price_feed_stream(stream_data={'price': price})
+    end_size, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result['memory_peak_bytes'] = peak_size - start_size
+    result['memory_retained_bytes_per_tick'] = (end_size - start_size) / len(memory_prices or prices)
+    return result
+
+
+def get_agg_trade_frames(prices: list = None) -> list:
+    """
+    Build raw aggTrade frames of a combined stream like the exchange sends them.
+    """
+    event_time = int(time.time() * 1000)
+    return [json.dumps({'stream': "btcusdt@aggTrade",
+                        'data': {'e': "aggTrade", 'E': event_time + index, 's': "BTCUSDT", 'a': 1000000 + index,
+                                 'p': f"{price:.2f}", 'q': "0.00100000", 'f': 2000000 + index, 'l': 2000000 + index,
+                                 'T': event_time + index, 'm': index % 2 == 0, 'M': True}},
+                       separators=(",", ":")) for index, price in enumerate(prices)]
+
+
+def measure_frames(process_frame=None,
+                   frames: list = None) -> dict:
+    """
+    Feed raw frames into `process_frame()` and measure every call including the decoding, then feed them again with
+    tracemalloc.
+    """
+    durations_ns = [0] * len(frames)
+    gc.collect()
+    gc.disable()
+    start_time = time.perf_counter_ns()
+    for index, frame in enumerate(frames):
+        frame_start_time = time.perf_counter_ns()
+        process_frame(frame)
+        durations_ns[index] = time.perf_counter_ns() - frame_start_time
+    total_ns = time.perf_counter_ns() - start_time
+    gc.enable()
+    result = {'ticks': len(frames), 'ticks_per_second': len(frames) / (total_ns / 1e9)}
+    result.update(get_percentiles(durations_ns))
+    tracemalloc.start()
+    start_size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for frame in frames:
+        process_frame(frame)
+    end_size, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result['memory_peak_bytes'] = peak_size - start_size
+    result['memory_retained_bytes_per_tick'] = (end_size - start_size) / len(frames)
+    return result
+
+
+def run_benchmark(ticks: int = 100000,
+                  tick_interval: float = 0.0005,
+                  seed: int = 1) -> dict:
+    """
+    Run all scenarios in this process.
+    """
+    import unicorn_binance_trailing_stop_loss.manager as manager_module
+    rng = random.Random(seed)
+    result = {'build': "compiled" if manager_module.__file__.endswith((".so", ".pyd")) else "source",
+              'module': manager_module.__file__,
+              'python': sys.version.split()[0]}
+
+    # Prices around 30000 that never raise the stop/loss price of 40000
+    manager = create_manager(stop_loss_price=40000.0)
+    prices = [round(30000.0 + rng.uniform(-50.0, 50.0), 2) for _ in range(ticks)]
+    result['ticks_no_change'] = measure_ticks(manager=manager, prices=prices)
+    manager.stop_manager()
+
+    # Rising prices, every tick moves the stop/loss price
+    manager = create_manager(stop_loss_price=1.0)
+    manager.start_order_worker()
+    prices = [round(30000.0 + index * 0.5, 2) for index in range(ticks * 2)]
+    result['ticks_trailing'] = measure_ticks(manager=manager, prices=prices[:ticks], memory_prices=prices[ticks:])
+    result['ticks_trailing']['order_requests'] = len(manager.ubra.requests)
+    manager.stop_manager()
+
+    # Paced rising prices, latency from the tick to the cancel-replace request with its stop/loss price
+    manager = create_manager(stop_loss_price=1.0)
+    manager.start_order_worker()
+    arrival_times: dict = {}
+    tick_count = max(1000, ticks // 20)
+    price = 30000.0
+    next_time = time.perf_counter_ns()
+    for _ in range(tick_count):
+        price = round(price + 0.5, 2)
+        while time.perf_counter_ns() < next_time:
+            pass
+        next_time += int(tick_interval * 1e9)
+        arrival_time = time.perf_counter_ns()
+        manager.process_price_feed_stream(stream_data={'price': price})
+        stop_loss_price = manager.calculate_stop_loss_price(price, manager.stop_loss_limit, quantizer=manager.quantizer)
+        # The requests carry the price as formatted by the quantizer
+        arrival_times.setdefault(manager.quantizer.format_price(stop_loss_price), arrival_time)
+    time.sleep(0.5)
+    latencies_ns = [request_time - arrival_times[price] for request_time, price in manager.ubra.requests
+                    if price in arrival_times]
+    result['tick_to_order'] = {'ticks': tick_count,
+                               'order_requests': len(manager.ubra.requests),
+                               'tick_interval_us': tick_interval * 1e6}
+    result['tick_to_order'].update(get_percentiles(latencies_ns))
+    manager.stop_manager()
+
+    # Decoding of raw frames that never raise the stop/loss price: UnicornFy versus the raw price feed
+    frames = get_agg_trade_frames([30000.0 + rng.uniform(-50.0, 50.0) for _ in range(ticks)])
+    try:
+        from unicorn_fy.unicorn_fy import UnicornFy
+    except ImportError:
+        UnicornFy = None
+    if UnicornFy is not None:
+        manager = create_manager(stop_loss_price=40000.0)
+
+        def process_frame(frame):
+            manager.process_price_feed_stream(stream_data=UnicornFy.binance_com_websocket(frame))
+
+        result['frames_unicornfy'] = measure_frames(process_frame=process_frame, frames=frames)
+        manager.stop_manager()
+    manager = create_manager(stop_loss_price=40000.0, raw_price_feed=True)
+    result['frames_raw'] = measure_frames(process_frame=manager.process_raw_price_feed_stream, frames=frames)
+    manager.stop_manager()
+    return result
+
+
+def prepare_source_build(target_path: str = None) -> str:
+    """
+    Copy the `.py` files of the package, so an in-place Cython build can not shadow them.
+    """
+    package_path = os.path.join(target_path, PACKAGE_NAME)
+    os.makedirs(package_path)
+    for file_path in glob.glob(os.path.join(ROOT_PATH, PACKAGE_NAME, "*.py")):
+        shutil.copy(file_path, package_path)
+    return target_path
+
+
+def run_worker(build_path: str = None, options=None) -> Optional[dict]:
+    """
+    Run the benchmark in a new process with `build_path` as first entry of `sys.path`.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = build_path + os.pathsep + env.get('PYTHONPATH', "")
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), "--worker",
+                              "--ticks", str(options.ticks),
+                              "--tickinterval", str(options.tickinterval),
+                              "--seed", str(options.seed)],
+                             cwd=tempfile.gettempdir(), env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        print(f"Benchmark of `{build_path}` failed:\r\n{process.stderr}")
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def print_results(results: list = None) -> None:
+    """
+    Print a table of the scenarios with the ratio of the builds.
+    """
+    keys = ("ticks_per_second", "p50_us", "p99_us", "p999_us", "memory_peak_bytes", "memory_retained_bytes_per_tick")
+    for scenario in ("ticks_no_change", "ticks_trailing", "tick_to_order", "frames_unicornfy", "frames_raw"):
+        if any(scenario not in result for result in results):
+            continue
+        print(f"\r\n{scenario}:")
+        print(f"    {'':34}" + "".join(f"{result['build']:>16}" for result in results) +
+              (f"{'ratio':>10}" if len(results) == 2 else ""))
+        for key in keys:
+            values = [result[scenario].get(key) for result in results]
+            if all(value is None for value in values):
+                continue
+            line = f"    {key:34}" + "".join(f"{value:16.2f}" if value is not None else f"{'-':>16}"
+                                             for value in values)
+            if len(values) == 2 and values[0] and values[1] is not None:
+                line += f"{values[1] / values[0]:10.2f}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the trailing hot path of "
+                                                 "unicorn-binance-trailing-stop-loss")
+    parser.add_argument('--ticks', type=int, default=100000, help='Ticks per throughput scenario.')
+    parser.add_argument('--tickinterval', type=float, default=0.0005,
+                        help='Seconds between two ticks of the latency scenario.')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the generated prices.')
+    parser.add_argument('--compiled', type=str, default=ROOT_PATH,
+                        help='Path containing the Cython build of the package. Default is the repository root after '
+                             '`python setup.py build_ext --inplace`.')
+    parser.add_argument('--output', type=str, default=None, help='Save the results as JSON file.')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if options.worker is True:
+        print(json.dumps(run_benchmark(ticks=options.ticks, tick_interval=options.tickinterval, seed=options.seed)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as source_path:
+        result = run_worker(build_path=prepare_source_build(source_path), options=options)
+        if result is not None:
+            results.append(result)
+    if glob.glob(os.path.join(options.compiled, PACKAGE_NAME, "*.so")) or \
+            glob.glob(os.path.join(options.compiled, PACKAGE_NAME, "*.pyd")):
+        result = run_worker(build_path=options.compiled, options=options)
+        if result is not None:
+            results.append(result)
+    else:
+        print(f"No Cython build found in `{options.compiled}`, run `python setup.py build_ext --inplace` to compare "
+              f"it with the source build.")
+    for result in results:
+        print(f"{result['build']}: {result['module']} (Python {result['python']})")
+    print_results(results)
+    if options.output is not None:
+        with open(options.output, "w") as fh_json:
+            json.dump(results, fh_json, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,8 +27,22 @@ with open("README.md", "r") as fh:
 setup(
      ext_modules=cythonize(
         ['unicorn_binance_trailing_stop_loss/__init__.py',
+         'unicorn_binance_trailing_stop_loss/async_manager.py',
+         'unicorn_binance_trailing_stop_loss/backtest.py',
          'unicorn_binance_trailing_stop_loss/cli.py',
-         'unicorn_binance_trailing_stop_loss/manager.py'],
+         'unicorn_binance_trailing_stop_loss/exchange_info_cache.py',
+         'unicorn_binance_trailing_stop_loss/exchanges.py',
+         'unicorn_binance_trailing_stop_loss/fleet.py',
+         'unicorn_binance_trailing_stop_loss/journal.py',
+         'unicorn_binance_trailing_stop_loss/manager.py',
+         'unicorn_binance_trailing_stop_loss/metrics.py',
+         'unicorn_binance_trailing_stop_loss/mock_exchange.py',
+         'unicorn_binance_trailing_stop_loss/notifications.py',
+         'unicorn_binance_trailing_stop_loss/portfolio_manager.py',
+         'unicorn_binance_trailing_stop_loss/quantizer.py',
+         'unicorn_binance_trailing_stop_loss/rate_limit_scheduler.py',
+         'unicorn_binance_trailing_stop_loss/sweep.py',
+         'unicorn_binance_trailing_stop_loss/trailing_kernel.py'],
         annotate=False),
      name='unicorn-binance-trailing-stop-loss',
      version="1.1.0",
@@ -41,7 +55,8 @@ setup(
      long_description_content_type="text/markdown",
      license='LSOSL - LUCIT Synergetic Open Source License',
      install_requires=['lucit-licensing-python>=1.8.1', 'Cython', 'requests', 'unicorn-binance-websocket-api>=2.1.1',
-                       'unicorn-binance-rest-api>=2.2.0'],
+                       'unicorn-binance-rest-api>=2.5.0', 'websockets'],
+     extras_require={'numpy': ['numpy']},
      keywords='Binance, Binance Futures, Binance Margin, Binance Isolated Margin, Binance Testnet, Trailing Stop Loss, '
               'Smart Entry',
      project_urls={
@@ -18,5 +18,33 @@
 # Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
 # All rights reserved.
 
-from .cli import *
-from .manager import BinanceTrailingStopLossManager
+import importlib
+
+__app_name__ = "unicorn-binance-trailing-stop-loss"
+__version__ = "1.1.0.dev"
+
+# The public classes are imported on first access (PEP 562), so `import unicorn_binance_trailing_stop_loss` and the
+# CLI do not load the websocket, REST and licensing clients before they are needed.
+lazy_imports = {'AsyncBinanceTrailingStopLossManager': ".async_manager",
+                'BinanceTrailingStopLossFleetManager': ".fleet",
+                'BinanceTrailingStopLossManager': ".manager",
+                'BinanceTrailingStopLossPortfolioManager': ".portfolio_manager",
+                'cli': ".cli",
+                'main': ".cli"}
+
+__all__ = ["__app_name__", "__version__"] + list(lazy_imports)
+
+
+def __getattr__(name: str):
+    if name not in lazy_imports:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(lazy_imports[name], __name__)
+    # Bind all names of the module, importing `.cli` sets the attribute `cli` of the package to the submodule
+    for lazy_name, module_name in lazy_imports.items():
+        if module_name == lazy_imports[name]:
+            globals()[lazy_name] = getattr(module, lazy_name)
+    return globals()[name]
+
+
+def __dir__() -> list:
+    return sorted(set(globals()) | set(lazy_imports))
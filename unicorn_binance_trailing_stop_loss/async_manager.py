@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/async_manager.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from .manager import BinanceTrailingStopLossManager, PRICE_SOURCE_CHANNELS
+from typing import AsyncIterator, Optional
+import asyncio
+import logging
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+
+class AsyncBinanceTrailingStopLossManager(object):
+    """
+    Asyncio interface of the trailing stop/loss engine.
+
+    The order worker of the engine runs as a coroutine in the event loop of the caller instead of a thread per
+    position, the REST requests are executed in the default executor of the event loop and the streams are consumed
+    with the `process_asyncio_queue` interface of the UNICORN Binance WebSocket API. Instead of callbacks, the outcome
+    is returned by `wait_finished()` and all events are provided by the async iterator `events()`.
+
+    .. code-block:: python
+
+        async with AsyncBinanceTrailingStopLossManager(api_key=api_key,
+                                                       api_secret=api_secret,
+                                                       market="ETHUSDT",
+                                                       stop_loss_limit="1.5%") as ubtsl:
+            async for event in ubtsl.events():
+                print(event)
+
+    All parameters are passed on to `BinanceTrailingStopLossManager`, except `callback_error`, `callback_finished`,
+    `callback_partially_filled` and `start_engine` which are controlled by this class.
+
+    Events are dicts with the keys `event` (`error`, `finished`, `partially_filled` or `stopped`) and `data`.
+    """
+    def __init__(self, **kwargs):
+        self.logger = __logger__
+        for key in ("callback_error", "callback_finished", "callback_partially_filled", "start_engine"):
+            if key in kwargs:
+                raise ValueError(f"Parameter `{key}` is not supported by AsyncBinanceTrailingStopLossManager!")
+        self.engine = BinanceTrailingStopLossManager(callback_error=self.process_callback_error,
+                                                     callback_finished=self.process_callback_finished,
+                                                     callback_partially_filled=self.process_callback_partially_filled,
+                                                     start_engine=False,
+                                                     **kwargs)
+        self.ubwa = self.engine.ubwa
+        self.event_queue: Optional[asyncio.Queue] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.order_request: Optional[asyncio.Event] = None
+        self.order_worker: Optional[asyncio.Task] = None
+        self.outcome: Optional[asyncio.Future] = None
+
+    async def __aenter__(self):
+        self.logger.debug(f"Entering 'async with-context' ...")
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, error_traceback):
+        self.logger.debug(f"Leaving 'async with-context' ...")
+        await self.stop()
+        if exc_type:
+            self.logger.critical(f"An exception occurred: {exc_type} - {exc_value} - {error_traceback}")
+
+    async def events(self) -> AsyncIterator[dict]:
+        """
+        Async iterator over the events of the engine. It ends after the `finished`, `error` or `stopped` event.
+
+        :return: AsyncIterator[dict]
+        """
+        while True:
+            event = await self.event_queue.get()
+            yield event
+            if event['event'] != "partially_filled":
+                break
+
+    def is_manager_stopping(self) -> bool:
+        """
+        Returns `True` if the manager has a stop request, 'False' if not.
+
+        :return: bool
+        """
+        return self.engine.is_manager_stopping()
+
+    def notify_order_worker(self) -> None:
+        """
+        Wake up the order worker coroutine if the engine requested it. Thread safe, it is called from the event loops
+        of the streams.
+
+        :return: None
+        """
+        if self.engine.stop_loss_order_request.is_set() and self.loop is not None:
+            self.loop.call_soon_threadsafe(self.order_request.set)
+
+    def process_callback_error(self, msg=None) -> None:
+        """
+        Used as `callback_error` of the engine.
+
+        :return: None
+        """
+        self.loop.call_soon_threadsafe(self.put_event, "error", msg)
+
+    def process_callback_finished(self, stream_data=None) -> None:
+        """
+        Used as `callback_finished` of the engine.
+
+        :return: None
+        """
+        self.loop.call_soon_threadsafe(self.put_event, "finished", stream_data)
+
+    def process_callback_partially_filled(self, stream_data=None) -> None:
+        """
+        Used as `callback_partially_filled` of the engine.
+
+        :return: None
+        """
+        self.loop.call_soon_threadsafe(self.put_event, "partially_filled", stream_data)
+
+    async def process_price_feed_queue(self, stream_id=None) -> None:
+        """
+        Consume the asyncio queue of the price feed stream.
+
+        :return: None
+        """
+        while self.ubwa.is_stop_request(stream_id) is False:
+            stream_data = await self.ubwa.get_stream_data_from_asyncio_queue(stream_id)
+            if self.engine.raw_price_feed is True:
+                self.engine.process_raw_price_feed_stream(stream_data=stream_data)
+            else:
+                self.engine.process_price_feed_stream(stream_data=stream_data)
+            self.ubwa.asyncio_queue_task_done(stream_id)
+            self.notify_order_worker()
+
+    async def process_stop_loss_order_requests(self) -> None:
+        """
+        Order worker coroutine, the asyncio counterpart of
+        `BinanceTrailingStopLossManager.process_stop_loss_order_requests()`.
+
+        :return: None
+        """
+        self.logger.info(f"AsyncBinanceTrailingStopLossManager.process_stop_loss_order_requests() - Order worker "
+                         f"started")
+        while self.engine.is_manager_stopping() is False:
+            try:
+                await asyncio.wait_for(self.order_request.wait(),
+                                       timeout=self.engine.get_stop_loss_order_request_timeout())
+            except asyncio.TimeoutError:
+                pass
+            self.order_request.clear()
+            self.engine.stop_loss_order_request.clear()
+            await self.loop.run_in_executor(None, self.engine.process_stop_loss_order_request)
+        self.logger.info(f"AsyncBinanceTrailingStopLossManager.process_stop_loss_order_requests() - Order worker "
+                         f"stopped")
+
+    async def process_userdata_queue(self, stream_id=None) -> None:
+        """
+        Consume the asyncio queue of the userData stream.
+
+        :return: None
+        """
+        while self.ubwa.is_stop_request(stream_id) is False:
+            stream_data = await self.ubwa.get_stream_data_from_asyncio_queue(stream_id)
+            if stream_data.get('event_type') is not None:
+                self.engine.process_userdata_stream(stream_data=stream_data)
+            self.ubwa.asyncio_queue_task_done(stream_id)
+            self.notify_order_worker()
+
+    def put_event(self, event: str = None, data=None) -> None:
+        """
+        Add an event to the event queue and resolve the outcome on `finished` and `error`. Must be called in the event
+        loop of this manager.
+
+        :return: None
+        """
+        self.event_queue.put_nowait({'event': event, 'data': data})
+        if event != "partially_filled" and not self.outcome.done():
+            self.outcome.set_result({'event': event, 'data': data})
+            if self.engine.is_manager_stopping() is False:
+                self.loop.create_task(self.stop())
+
+    async def start(self) -> bool:
+        """
+        Start the streams, the order worker coroutine and place the initial stop/loss order.
+
+        :return: bool
+        """
+        self.loop = asyncio.get_running_loop()
+        self.event_queue = asyncio.Queue()
+        self.order_request = asyncio.Event()
+        self.outcome = self.loop.create_future()
+        symbols = self.engine.exchange_adapter.get_user_stream_symbols()
+        self.engine.user_stream_id = self.ubwa.create_stream("arr", "!userData",
+                                                             api_key=self.engine.api_key,
+                                                             api_secret=self.engine.api_secret,
+                                                             process_asyncio_queue=self.process_userdata_queue,
+                                                             symbols=symbols,
+                                                             stream_label="UserData")
+        if self.engine.engine != "native-trail":
+            channel = PRICE_SOURCE_CHANNELS[self.engine.price_source]
+            output = "raw_data" if self.engine.raw_price_feed else None
+            self.engine.trade_stream_id = self.ubwa.create_stream(channels=channel,
+                                                                  markets=self.engine.market,
+                                                                  output=output,
+                                                                  process_asyncio_queue=self.process_price_feed_queue,
+                                                                  stream_label="PriceFeed")
+        self.order_worker = self.loop.create_task(self.process_stop_loss_order_requests())
+        try:
+            await self.loop.run_in_executor(None, self.engine.initialize_stop_loss)
+        except SystemExit:
+            self.put_event("error", "Initialization of the stop/loss engine failed!")
+            return False
+        return True
+
+    async def stop(self) -> bool:
+        """
+        Stop the engine, the streams and the order worker coroutine.
+
+        :return: bool
+        """
+        if self.engine.is_manager_stopping() is False:
+            await self.loop.run_in_executor(None, self.engine.stop_manager)
+        if self.order_request is not None:
+            self.order_request.set()
+        if self.order_worker is not None and self.order_worker is not asyncio.current_task():
+            await self.order_worker
+        if self.outcome is not None and not self.outcome.done():
+            self.put_event("stopped", None)
+        return True
+
+    async def wait_finished(self) -> dict:
+        """
+        Wait until the stop/loss order is filled, an error occurs or the manager gets stopped.
+
+        :return: dict with the keys `event` (`finished`, `error` or `stopped`) and `data`
+        """
+        return await asyncio.shield(self.outcome)
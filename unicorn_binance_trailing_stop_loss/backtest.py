@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/backtest.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from .manager import BinanceTrailingStopLossManager
+from typing import BinaryIO, Iterator, Optional, Union
+import logging
+import zipfile
+
+try:
+    from .trailing_kernel import calculate_trailing_stop_loss
+except ImportError:
+    # NumPy is not installed
+    calculate_trailing_stop_loss = None
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+
+def read_agg_trades(file_path: str = None,
+                    chunk_size: int = 1000000) -> Iterator[tuple]:
+    """
+    Stream the price and the timestamp of the trades of a Binance public-data aggTrades file in chunks.
+
+    Supported are the `.csv` files and the `.zip` archives of https://data.binance.vision with or without header row.
+    The timestamps are converted to seconds, files with millisecond and microsecond timestamps are supported.
+
+    :param file_path: Path of the `.csv` or `.zip` file.
+    :type file_path: str
+    :param chunk_size: Number of trades per chunk.
+    :type chunk_size: int
+
+    :return: Iterator of tuples (prices, timestamps) with lists of floats
+    """
+    if str(file_path).endswith(".zip"):
+        with zipfile.ZipFile(file_path) as zip_file:
+            for name in zip_file.namelist():
+                if name.endswith(".csv"):
+                    with zip_file.open(name) as fh_csv:
+                        yield from read_agg_trades_csv(fh_csv, chunk_size=chunk_size)
+    else:
+        with open(file_path, "rb") as fh_csv:
+            yield from read_agg_trades_csv(fh_csv, chunk_size=chunk_size)
+
+
+def read_agg_trades_csv(fh_csv: BinaryIO = None,
+                        chunk_size: int = 1000000) -> Iterator[tuple]:
+    """
+    Stream the price and the timestamp of the trades of an aggTrades CSV file opened in binary mode in chunks.
+
+    Columns: agg_trade_id, price, quantity, first_trade_id, last_trade_id, transact_time, is_buyer_maker, ...
+
+    Only the two needed columns of each line are converted, which is about twice as fast as the `csv` module.
+
+    :param fh_csv: File handle of the CSV file opened in binary mode.
+    :type fh_csv: BinaryIO
+    :param chunk_size: Number of trades per chunk.
+    :type chunk_size: int
+
+    :return: Iterator of tuples (prices, timestamps) with lists of floats
+    """
+    divisor = None
+    prices = []
+    timestamps = []
+    for line in fh_csv:
+        columns = line.split(b",", 6)
+        try:
+            price = float(columns[1])
+            timestamp = float(columns[5])
+        except (IndexError, ValueError):
+            # Header row
+            continue
+        if divisor is None:
+            divisor = 1000000.0 if timestamp > 1e14 else 1000.0
+        prices.append(price)
+        timestamps.append(timestamp / divisor)
+        if len(prices) >= chunk_size:
+            yield prices, timestamps
+            prices = []
+            timestamps = []
+    if prices:
+        yield prices, timestamps
+
+
+class BinanceTrailingStopLossBacktest(object):
+    """
+    Replay historical trades through the trailing and trigger rules of `BinanceTrailingStopLossManager`.
+
+    For each trade the stop/loss price is calculated with `calculate_stop_loss_price()` and submitted like the order
+    worker does it: only if it is higher than the current one, improves it by `stop_loss_update_min_improvement` and the
+    last replacement is older than `stop_loss_update_interval` seconds (measured in trade time). The first stop/loss
+    price is calculated with `stop_loss_start_limit` if provided.
+
+    If NumPy is installed and neither `stop_loss_update_interval` nor `stop_loss_update_min_improvement` is used, the
+    chunks are processed by the vectorized kernel `trailing_kernel.calculate_trailing_stop_loss()`.
+
+    Simulated fill model: The STOP_LOSS_LIMIT order gets triggered by the first trade at or below the trigger price. If
+    the price of this trade is at or above the limit price, the order is filled at the trade price, otherwise it rests in
+    the orderbook and gets filled at the limit price as soon as a trade reaches it.
+
+    .. code-block:: python
+
+        backtest = BinanceTrailingStopLossBacktest(stop_loss_limit="1.5%")
+        result = backtest.run(["BTCUSDT-aggTrades-2023-10.zip"])
+
+    :param stop_loss_limit: The limit in float or percent.
+    :type stop_loss_limit: str
+    :param stop_loss_start_limit: The limit of the first stop/loss order in float or percent.
+    :type stop_loss_start_limit: str
+    :param stop_loss_trigger_gap: Gap between stopPrice and limit order price, use integer or percent values.
+    :type stop_loss_trigger_gap: str
+    :param stop_loss_update_interval: Minimum time in seconds between two replacements of the stop/loss order.
+    :type stop_loss_update_interval: float
+    :param stop_loss_update_min_improvement: Minimum improvement of the stop/loss price to replace the order in float,
+                                             percent, basis points (`5bps`) or ticks (`3ticks`).
+    :type stop_loss_update_min_improvement: str
+    :param precision: Decimal places of the trigger price without `SymbolQuantizer`.
+    :type precision: int
+    :param tick_size: The `tickSize` of the PRICE_FILTER.
+    :type tick_size: float
+    :param vectorized: Set to `False` to disable the vectorized kernel.
+    :type vectorized: bool
+    """
+    def __init__(self,
+                 stop_loss_limit: Union[str, float] = None,
+                 stop_loss_start_limit: Union[str, float] = None,
+                 stop_loss_trigger_gap: str = "0.01",
+                 stop_loss_update_interval: float = 0.0,
+                 stop_loss_update_min_improvement: str = None,
+                 precision: int = 8,
+                 tick_size: float = 0.01,
+                 vectorized: bool = True):
+        self.logger = __logger__
+        self.precision = precision
+        self.stop_loss_limit = stop_loss_limit
+        self.stop_loss_start_limit = stop_loss_start_limit or None
+        self.stop_loss_trigger_gap = stop_loss_trigger_gap
+        self.stop_loss_update_interval = stop_loss_update_interval
+        self.stop_loss_update_min_improvement = stop_loss_update_min_improvement
+        self.tick_size = tick_size
+        self.entry_price: Optional[float] = None
+        self.exit_price: Optional[float] = None
+        self.exit_time: Optional[float] = None
+        self.high_price: Optional[float] = None
+        self.replacements: int = 0
+        self.stop_loss_base_price: Optional[float] = None
+        self.stop_loss_price: Optional[float] = None
+        self.stop_loss_price_pending: Optional[float] = None
+        self.stop_loss_update_last_timestamp: float = 0.0
+        self.ticks: int = 0
+        self.trigger_index: Optional[int] = None
+        self.trigger_price: Optional[float] = None
+        self.trigger_time: Optional[float] = None
+        self.triggered_limit_price: Optional[float] = None
+        self.vectorized = vectorized is True and calculate_trailing_stop_loss is not None and \
+            not self.stop_loss_update_interval and self.stop_loss_update_min_improvement is None
+
+    def get_result(self) -> dict:
+        """
+        Get the result of the backtest.
+
+        `slippage` is the difference between the trigger price and the exit price. If the triggered order was never
+        filled, `exit_price` and `slippage` are None.
+
+        :return: dict
+        """
+        if self.exit_price is not None:
+            slippage = self.trigger_price - self.exit_price
+        else:
+            slippage = None
+        return {'entry_price': self.entry_price,
+                'exit_price': self.exit_price,
+                'exit_time': self.exit_time,
+                'high_price': self.high_price,
+                'replacements': self.replacements,
+                'slippage': slippage,
+                'stop_loss_price': self.stop_loss_price,
+                'ticks': self.ticks,
+                'trigger_index': self.trigger_index,
+                'trigger_price': self.trigger_price,
+                'trigger_time': self.trigger_time}
+
+    def get_trigger_price(self, stop_loss_price: float = None) -> float:
+        """
+        Get the trigger price of a stop/loss price like the manager does.
+
+        :return: float
+        """
+        return BinanceTrailingStopLossManager.calculate_stop_loss_trigger_price(stop_loss_price=stop_loss_price,
+                                                                                trigger_gap=self.stop_loss_trigger_gap,
+                                                                                precision=self.precision)
+
+    def is_finished(self) -> bool:
+        """
+        Returns `True` if the stop/loss order is filled.
+
+        :return: bool
+        """
+        return self.exit_price is not None
+
+    def process_trades(self,
+                       prices: list = None,
+                       timestamps: list = None) -> bool:
+        """
+        Replay a chunk of trades.
+
+        :param prices: Prices of the trades.
+        :type prices: list
+        :param timestamps: Timestamps of the trades in seconds.
+        :type timestamps: list
+
+        :return: bool (True if the stop/loss order is filled)
+        """
+        if self.is_finished():
+            return True
+        if self.vectorized is True and self.triggered_limit_price is None and len(prices) > 0:
+            return self.process_trades_vectorized(prices=prices, timestamps=timestamps)
+        calculate_stop_loss_price = BinanceTrailingStopLossManager.calculate_stop_loss_price
+        base_price = self.stop_loss_base_price
+        high_price = self.high_price
+        stop_loss_price = self.stop_loss_price
+        pending = self.stop_loss_price_pending
+        trigger_price = self.trigger_price if self.triggered_limit_price is not None else None
+        if stop_loss_price is not None and trigger_price is None:
+            trigger_price = self.get_trigger_price(stop_loss_price)
+        index = self.ticks
+        for price, timestamp in zip(prices, timestamps):
+            index += 1
+            if self.triggered_limit_price is not None:
+                # The triggered limit order rests in the orderbook
+                if price >= self.triggered_limit_price:
+                    self.exit_price = self.triggered_limit_price
+                    self.exit_time = timestamp
+                    break
+                continue
+            if stop_loss_price is not None and price <= trigger_price:
+                self.trigger_index = index - 1
+                self.trigger_price = trigger_price
+                self.trigger_time = timestamp
+                self.triggered_limit_price = stop_loss_price
+                if price >= stop_loss_price:
+                    self.exit_price = price
+                    self.exit_time = timestamp
+                    break
+                continue
+            if high_price is None or price > high_price:
+                high_price = price
+            if stop_loss_price is None and pending is None:
+                self.entry_price = price
+                pending = calculate_stop_loss_price(price, self.stop_loss_start_limit or self.stop_loss_limit)
+            elif base_price is None or price > base_price:
+                # `calculate_stop_loss_price()` is monotonic, lower prices than `base_price` can not raise the stop
+                base_price = price
+                sl_price = calculate_stop_loss_price(price, self.stop_loss_limit)
+                if (stop_loss_price is None or stop_loss_price < sl_price) and (pending is None or pending < sl_price):
+                    pending = sl_price
+            if pending is not None:
+                if stop_loss_price is None:
+                    due = True
+                elif pending <= stop_loss_price:
+                    pending = None
+                    due = False
+                else:
+                    min_improvement = BinanceTrailingStopLossManager.calculate_stop_loss_min_improvement(
+                        stop_loss_price=stop_loss_price,
+                        min_improvement=self.stop_loss_update_min_improvement,
+                        tick_size=self.tick_size)
+                    due = pending - stop_loss_price >= min_improvement and \
+                        timestamp - self.stop_loss_update_last_timestamp >= self.stop_loss_update_interval
+                if due is True:
+                    if stop_loss_price is not None:
+                        self.replacements += 1
+                    stop_loss_price = pending
+                    pending = None
+                    trigger_price = self.get_trigger_price(stop_loss_price)
+                    self.stop_loss_update_last_timestamp = timestamp
+        self.ticks = index
+        self.stop_loss_base_price = base_price
+        self.high_price = high_price
+        self.stop_loss_price = stop_loss_price
+        self.stop_loss_price_pending = pending
+        return self.is_finished()
+
+    def process_trades_vectorized(self,
+                                  prices: list = None,
+                                  timestamps: list = None) -> bool:
+        """
+        Replay a chunk of trades with the vectorized kernel.
+
+        :param prices: Prices of the trades.
+        :type prices: list
+        :param timestamps: Timestamps of the trades in seconds.
+        :type timestamps: list
+
+        :return: bool (True if the stop/loss order is filled)
+        """
+        result = calculate_trailing_stop_loss(prices,
+                                              stop_loss_limit=self.stop_loss_limit,
+                                              stop_loss_start_limit=self.stop_loss_start_limit,
+                                              stop_loss_trigger_gap=self.stop_loss_trigger_gap,
+                                              stop_loss_price=self.stop_loss_price,
+                                              precision=self.precision)
+        if self.stop_loss_price is None:
+            self.entry_price = prices[0]
+            start = 1
+        else:
+            start = 0
+        self.replacements += result['replacements']
+        if result['trigger_index'] is None:
+            end = len(prices)
+        else:
+            end = result['trigger_index']
+        if end > 0:
+            high_price = max(prices[:end])
+            if self.high_price is None or high_price > self.high_price:
+                self.high_price = high_price
+            if end > start:
+                base_price = max(prices[start:end])
+                if self.stop_loss_base_price is None or base_price > self.stop_loss_base_price:
+                    self.stop_loss_base_price = base_price
+            self.stop_loss_price = float(result['stop_loss_prices'][end - 1])
+        if result['trigger_index'] is not None:
+            self.trigger_index = self.ticks + result['trigger_index']
+            self.trigger_price = result['trigger_price']
+            self.trigger_time = timestamps[result['trigger_index']]
+            self.triggered_limit_price = self.stop_loss_price
+        if result['exit_index'] is not None:
+            self.exit_price = result['exit_price']
+            self.exit_time = timestamps[result['exit_index']]
+            self.ticks += result['exit_index'] + 1
+        else:
+            self.ticks += len(prices)
+        return self.is_finished()
+
+    def run(self,
+            file_paths: Union[str, list] = None,
+            chunk_size: int = 1000000) -> dict:
+        """
+        Replay one or more aggTrades files in the given order until the stop/loss order is filled.
+
+        :param file_paths: Paths of the `.csv` or `.zip` aggTrades files.
+        :type file_paths: str or list
+        :param chunk_size: Number of trades per chunk.
+        :type chunk_size: int
+
+        :return: dict, see `get_result()`
+        """
+        if isinstance(file_paths, str):
+            file_paths = [file_paths]
+        for file_path in file_paths:
+            self.logger.info(f"BinanceTrailingStopLossBacktest.run() - Replaying `{file_path}`")
+            for prices, timestamps in read_agg_trades(file_path=file_path, chunk_size=chunk_size):
+                if self.process_trades(prices=prices, timestamps=timestamps) is True:
+                    return self.get_result()
+        return self.get_result()
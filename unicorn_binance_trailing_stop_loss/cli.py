@@ -18,11 +18,12 @@
 # Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
 # All rights reserved.
 
+# Only the version is imported here, the engine, the REST and websocket clients and the licensing client are imported
+# by the paths that use them to keep `ubtsl --version`, `--listopenorders` and the other short runs fast.
 try:
-    from .manager import BinanceTrailingStopLossManager
-except ModuleNotFoundError:
-    from unicorn_binance_trailing_stop_loss.manager import BinanceTrailingStopLossManager
-from unicorn_binance_rest_api.manager import BinanceRestApiManager, BinanceAPIException
+    from . import __version__
+except ImportError:
+    from unicorn_binance_trailing_stop_loss import __version__
 from configparser import ConfigParser, ExtendedInterpolation
 from pathlib import Path
 from typing import Optional
@@ -31,10 +32,8 @@ import argparse
 import logging
 import platform
 import os
-import requests
 import sys
 import textwrap
-import webbrowser
 
 
 async def cli():
@@ -43,7 +42,7 @@ async def cli():
 
         More info: https://www.lucit.tech/ubtsl-cli.html
     """
-    version = BinanceTrailingStopLossManager.get_version()
+    version = __version__
     os_type = platform.system()
     home_path = f"{Path.home()}{os.sep}"
     config_path = f"{home_path}.lucit{os.sep}"
@@ -70,7 +69,34 @@ async def cli():
                  
                  Start with profile "BTCUSDT_SELL" and overwrite the stoplosslimit:
                  $ ubtsl --profile BTCUSDT_SELL --stoplosslimit 0.5%
+
+                 Start all profiles of the profiles file sharded across 8 worker processes:
+                 $ ubtsl --fleet ALL --workers 8
+
+                 Sweep a grid of limits over the aggTrades files of data.binance.vision in `./aggTrades`:
+                 $ ubtsl --sweep ./aggTrades --market ALL --stoplosslimit "0.5%,1%,1.5%" --stoplosstriggergap "0.01,0.05" \\
+                         --dateranges "2023-09-01:2023-09-30,2023-10-01:2023-10-31" --output sweep.csv
  
+                 Start a local mock exchange and trail against it in a second terminal:
+                 $ ubtsl --mockexchange --market BTCUSDT
+                 $ ubtsl --apikey x --apisecret x --market BTCUSDT --stoplosslimit 0.5% \\
+                         --restapiendpoint http://127.0.0.1:8080 --websocketapiendpoint ws://127.0.0.1:8081
+
+                 Trail with a crash-safe journal, a restart continues with the trailed stop/loss price:
+                 $ ubtsl --profile BTCUSDT_SELL --journal
+
+                 Trail and serve Prometheus metrics on http://127.0.0.1:9100/metrics:
+                 $ ubtsl --profile BTCUSDT_SELL --metricsport 9100
+
+                 Place one native trailing order that the exchange trails and only watch for the fill:
+                 $ ubtsl --profile BTCUSDT_SELL --engine native-trail --stoplosslimit 1.5%
+
+                 Trail on the best bid of the bookTicker stream instead of the trade prices:
+                 $ ubtsl --profile BTCUSDT_SELL --pricesource bookTicker
+
+                 Read only the price of the raw price feed frames instead of converting them with UnicornFy:
+                 $ ubtsl --profile BTCUSDT_SELL --rawpricefeed
+
                  List all open orders:
                  $ ubtsl --exchange "binance.com" --market "BTCUSDT" --listopenorders 
                  $ ubtsl --profile BTCUSDT_SELL --listopenorders 
@@ -135,6 +161,11 @@ async def cli():
                         type=str,
                         help=f'Show an example ini file from GitHub and then stop. Options: `config` or `profiles`.',
                         required=False)
+    parser.add_argument('-dr', '--dateranges',
+                        type=str,
+                        help='Comma separated date ranges `YYYY-MM-DD:YYYY-MM-DD` used by `--sweep`, each range is '
+                             'one data set per market.',
+                        required=False)
     parser.add_argument('-e', '--exchange',
                         type=str,
                         help="Exchange: binance.com, binance.com-testnet, binance.com-futures, "
@@ -143,8 +174,19 @@ async def cli():
     parser.add_argument('-n', '--engine',
                         type=str,
                         help='Choose the engine. Default: `trail` Options: `jump-in-and-trail` to place a buy order '
-                             'and trail.',
+                             'and trail, `native-trail` to place one native trailing order that the exchange trails '
+                             '(binance.com, binance.com-testnet and binance.com-futures).',
                         required=False)
+    parser.add_argument('-fl', '--fleet',
+                        type=str,
+                        help='Comma separated list of profiles to load from ubtsl_profiles.ini or `ALL` for all '
+                             'profiles. The profiles are sharded across the worker processes defined by `--workers`.',
+                        required=False)
+    parser.add_argument('-j', '--journal',
+                        help='Write the state of the market to a crash-safe journal in `~/.lucit/ubtsl_journal/` and '
+                             'restore it on the next start instead of rediscovering it.',
+                        required=False,
+                        action='store_true')
     parser.add_argument('-k', '--keepthreshold',
                         type=str,
                         help="Set the threshold to be kept. This is the amount that will not get sold.",
@@ -167,6 +209,11 @@ async def cli():
                         type=str,
                         help='The market on which is traded.',
                         required=False)
+    parser.add_argument('-mp', '--metricsport',
+                        type=int,
+                        help='Serve latency and throughput metrics in the Prometheus text format on '
+                             '`http://127.0.0.1:<metricsport>/metrics`.',
+                        required=False)
     parser.add_argument('-oci', '--openconfigini',
                         help=f'Open the used config file and then stop.',
                         required=False,
@@ -175,10 +222,26 @@ async def cli():
                         help=f'Open the used profiles file and then stop.',
                         required=False,
                         action='store_true')
+    parser.add_argument('-mx', '--mockexchange',
+                        help='Start a local mock of the Binance spot REST (port 8080) and websocket (port 8081) API '
+                             'with synthetic prices for the markets of `--market` (comma separated) and then wait '
+                             'until it gets stopped with CTRL+C.',
+                        required=False,
+                        action='store_true')
+    parser.add_argument('-o', '--output',
+                        type=str,
+                        help='Path of the CSV file the results of `--sweep` are written to.',
+                        required=False)
     parser.add_argument('-ot', '--ordertype',
                         type=str,
                         help="Use `limit` or `market`.",
                         required=False)
+    parser.add_argument('-ps', '--pricesource',
+                        type=str,
+                        help='Stream the stop/loss price is trailed on. Default: `aggTrade` Options: `bookTicker` '
+                             '(best bid), `kline_1s` and `miniTicker` (close price every second) and `markPrice` '
+                             '(binance.com-futures only).',
+                        required=False)
     parser.add_argument('-pf', '--profile',
                         type=str,
                         help='Name of the profile to load from ubtsl_profiles.ini!',
@@ -189,10 +252,20 @@ async def cli():
                              f"available ubtsl tries to load a ubtsl_profile.ini from the `{config_path}` and the "
                              f"current working directory.",
                         required=False)
+    parser.add_argument('-rpf', '--rawpricefeed',
+                        help='Receive the raw frames of the price feed and read only the price instead of converting '
+                             'every frame with UnicornFy.',
+                        required=False,
+                        action='store_true')
     parser.add_argument('-r', '--resetstoplossprice',
                         type=str,
                         help='Reset the existing stop_loss_price! usage: True anything else is False.',
                         required=False)
+    parser.add_argument('-re', '--restapiendpoint',
+                        type=str,
+                        help='Base URL of a REST API that replaces the endpoint of the exchange, for example '
+                             '`http://127.0.0.1:8080` of `--mockexchange`.',
+                        required=False)
     parser.add_argument('-l', '--stoplosslimit',
                         type=str,
                         help='Stop/loss limit in float or percent.',
@@ -205,6 +278,26 @@ async def cli():
                         type=float,
                         help='Set the start stop/loss price as float value.',
                         required=False)
+    parser.add_argument('-smi', '--stoplossminimprovement',
+                        type=str,
+                        help='Minimum improvement of the stop/loss price to replace the order in float, percent, '
+                             'basis points (`5bps`) or ticks (`3ticks`).',
+                        required=False)
+    parser.add_argument('-sui', '--stoplossupdateinterval',
+                        type=float,
+                        help='Minimum time in seconds between two replacements of the stop/loss order.',
+                        required=False)
+    parser.add_argument('-sw', '--sweep',
+                        type=str,
+                        help='Directory with aggTrades files of data.binance.vision. Evaluates the grid of the comma '
+                             'separated values of `--stoplosslimit`, `--stoplossstartlimit` and `--stoplosstriggergap` '
+                             'for the markets of `--market` (comma separated list or `ALL`) and the `--dateranges` '
+                             'with the worker processes defined by `--workers` and then stops. Needs NumPy.',
+                        required=False)
+    parser.add_argument('-tg', '--stoplosstriggergap',
+                        type=str,
+                        help='Gap between stopPrice and limit order price, use integer or percent values.',
+                        required=False)
     parser.add_argument('-t', '--test',
                         type=str,
                         help='Use this to test specific systems like "notification", "binance-connectivity" and '
@@ -215,6 +308,16 @@ async def cli():
                         help=f'Show the program version and then stop. The version is `{version}` by the way :)',
                         required=False,
                         action='store_true')
+    parser.add_argument('-we', '--websocketapiendpoint',
+                        type=str,
+                        help='Base URL of a websocket API that replaces the endpoint of the exchange, for example '
+                             '`ws://127.0.0.1:8081` of `--mockexchange`.',
+                        required=False)
+    parser.add_argument('-w', '--workers',
+                        type=int,
+                        help='Number of worker processes used by `--fleet` and `--sweep`. Default is the number of '
+                             'CPUs.',
+                        required=False)
     options = parser.parse_args()
 
     # Vars
@@ -307,6 +410,7 @@ async def cli():
             return None
         example_ini = f"https://raw.githubusercontent.com/LUCIT-Systems-and-Development/" \
                       f"unicorn-binance-trailing-stop-loss/master/cli/example_ubtsl_{example_name}.ini"
+        import requests
         response = requests.get(example_ini)
         return response.text
 
@@ -366,6 +470,7 @@ async def cli():
 
     # Update available?
     if options.checkupdate is True:
+        from unicorn_binance_trailing_stop_loss.manager import BinanceTrailingStopLossManager
         ubtsl = BinanceTrailingStopLossManager(start_engine=False, warn_on_update=False)
         if ubtsl.is_update_available():
             print("A new update is available: https://github.com/LUCIT-Systems-and-Development/"
@@ -388,6 +493,69 @@ async def cli():
             print(f"{options.example}.ini example:\r\n{load_examples_ini_from_github(example_name=options.example)}")
         sys.exit(0)
 
+    # Start a mock exchange, it needs no API keys
+    if options.mockexchange is True:
+        from unicorn_binance_trailing_stop_loss.mock_exchange import BinanceMockExchange
+        mock_markets = {}
+        for market in str(options.market or "BTCUSDT").split(","):
+            if market.strip():
+                mock_markets[market.strip().upper()] = {}
+        with BinanceMockExchange(rest_api_port=8080,
+                                 websocket_api_port=8081,
+                                 markets=mock_markets,
+                                 print_notifications=True) as mock_exchange:
+            mock_exchange.start()
+            while mock_exchange.is_alive():
+                await asyncio.sleep(1)
+        sys.exit(0)
+
+    # Run a parameter sweep, it needs no API keys
+    if options.sweep is not None:
+        try:
+            from unicorn_binance_trailing_stop_loss.sweep import BinanceTrailingStopLossSweep
+        except ModuleNotFoundError as error_msg:
+            print(f"ERROR: The sweep needs NumPy, please install it with "
+                  f"`pip install unicorn-binance-trailing-stop-loss[numpy]` ({error_msg})")
+            sys.exit(1)
+        if options.stoplosslimit is None:
+            print(f"ERROR: The sweep needs at least one `--stoplosslimit`!")
+            sys.exit(1)
+        if options.market is None or options.market.upper() == "ALL":
+            sweep_markets = None
+        else:
+            sweep_markets = [market.strip() for market in options.market.split(",") if market.strip()]
+        sweep_date_ranges = None
+        if options.dateranges is not None:
+            sweep_date_ranges = []
+            for date_range in options.dateranges.split(","):
+                date_from, _, date_to = date_range.strip().partition(":")
+                sweep_date_ranges.append((date_from or None, date_to or None))
+        sweep_start_limits = None
+        if options.stoplossstartlimit is not None:
+            sweep_start_limits = [value.strip() for value in options.stoplossstartlimit.split(",")]
+        sweep_trigger_gaps = None
+        if options.stoplosstriggergap is not None:
+            sweep_trigger_gaps = [value.strip() for value in options.stoplosstriggergap.split(",")]
+        sweep = BinanceTrailingStopLossSweep(data_dir=options.sweep,
+                                             markets=sweep_markets,
+                                             date_ranges=sweep_date_ranges,
+                                             stop_loss_limits=[value.strip() for value in
+                                                               options.stoplosslimit.split(",")],
+                                             stop_loss_start_limits=sweep_start_limits,
+                                             stop_loss_trigger_gaps=sweep_trigger_gaps,
+                                             workers=options.workers,
+                                             print_notifications=True)
+        sweep_results = sweep.run()
+        if options.output is not None:
+            sweep.save_results(results=sweep_results, file_path=options.output)
+            print(f"Saved {len(sweep_results)} results to `{options.output}`")
+        for market, best in sweep.get_best_parameters(results=sweep_results).items():
+            print(f"{market}: stop_loss_limit={best['stop_loss_limit']} "
+                  f"stop_loss_start_limit={best['stop_loss_start_limit']} "
+                  f"stop_loss_trigger_gap={best['stop_loss_trigger_gap']} "
+                  f"profit={best['profit_percent']:.4f}% data_sets={best['data_sets']}")
+        sys.exit(0)
+
     # Choose config file
     if options.configfile is not None:
         # Load from cli arg if provided
@@ -434,6 +602,7 @@ async def cli():
                   f"Use `ubtsl --createconfigini` to create one.")
         else:
             print(f"Opening `{config_file}`")
+            import webbrowser
             webbrowser.open(config_file)
         sys.exit(0)
 
@@ -443,6 +612,7 @@ async def cli():
                   f"Use `ubtsl --createprofilesini` to create one.")
         else:
             print(f"Opening `{profiles_file}`")
+            import webbrowser
             webbrowser.open(profiles_file)
         sys.exit(0)
 
@@ -472,14 +642,55 @@ async def cli():
     exchange = ""
     keep_threshold = ""
     market = ""
+    price_source = "aggTrade"
+    raw_price_feed = False
     stop_loss_limit = ""
     stop_loss_start_limit = ""
     stop_loss_order_type = ""
     stop_loss_price: float = 0.0
+    stop_loss_update_interval: float = 0.0
+    stop_loss_update_min_improvement = None
     reset_stop_loss_price = False
     test = None
     ubra = False
 
+    # Start the fleet if provided via argparse
+    if options.fleet is not None:
+        from unicorn_binance_trailing_stop_loss.fleet import BinanceTrailingStopLossFleetManager, get_profiles_from_ini
+        if options.apikey is not None:
+            public_key = options.apikey
+        if options.apisecret is not None:
+            private_key = options.apisecret
+        if options.fleet.upper() == "ALL":
+            profile_names = None
+        else:
+            profile_names = [name.strip() for name in options.fleet.split(",") if name.strip()]
+        logger.info(f"Loading profiles file `{profiles_file}`")
+        print(f"Loading profiles file `{profiles_file}`")
+        try:
+            fleet_profiles = get_profiles_from_ini(profiles_file=profiles_file, profile_names=profile_names)
+        except KeyError as error_msg:
+            print(f"ERROR: Profile {error_msg} not found!")
+            sys.exit(1)
+        print(f"Starting fleet with {len(fleet_profiles)} profiles")
+        with BinanceTrailingStopLossFleetManager(profiles=fleet_profiles,
+                                                 workers=options.workers,
+                                                 print_notifications=True,
+                                                 api_key=public_key,
+                                                 api_secret=private_key,
+                                                 send_to_email_address=send_to_email_address,
+                                                 send_from_email_address=send_from_email_address,
+                                                 send_from_email_password=send_from_email_password,
+                                                 send_from_email_server=send_from_email_server,
+                                                 send_from_email_port=int(send_from_email_port),
+                                                 telegram_bot_token=telegram_bot_token,
+                                                 telegram_send_to=telegram_send_to) as fleet:
+            fleet.start()
+            while fleet.is_manager_stopping() is False:
+                # This loop continues until all profiles of the fleet are finished
+                await asyncio.sleep(1)
+        sys.exit(0)
+
     # Load a profile is provided via argparse
     if options.profile is not None:
         # Loading profiles ini
@@ -503,6 +714,10 @@ async def cli():
                     keep_threshold = profiles[options.profile]['keep_threshold']
                 except KeyError:
                     pass
+                try:
+                    raw_price_feed = profiles[options.profile]['raw_price_feed']
+                except KeyError:
+                    pass
                 try:
                     reset_stop_loss_price = profiles[options.profile]['reset_stop_loss_price']
                 except KeyError:
@@ -515,6 +730,10 @@ async def cli():
                     market = profiles[options.profile]['market']
                 except KeyError:
                     pass
+                try:
+                    price_source = profiles[options.profile]['price_source']
+                except KeyError:
+                    pass
                 try:
                     stop_loss_limit = profiles[options.profile]['stop_loss_limit']
                 except KeyError:
@@ -531,6 +750,14 @@ async def cli():
                     stop_loss_price = float(profiles[options.profile]['stop_loss_price'])
                 except KeyError:
                     pass
+                try:
+                    stop_loss_update_interval = float(profiles[options.profile]['stop_loss_update_interval'])
+                except KeyError:
+                    pass
+                try:
+                    stop_loss_update_min_improvement = profiles[options.profile]['stop_loss_update_min_improvement']
+                except KeyError:
+                    pass
         except KeyError as error_msg:
             print(f"ERROR: Profile {error_msg} not found!")
             sys.exit(1)
@@ -550,26 +777,36 @@ async def cli():
         keep_threshold = options.keepthreshold
     if options.market is not None:
         market = options.market
+    if options.pricesource is not None:
+        price_source = options.pricesource
     if options.stoplosslimit is not None:
         stop_loss_limit = options.stoplosslimit
     if options.stoplossstartlimit is not None:
         stop_loss_start_limit = options.stoplossstartlimit
     if options.ordertype is not None:
         stop_loss_order_type = options.ordertype
+    if options.rawpricefeed is True:
+        raw_price_feed = True
     if options.resetstoplossprice is not None:
         reset_stop_loss_price = options.resetstoplossprice
     if options.stoplossprice is not None:
         stop_loss_price = options.stoplossprice
+    if options.stoplossupdateinterval is not None:
+        stop_loss_update_interval = options.stoplossupdateinterval
+    if options.stoplossminimprovement is not None:
+        stop_loss_update_min_improvement = options.stoplossminimprovement
     if options.test is not None:
         test = options.test
 
-    # Normalize `reset_stop_loss_price`
+    # Normalize `reset_stop_loss_price` and `raw_price_feed`
     if str(reset_stop_loss_price).upper() == "TRUE":
         reset_stop_loss_price = True
     else:
         reset_stop_loss_price = False
+    raw_price_feed = str(raw_price_feed).upper() == "TRUE"
 
     # Creating UBRA
+    from unicorn_binance_rest_api.manager import BinanceRestApiManager, BinanceAPIException
     ubra = BinanceRestApiManager(api_key=public_key, api_secret=private_key)
 
     if options.cancelopenorders is True:
@@ -616,6 +853,7 @@ async def cli():
         sys.exit(0)
 
     # Starting the Trailing Stop/Loss Engine
+    from unicorn_binance_trailing_stop_loss.manager import BinanceTrailingStopLossManager
     with BinanceTrailingStopLossManager(callback_error=callback_error,
                                         callback_finished=callback_finished,
                                         callback_partially_filled=None,
@@ -624,10 +862,15 @@ async def cli():
                                         borrow_threshold=borrow_threshold,
                                         engine=engine,
                                         exchange=exchange,
+                                        journal=options.journal,
                                         keep_threshold=keep_threshold,
                                         market=market,
+                                        metrics_port=options.metricsport,
+                                        price_source=price_source,
                                         print_notifications=True,
+                                        raw_price_feed=raw_price_feed,
                                         reset_stop_loss_price=reset_stop_loss_price,
+                                        rest_api_endpoint=options.restapiendpoint,
                                         send_to_email_address=send_to_email_address,
                                         send_from_email_address=send_from_email_address,
                                         send_from_email_password=send_from_email_password,
@@ -637,12 +880,15 @@ async def cli():
                                         stop_loss_order_type=stop_loss_order_type,
                                         stop_loss_price=stop_loss_price,
                                         stop_loss_start_limit=stop_loss_start_limit,
+                                        stop_loss_update_interval=stop_loss_update_interval,
+                                        stop_loss_update_min_improvement=stop_loss_update_min_improvement,
                                         telegram_bot_token=telegram_bot_token,
                                         telegram_send_to=telegram_send_to,
                                         test=test,
                                         ubra_manager=ubra,
                                         ubwa_manager=None,
-                                        warn_on_update=False) as ubtsl:
+                                        warn_on_update=False,
+                                        websocket_api_endpoint=options.websocketapiendpoint) as ubtsl:
         if test is None:
             # Catch Keyboard Interrupt only if there is no test running
             while ubtsl.is_manager_stopping() is False:
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/exchange_info_cache.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from .quantizer import SymbolQuantizer
+from unicorn_binance_rest_api import BinanceRestApiManager, BinanceAPIException
+from pathlib import Path
+from typing import Optional
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+
+class ExchangeInfoCache(object):
+    """
+    Persistent on-disk cache of the exchangeInfo symbols (including the PRICE_FILTER, LOT_SIZE and MIN_NOTIONAL filters)
+    and rate limits of an exchange.
+
+    Each symbol is stored in its own JSON file below `{cache_path}/{exchange}/` and is valid for `ttl` seconds. Symbols
+    are indexed by name in memory, so repeated lookups do not touch the disk or the Binance API. The `SymbolQuantizer`
+    of a symbol is built once per version of its filters. On exchanges that
+    support it, a missing symbol is downloaded alone, otherwise the full exchangeInfo is downloaded once and every
+    symbol of it is written to the cache.
+
+    :param exchange: The exchange of the cached data: binance.com, binance.com-testnet, binance.com-futures,
+                     binance.com-margin, binance.com-isolated_margin
+    :type exchange: str
+    :param ubra_manager: The `unicorn_binance_rest_api.manager` instance used to download the exchangeInfo.
+    :type ubra_manager: BinanceRestApiManager
+    :param cache_path: Path of the cache directory. Default is `~/.lucit/ubtsl_cache/`.
+    :type cache_path: str
+    :param ttl: Time to live of the cached data in seconds. Default is 3600.
+    :type ttl: int
+    """
+    def __init__(self,
+                 exchange: str = None,
+                 ubra_manager: BinanceRestApiManager = None,
+                 cache_path: str = None,
+                 ttl: int = 3600):
+        self.logger = __logger__
+        self.exchange = exchange
+        self.ubra = ubra_manager
+        if cache_path is None:
+            cache_path = f"{Path.home()}{os.sep}.lucit{os.sep}ubtsl_cache{os.sep}"
+        # Margin markets use the spot exchangeInfo, so they share its cache
+        if exchange == "binance.com-margin" or exchange == "binance.com-isolated_margin":
+            exchange_dir = "binance.com"
+        else:
+            exchange_dir = exchange
+        self.cache_path = os.path.join(cache_path, exchange_dir)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.quantizers: dict = {}
+        self.rate_limits: Optional[list] = None
+        self.symbols: dict = {}
+
+    def get_filters(self,
+                    symbol: str = None) -> Optional[dict]:
+        """
+        Get the filters of a symbol indexed by `filterType`.
+
+        :param symbol: The symbol, for example `BTCUSDT`.
+        :type symbol: str
+
+        :return: dict or None
+        """
+        symbol_info = self.get_symbol(symbol=symbol)
+        if symbol_info is None:
+            return None
+        return {item['filterType']: item for item in symbol_info.get('filters', [])}
+
+    def get_quantizer(self,
+                      symbol: str = None) -> Optional[SymbolQuantizer]:
+        """
+        Get the `SymbolQuantizer` of a symbol, it is rebuilt only if the cached filters got refreshed.
+
+        :param symbol: The symbol, for example `BTCUSDT`.
+        :type symbol: str
+
+        :return: SymbolQuantizer or None
+        """
+        filters = self.get_filters(symbol=symbol)
+        if filters is None:
+            return None
+        timestamp = self.symbols.get(symbol, {}).get('timestamp')
+        cached = self.quantizers.get(symbol)
+        if cached is None or cached['timestamp'] != timestamp:
+            cached = {'timestamp': timestamp, 'quantizer': SymbolQuantizer.from_filters(filters)}
+            self.quantizers[symbol] = cached
+        return cached['quantizer']
+
+    def get_rate_limits(self) -> Optional[list]:
+        """
+        Get the `rateLimits` of the exchange.
+
+        :return: list or None
+        """
+        if self.rate_limits is None:
+            cached = self.read_cache_file(name="_rate_limits")
+            if cached is None:
+                self.download()
+            else:
+                self.rate_limits = cached
+        return self.rate_limits
+
+    def get_symbol(self,
+                   symbol: str = None) -> Optional[dict]:
+        """
+        Get the exchangeInfo entry of a symbol.
+
+        :param symbol: The symbol, for example `BTCUSDT`.
+        :type symbol: str
+
+        :return: dict or None
+        """
+        cached = self.symbols.get(symbol)
+        if cached is not None and cached['timestamp'] + self.ttl > time.time():
+            return cached['data']
+        data = self.read_cache_file(name=symbol)
+        if data is None:
+            self.download(symbol=symbol)
+            cached = self.symbols.get(symbol)
+            if cached is None:
+                return None
+            return cached['data']
+        return data
+
+    def download(self,
+                 symbol: str = None) -> bool:
+        """
+        Download the exchangeInfo and store all received symbols and the rate limits in the cache.
+
+        :param symbol: Download only this symbol if the exchange supports it.
+        :type symbol: str
+
+        :return: bool
+        """
+        self.logger.info(f"ExchangeInfoCache.download() - Downloading exchangeInfo of {self.exchange} "
+                         f"(symbol={symbol})")
+        try:
+            if self.exchange == "binance.com-futures":
+                exchange_info = self.ubra.futures_exchange_info()
+            elif symbol is not None:
+                exchange_info = self.ubra.get_exchange_info(**{'symbol': symbol})
+            else:
+                exchange_info = self.ubra.get_exchange_info()
+        except BinanceAPIException as error_msg:
+            self.logger.error(f"ExchangeInfoCache.download() - {error_msg}")
+            return False
+        self.rate_limits = exchange_info.get('rateLimits', [])
+        self.write_cache_file(name="_rate_limits", data=self.rate_limits)
+        for item in exchange_info.get('symbols', []):
+            self.symbols[item['symbol']] = {'timestamp': time.time(), 'data': item}
+            self.write_cache_file(name=item['symbol'], data=item)
+        return True
+
+    def read_cache_file(self,
+                        name: str = None) -> Optional[dict]:
+        """
+        Read a cache file and add its content to the memory index if it is not expired.
+
+        :param name: Name of the cache file without extension.
+        :type name: str
+
+        :return: dict, list or None
+        """
+        file_path = os.path.join(self.cache_path, f"{name}.json")
+        try:
+            with open(file_path, "r") as fh_cache_file:
+                cached = json.load(fh_cache_file)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        if cached.get('timestamp', 0) + self.ttl < time.time():
+            self.logger.debug(f"ExchangeInfoCache.read_cache_file() - Cache file `{file_path}` is expired")
+            return None
+        if not name.startswith("_"):
+            self.symbols[name] = cached
+        return cached['data']
+
+    def write_cache_file(self,
+                         name: str = None,
+                         data=None) -> bool:
+        """
+        Write a cache file atomically, so parallel processes never read a partially written file.
+
+        :param name: Name of the cache file without extension.
+        :type name: str
+        :param data: JSON serializable data.
+        :type data: dict or list
+
+        :return: bool
+        """
+        try:
+            with self.lock:
+                os.makedirs(self.cache_path, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=self.cache_path, prefix=f".{name}.", suffix=".tmp")
+                with os.fdopen(fd, "w") as fh_cache_file:
+                    json.dump({'timestamp': time.time(), 'data': data}, fh_cache_file)
+                os.replace(tmp_path, os.path.join(self.cache_path, f"{name}.json"))
+        except OSError as error_msg:
+            self.logger.error(f"ExchangeInfoCache.write_cache_file() - {error_msg}")
+            return False
+        return True
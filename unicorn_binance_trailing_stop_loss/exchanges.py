@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/exchanges.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from .rate_limit_scheduler import PRIORITY_DEFAULT, PRIORITY_PROTECTIVE
+from typing import Optional, Union
+import logging
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+# Limits of the native trailing orders: `callbackRate` in percent on futures, `trailingDelta` in BIPS on spot if the
+# symbol has no `TRAILING_DELTA` filter
+NATIVE_TRAILING_CALLBACK_RATE_MAX = 10.0
+NATIVE_TRAILING_CALLBACK_RATE_MIN = 0.1
+NATIVE_TRAILING_DELTA_MAX = 2000
+NATIVE_TRAILING_DELTA_MIN = 10
+
+
+class ExchangeAdapter(object):
+    """
+    Operations of a `BinanceTrailingStopLossManager` that differ between the exchanges. The manager chooses its adapter
+    once with `get_exchange_adapter()`, so the per-call dispatch on the exchange string is gone and the responses are
+    normalized to the same records on all exchanges:
+
+        - symbol info: `base_asset` and `quote_asset` are added to the symbol info of the exchange
+        - balance: dict with the keys `asset`, `total` and `free`
+
+    This base class is used for unsupported exchanges, every operation logs the invalid exchange and returns None.
+
+    :param manager: The manager using the adapter, its `execute_rest_request()` is used for all REST requests.
+    :type manager: BinanceTrailingStopLossManager
+    :param exchange: The exchange.
+    :type exchange: str
+    """
+    # Capabilities of the exchange
+    balance_stream: bool = False
+    balance_total_includes_locked: bool = True
+    native_trailing_order_type: Optional[str] = None
+    supported: bool = False
+    supports_cancel_replace: bool = False
+
+    def __init__(self, manager=None, exchange: str = None):
+        self.logger = __logger__
+        self.exchange = exchange
+        self.manager = manager
+
+    def cancel_order(self, order_id: int = None) -> Optional[dict]:
+        """
+        Cancel an order of the market.
+
+        :param order_id: The `orderId`.
+        :type order_id: int
+
+        :return: dict or None
+        """
+        return self.log_invalid_exchange("cancel_order")
+
+    def cancel_replace_order(self, **params) -> Optional[dict]:
+        """
+        Cancel an order and place a new one with one atomic `order/cancelReplace` request with the
+        `PRIORITY_PROTECTIVE` priority. Only available if `supports_cancel_replace` is `True`.
+
+        :param params: The parameters of the request like `cancelOrderId`, `side`, `type`, `price` and `quantity`.
+
+        :return: dict or None
+        """
+        return self.log_invalid_exchange("cancel_replace_order")
+
+    def create_order(self, **params) -> Optional[dict]:
+        """
+        Create an order on the market with the `PRIORITY_PROTECTIVE` priority.
+
+        :param params: The order parameters like `side`, `type`, `price` and `quantity`.
+
+        :return: dict or None
+        """
+        return self.log_invalid_exchange("create_order")
+
+    def get_account_balance(self,
+                            asset: str = None,
+                            priority: int = PRIORITY_DEFAULT) -> Optional[dict]:
+        """
+        Request the balance of an asset from the account endpoint of the exchange.
+
+        :param asset: The asset.
+        :type asset: str
+        :param priority: Priority of the request in the `RateLimitScheduler`.
+        :type priority: int
+
+        :return: dict or None
+        """
+        return self.log_invalid_exchange("get_account_balance")
+
+    def get_native_trailing_order_parameters(self, percent: float = None) -> Optional[dict]:
+        """
+        Get the order parameters of a native trailing order with a trailing distance of `percent`.
+
+        :param percent: The trailing distance in percent.
+        :type percent: float
+
+        :return: dict or None
+        """
+        self.logger.error(f"ExchangeAdapter.get_native_trailing_order_parameters() - Native trailing orders are not "
+                          f"supported on `{self.exchange}`")
+        return None
+
+    def get_open_orders(self,
+                        market: str = None,
+                        priority: int = PRIORITY_DEFAULT) -> Optional[list]:
+        """
+        Request the open orders of a market.
+
+        :param market: The market.
+        :type market: str
+        :param priority: Priority of the request in the `RateLimitScheduler`.
+        :type priority: int
+
+        :return: list or None
+        """
+        return None
+
+    def get_symbol_info(self, symbol: str = None) -> Optional[dict]:
+        """
+        Get the symbol info with the normalized keys `base_asset` and `quote_asset`.
+
+        :param symbol: The symbol.
+        :type symbol: str
+
+        :return: dict or None
+        """
+        return None
+
+    def get_symbol_ticker(self) -> Optional[dict]:
+        """
+        Request the last price of the market.
+
+        :return: dict or None
+        """
+        return self.log_invalid_exchange("get_symbol_ticker")
+
+    def get_trading_fee(self, fee: float = None) -> float:
+        """
+        Get the trading fee in percent used to calculate the stop/loss quantity.
+
+        :param fee: The trading fee in percent without discount.
+        :type fee: float
+
+        :return: float
+        """
+        return 0
+
+    def get_user_stream_symbols(self) -> Union[str, bool]:
+        """
+        Get the `symbols` parameter of the userData stream.
+
+        :return: str or False
+        """
+        return False
+
+    def log_invalid_exchange(self, function_name: str = None) -> None:
+        """
+        Log and print that the exchange is not supported.
+
+        :return: None
+        """
+        self.logger.error(f"ExchangeAdapter.{function_name}() - Invalid exchange `{self.exchange}`")
+        if self.manager is not None and self.manager.print_notifications:
+            print(f"Invalid exchange `{self.exchange}`")
+        return None
+
+    @staticmethod
+    def normalize_symbol_info(symbol_info: Optional[dict] = None,
+                              base_asset_key: str = None,
+                              quote_asset_key: str = None) -> Optional[dict]:
+        """
+        Add `base_asset` and `quote_asset` to a symbol info.
+
+        :return: dict or None
+        """
+        if symbol_info is None:
+            return None
+        symbol_info = dict(symbol_info)
+        symbol_info['base_asset'] = symbol_info[base_asset_key]
+        symbol_info['quote_asset'] = symbol_info[quote_asset_key]
+        return symbol_info
+
+
+class SpotExchangeAdapter(ExchangeAdapter):
+    """
+    Adapter of binance.com and binance.com-testnet.
+
+    On spot the locked amount of the stop/loss order is not counted in the total, the stop/loss quantity is based on
+    the free amount.
+    """
+    balance_stream = True
+    balance_total_includes_locked = False
+    native_trailing_order_type = "STOP_LOSS"
+    supported = True
+    supports_cancel_replace = True
+
+    def cancel_order(self, order_id: int = None) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.cancel_order,
+                                                 priority=PRIORITY_PROTECTIVE,
+                                                 weight=1,
+                                                 symbol=self.manager.market,
+                                                 orderId=order_id)
+
+    def cancel_replace_order(self, **params) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.post_cancel_replace_order,
+                                                 priority=PRIORITY_PROTECTIVE,
+                                                 weight=1,
+                                                 orders=1,
+                                                 symbol=self.manager.market,
+                                                 **params)
+
+    def create_order(self, **params) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.create_order,
+                                                 priority=PRIORITY_PROTECTIVE,
+                                                 weight=1,
+                                                 orders=1,
+                                                 symbol=self.manager.market,
+                                                 **params)
+
+    def get_account_balance(self,
+                            asset: str = None,
+                            priority: int = PRIORITY_DEFAULT) -> Optional[dict]:
+        account_info = self.manager.execute_rest_request(self.manager.ubra.get_account,
+                                                         priority=priority,
+                                                         weight=20)
+        for item in account_info['balances']:
+            if item['asset'] == asset:
+                return {'asset': asset, 'total': float(item['free']), 'free': float(item['free'])}
+        return None
+
+    def get_native_trailing_order_parameters(self, percent: float = None) -> Optional[dict]:
+        delta_min = NATIVE_TRAILING_DELTA_MIN
+        delta_max = NATIVE_TRAILING_DELTA_MAX
+        symbol_filters = self.manager.exchange_info_cache.get_filters(symbol=self.manager.market)
+        if symbol_filters is not None and symbol_filters.get('TRAILING_DELTA') is not None:
+            # The stop price of a sell order is below the market price
+            delta_min = int(symbol_filters['TRAILING_DELTA']['minTrailingBelowDelta'])
+            delta_max = int(symbol_filters['TRAILING_DELTA']['maxTrailingBelowDelta'])
+        trailing_delta = min(max(int(round(percent * 100)), delta_min), delta_max)
+        if trailing_delta != round(percent * 100, 6):
+            self.logger.warning(f"SpotExchangeAdapter.get_native_trailing_order_parameters() - {percent}% is placed "
+                                f"as trailingDelta={trailing_delta} BIPS")
+        return {'type': "STOP_LOSS", 'trailingDelta': trailing_delta}
+
+    def get_open_orders(self,
+                        market: str = None,
+                        priority: int = PRIORITY_DEFAULT) -> Optional[list]:
+        return self.manager.execute_rest_request(self.manager.ubra.get_open_orders,
+                                                 priority=priority,
+                                                 weight=6,
+                                                 symbol=market)
+
+    def get_symbol_info(self, symbol: str = None) -> Optional[dict]:
+        return self.normalize_symbol_info(self.manager.exchange_info_cache.get_symbol(symbol=symbol),
+                                          base_asset_key="baseAsset",
+                                          quote_asset_key="quoteAsset")
+
+    def get_symbol_ticker(self) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.get_symbol_ticker,
+                                                 priority=PRIORITY_DEFAULT,
+                                                 weight=2,
+                                                 symbol=self.manager.market)
+
+    def get_trading_fee(self, fee: float = None) -> float:
+        return fee
+
+    def post_cancel_replace_order(self, **params) -> dict:
+        """
+        Send a signed `POST /api/v3/order/cancelReplace`. `unicorn-binance-rest-api` has no method for this endpoint, so
+        the request is sent with its request helper like its `create_order()` does it.
+
+        :param params: The parameters of the request.
+
+        :return: dict
+        """
+        return self.manager.ubra._post("order/cancelReplace", True, data=params)
+
+
+class FuturesExchangeAdapter(ExchangeAdapter):
+    """
+    Adapter of binance.com-futures. Futures accounts do not send `outboundAccountPosition` events.
+    """
+    balance_stream = False
+    native_trailing_order_type = "TRAILING_STOP_MARKET"
+    supported = True
+
+    def cancel_order(self, order_id: int = None) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.futures_cancel_order,
+                                                 priority=PRIORITY_PROTECTIVE,
+                                                 weight=1,
+                                                 symbol=self.manager.market,
+                                                 orderId=order_id)
+
+    def create_order(self, **params) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.futures_create_order,
+                                                 priority=PRIORITY_PROTECTIVE,
+                                                 weight=1,
+                                                 orders=1,
+                                                 symbol=self.manager.market,
+                                                 **params)
+
+    def get_account_balance(self,
+                            asset: str = None,
+                            priority: int = PRIORITY_DEFAULT) -> Optional[dict]:
+        account_info = self.manager.execute_rest_request(self.manager.ubra.futures_account,
+                                                         priority=priority,
+                                                         weight=5)
+        for item in account_info['assets']:
+            if item['asset'] == asset:
+                return {'asset': asset,
+                        'total': float(item['walletBalance']),
+                        'free': float(item['availableBalance'])}
+        return None
+
+    def get_native_trailing_order_parameters(self, percent: float = None) -> Optional[dict]:
+        callback_rate = min(max(round(percent, 1), NATIVE_TRAILING_CALLBACK_RATE_MIN),
+                            NATIVE_TRAILING_CALLBACK_RATE_MAX)
+        if callback_rate != round(percent, 6):
+            self.logger.warning(f"FuturesExchangeAdapter.get_native_trailing_order_parameters() - {percent}% is "
+                                f"placed as callbackRate={callback_rate}%")
+        # The order must not open a short position
+        return {'type': "TRAILING_STOP_MARKET", 'callbackRate': callback_rate, 'reduceOnly': "true"}
+
+    def get_open_orders(self,
+                        market: str = None,
+                        priority: int = PRIORITY_DEFAULT) -> Optional[list]:
+        return self.manager.execute_rest_request(self.manager.ubra.futures_get_open_orders,
+                                                 priority=priority,
+                                                 weight=1,
+                                                 symbol=market)
+
+    def get_symbol_info(self, symbol: str = None) -> Optional[dict]:
+        return self.normalize_symbol_info(self.manager.exchange_info_cache.get_symbol(symbol=symbol),
+                                          base_asset_key="baseAsset",
+                                          quote_asset_key="quoteAsset")
+
+    def get_symbol_ticker(self) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.futures_symbol_ticker,
+                                                 priority=PRIORITY_DEFAULT,
+                                                 weight=1,
+                                                 symbol=self.manager.market)
+
+    def get_trading_fee(self, fee: float = None) -> float:
+        return fee
+
+
+class MarginExchangeAdapter(ExchangeAdapter):
+    """
+    Adapter of binance.com-margin.
+    """
+    balance_stream = True
+    supported = True
+    # Extra parameters of all margin requests
+    margin_params: dict = {}
+
+    def cancel_order(self, order_id: int = None) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.cancel_margin_order,
+                                                 priority=PRIORITY_PROTECTIVE,
+                                                 weight=1,
+                                                 symbol=self.manager.market,
+                                                 orderId=order_id,
+                                                 **self.margin_params)
+
+    def create_order(self, **params) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.create_margin_order,
+                                                 priority=PRIORITY_PROTECTIVE,
+                                                 weight=6,
+                                                 orders=1,
+                                                 symbol=self.manager.market,
+                                                 **self.margin_params,
+                                                 **params)
+
+    def get_account_balance(self,
+                            asset: str = None,
+                            priority: int = PRIORITY_DEFAULT) -> Optional[dict]:
+        account_info = self.manager.execute_rest_request(self.manager.ubra.get_margin_account,
+                                                         priority=priority,
+                                                         weight=10)
+        for item in account_info['userAssets']:
+            if item['asset'] == asset:
+                return {'asset': asset,
+                        'total': float(item['free']) + float(item['locked']),
+                        'free': float(item['free'])}
+        return None
+
+    def get_open_orders(self,
+                        market: str = None,
+                        priority: int = PRIORITY_DEFAULT) -> Optional[list]:
+        return self.manager.execute_rest_request(self.manager.ubra.get_open_margin_orders,
+                                                 priority=priority,
+                                                 weight=10,
+                                                 symbol=market,
+                                                 **self.margin_params)
+
+    def get_symbol_info(self, symbol: str = None) -> Optional[dict]:
+        symbol_info = self.manager.execute_rest_request(self.manager.ubra.get_margin_symbol,
+                                                        priority=PRIORITY_DEFAULT,
+                                                        weight=10,
+                                                        symbol=symbol)
+        return self.normalize_symbol_info(symbol_info, base_asset_key="base", quote_asset_key="quote")
+
+    def get_symbol_ticker(self) -> Optional[dict]:
+        return self.manager.execute_rest_request(self.manager.ubra.get_symbol_ticker,
+                                                 priority=PRIORITY_DEFAULT,
+                                                 weight=2,
+                                                 symbol=self.manager.market)
+
+    def get_trading_fee(self, fee: float = None) -> float:
+        return fee / 100 * (100 - self.manager.trading_fee_discount_margin_percent)
+
+
+class IsolatedMarginExchangeAdapter(MarginExchangeAdapter):
+    """
+    Adapter of binance.com-isolated_margin. Every isolated margin symbol has its own userData stream.
+    """
+    margin_params = {'isIsolated': "TRUE"}
+
+    def get_account_balance(self,
+                            asset: str = None,
+                            priority: int = PRIORITY_DEFAULT) -> Optional[dict]:
+        account_info = self.manager.execute_rest_request(self.manager.ubra.get_isolated_margin_account,
+                                                         priority=priority,
+                                                         weight=10)
+        for item in account_info['assets']:
+            if item['baseAsset']['asset'] == asset:
+                return {'asset': asset,
+                        'total': float(item['baseAsset']['totalAsset']),
+                        'free': float(item['baseAsset']['free']),
+                        'interest': float(item['baseAsset']['interest'])}
+        return None
+
+    def get_symbol_info(self, symbol: str = None) -> Optional[dict]:
+        symbol_info = self.manager.execute_rest_request(self.manager.ubra.get_isolated_margin_symbol,
+                                                        priority=PRIORITY_DEFAULT,
+                                                        weight=10,
+                                                        symbol=symbol)
+        return self.normalize_symbol_info(symbol_info, base_asset_key="base", quote_asset_key="quote")
+
+    def get_user_stream_symbols(self) -> Union[str, bool]:
+        return self.manager.market
+
+
+EXCHANGE_ADAPTERS = {'binance.com': SpotExchangeAdapter,
+                     'binance.com-futures': FuturesExchangeAdapter,
+                     'binance.com-isolated_margin': IsolatedMarginExchangeAdapter,
+                     'binance.com-margin': MarginExchangeAdapter,
+                     'binance.com-testnet': SpotExchangeAdapter}
+
+
+def get_exchange_adapter(manager=None, exchange: str = None) -> ExchangeAdapter:
+    """
+    Get the adapter of an exchange. Unsupported exchanges get the `ExchangeAdapter` base class.
+
+    :param manager: The manager using the adapter.
+    :type manager: BinanceTrailingStopLossManager
+    :param exchange: The exchange.
+    :type exchange: str
+
+    :return: ExchangeAdapter
+    """
+    return EXCHANGE_ADAPTERS.get(exchange, ExchangeAdapter)(manager=manager, exchange=exchange)
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/fleet.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from .manager import BinanceTrailingStopLossManager
+from .portfolio_manager import BinanceTrailingStopLossPortfolioManager
+from .rate_limit_scheduler import set_rate_limit_utilization, DEFAULT_RATE_LIMIT_UTILIZATION
+from configparser import ConfigParser, ExtendedInterpolation
+from typing import Optional
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+# Profile keys of `ubtsl_profiles.ini` and their type
+PROFILE_KEYS = {'borrow_threshold': str,
+                'engine': str,
+                'exchange': str,
+                'keep_threshold': str,
+                'market': str,
+                'price_source': str,
+                'raw_price_feed': str,
+                'reset_stop_loss_price': str,
+                'stop_loss_limit': str,
+                'stop_loss_order_type': str,
+                'stop_loss_price': float,
+                'stop_loss_start_limit': str,
+                'stop_loss_update_interval': float,
+                'stop_loss_update_min_improvement': str}
+
+
+def get_profiles_from_ini(profiles_file: str = None,
+                          profile_names: Optional[list] = None) -> dict:
+    """
+    Load profiles from a `ubtsl_profiles.ini` file and map them to parameters of `BinanceTrailingStopLossManager`.
+
+    :param profiles_file: Path including filename of the profiles file.
+    :type profiles_file: str
+    :param profile_names: Names of the profiles to load. If None, all profiles are loaded.
+    :type profile_names: list or None
+
+    :return: dict (profile name -> dict of parameters)
+    """
+    profiles = ConfigParser(interpolation=ExtendedInterpolation())
+    profiles.read(profiles_file)
+    if profile_names is None:
+        profile_names = profiles.sections()
+    result = {}
+    for profile_name in profile_names:
+        if profile_name not in profiles:
+            raise KeyError(profile_name)
+        kwargs = {}
+        for key, value_type in PROFILE_KEYS.items():
+            if key in profiles[profile_name]:
+                kwargs[key] = value_type(profiles[profile_name][key])
+        kwargs['raw_price_feed'] = str(kwargs.get('raw_price_feed')).upper() == "TRUE"
+        kwargs['reset_stop_loss_price'] = str(kwargs.get('reset_stop_loss_price')).upper() == "TRUE"
+        result[profile_name] = kwargs
+    return result
+
+
+def run_fleet_worker(worker_id: int = None,
+                     command_queue: multiprocessing.Queue = None,
+                     event_queue: multiprocessing.Queue = None,
+                     shared_kwargs: dict = None,
+                     workers: int = 1) -> None:
+    """
+    Main function of a fleet worker process.
+
+    The worker hosts one `BinanceTrailingStopLossPortfolioManager` per exchange and price feed and executes the
+    commands of the supervisor: `('add', profile_name, kwargs)`, `('remove', profile_name)` and `('stop',)`. The
+    outcome of every profile is reported to the supervisor via `event_queue` as `(event, worker_id, profile_name,
+    message)`, a `remove` command is confirmed with the event `removed` after the order worker of the profile stopped.
+
+    binance.com-isolated_margin profiles are executed by a standalone `BinanceTrailingStopLossManager`, because every
+    isolated margin symbol has its own userData stream.
+
+    The workers share the rate limits of the account and IP, so each of them uses `1 / workers` of the share a single
+    process would use.
+
+    :return: None
+    """
+    logger = __logger__
+    set_rate_limit_utilization(DEFAULT_RATE_LIMIT_UTILIZATION / max(1, workers))
+    portfolios: dict = {}
+    managers: dict = {}
+
+    def get_callback(event: str = None, profile_name: str = None):
+        def callback(data=None):
+            event_queue.put((event, worker_id, profile_name, str(data)))
+        return callback
+
+    def add_profile(profile_name: str = None, kwargs: dict = None) -> None:
+        exchange = kwargs.get('exchange', "binance.com")
+        price_feed = (kwargs.get('price_source', "aggTrade"), kwargs.get('raw_price_feed', False))
+        callbacks = {'callback_error': get_callback("error", profile_name),
+                     'callback_finished': get_callback("finished", profile_name),
+                     'callback_partially_filled': get_callback("partially_filled", profile_name)}
+        try:
+            if exchange == "binance.com-isolated_margin":
+                managers[profile_name] = BinanceTrailingStopLossManager(warn_on_update=False,
+                                                                        **shared_kwargs,
+                                                                        **kwargs,
+                                                                        **callbacks)
+            else:
+                if (exchange, price_feed) not in portfolios:
+                    portfolio_kwargs = {key: value for key, value in shared_kwargs.items()
+                                        if key in ("api_key", "api_secret", "lucit_api_secret", "lucit_license_ini",
+                                                   "lucit_license_profile", "lucit_license_token")}
+                    portfolios[(exchange, price_feed)] = \
+                        BinanceTrailingStopLossPortfolioManager(exchange=exchange,
+                                                                price_source=price_feed[0],
+                                                                raw_price_feed=price_feed[1],
+                                                                warn_on_update=False,
+                                                                **portfolio_kwargs)
+                market_kwargs = {key: value for key, value in kwargs.items() if key != "exchange"}
+                market_kwargs.update({key: value for key, value in shared_kwargs.items()
+                                      if key.startswith("send_") or key.startswith("telegram_")})
+                manager = portfolios[(exchange, price_feed)].add_market(**market_kwargs, **callbacks)
+                if manager is None:
+                    raise ValueError(f"Market {kwargs.get('market')} is already trailed on {exchange}")
+                managers[profile_name] = manager
+        except Exception as error_msg:
+            logger.critical(f"run_fleet_worker() - Worker {worker_id} can not start profile {profile_name}: "
+                            f"{error_msg}")
+            event_queue.put(("error", worker_id, profile_name, str(error_msg)))
+
+    logger.info(f"run_fleet_worker() - Worker {worker_id} started with pid {os.getpid()}")
+    while True:
+        try:
+            command = command_queue.get(timeout=1)
+        except queue.Empty:
+            continue
+        if command[0] == "add":
+            add_profile(profile_name=command[1], kwargs=command[2])
+        elif command[0] == "remove":
+            manager = managers.pop(command[1], None)
+            if manager is not None:
+                if manager.is_manager_stopping() is False:
+                    manager.stop_manager()
+                if manager.order_worker is not None:
+                    manager.order_worker.join(timeout=10)
+            event_queue.put(("removed", worker_id, command[1], ""))
+        elif command[0] == "stop":
+            break
+    for manager in managers.values():
+        if manager.portfolio_manager is None and manager.is_manager_stopping() is False:
+            manager.stop_manager()
+    for portfolio in portfolios.values():
+        portfolio.stop_manager()
+    logger.info(f"run_fleet_worker() - Worker {worker_id} stopped")
+
+
+class BinanceTrailingStopLossFleetManager(threading.Thread):
+    """
+    Shard many profiles across a configurable number of worker processes to use all cores of a machine.
+
+    Each worker process hosts the markets of its shard on one `BinanceTrailingStopLossPortfolioManager` per exchange.
+    The supervisor thread restarts crashed workers with their shard and rebalances the shards when profiles finish, so
+    the number of markets per worker differs by at most one.
+
+    A profile moved by a rebalance is only resumed on its new worker after the old worker confirmed its removal, so two
+    workers never trail the same market at once.
+
+    Profiles that are resumed on a new worker (after a crash or a rebalance) are started with
+    `reset_stop_loss_price=False` and `jump-in-and-trail` profiles with the `trail` engine, so they take over their open
+    stop/loss order instead of buying again or resetting the stop/loss price.
+
+    :param profiles: Profile name -> parameters of `BinanceTrailingStopLossManager`, see `get_profiles_from_ini()`.
+    :type profiles: dict
+    :param workers: Number of worker processes. Default is the number of CPUs.
+    :type workers: int
+    :param print_notifications: If True the lib is printing user friendly information to terminal.
+    :type print_notifications: bool
+    :param restart_delay: Seconds to wait before a crashed worker gets restarted.
+    :type restart_delay: float
+    :param kwargs: Parameters shared by all profiles like `api_key`, `api_secret`, the notification settings and the
+                   LUCIT license settings.
+    """
+    def __init__(self,
+                 profiles: dict = None,
+                 workers: int = None,
+                 print_notifications: bool = False,
+                 restart_delay: float = 5.0,
+                 **kwargs):
+        super().__init__(name="ubtsl-fleet-supervisor")
+        self.logger = __logger__
+        self.event_queue: multiprocessing.Queue = multiprocessing.Queue()
+        # Profile name -> source and target worker of a rebalance waiting for the `removed` event of the source
+        self.handoffs: dict = {}
+        self.print_notifications = print_notifications
+        self.profiles = profiles
+        self.restart_delay = restart_delay
+        self.shared_kwargs = kwargs
+        self.stop_manager_request: bool = False
+        self.workers: list = []
+        workers = workers or os.cpu_count() or 1
+        workers = max(1, min(workers, len(self.profiles)))
+        for worker_id in range(workers):
+            self.workers.append({'command_queue': multiprocessing.Queue(),
+                                 'process': None,
+                                 'shard': set()})
+        for index, profile_name in enumerate(sorted(self.profiles.keys())):
+            self.workers[index % workers]['shard'].add(profile_name)
+
+    def __enter__(self):
+        self.logger.debug(f"Entering 'with-context' ...")
+        return self
+
+    def __exit__(self, exc_type, exc_value, error_traceback):
+        self.logger.debug(f"Leaving 'with-context' ...")
+        self.stop_manager()
+        if exc_type:
+            self.logger.critical(f"An exception occurred: {exc_type} - {exc_value} - {error_traceback}")
+
+    def complete_handoff(self, profile_name: str = None) -> bool:
+        """
+        Resume a profile moved by `rebalance_shards()` on its new worker, call it after the old worker confirmed the
+        removal or crashed.
+
+        :param profile_name: The profile.
+        :type profile_name: str
+
+        :return: bool
+        """
+        handoff = self.handoffs.pop(profile_name, None)
+        if handoff is None:
+            return False
+        target = self.workers[handoff['target']]
+        if profile_name not in target['shard']:
+            # Finished on the old worker in the meantime
+            return False
+        self.logger.info(f"BinanceTrailingStopLossFleetManager.complete_handoff() - Resuming profile "
+                         f"`{profile_name}` on worker {handoff['target']}")
+        target['command_queue'].put(("add", profile_name, self.get_resume_kwargs(profile_name)))
+        return True
+
+    def get_resume_kwargs(self, profile_name: str = None) -> dict:
+        """
+        Get the parameters to resume a profile on another worker process.
+
+        :param profile_name: The profile.
+        :type profile_name: str
+
+        :return: dict
+        """
+        kwargs = dict(self.profiles[profile_name])
+        if kwargs.get('engine') == "jump-in-and-trail":
+            # The profile already bought, only the trailing must continue
+            kwargs['engine'] = "trail"
+        kwargs['reset_stop_loss_price'] = False
+        kwargs['stop_loss_price'] = 0.0
+        return kwargs
+
+    def is_manager_stopping(self) -> bool:
+        """
+        Returns `True` if the manager has a stop request, 'False' if not.
+
+        :return: bool
+        """
+        return self.stop_manager_request
+
+    def process_events(self) -> None:
+        """
+        Process the events reported by the worker processes and remove finished and failed profiles from their shard.
+
+        :return: None
+        """
+        while True:
+            try:
+                event, worker_id, profile_name, message = self.event_queue.get_nowait()
+            except queue.Empty:
+                return None
+            if event == "removed":
+                self.logger.debug(f"BinanceTrailingStopLossFleetManager.process_events() - Worker {worker_id} removed "
+                                  f"profile `{profile_name}`")
+                handoff = self.handoffs.get(profile_name)
+                if handoff is not None and handoff['source'] == worker_id:
+                    self.complete_handoff(profile_name)
+                continue
+            msg = f"Profile `{profile_name}` on worker {worker_id}: {event} - {message}"
+            if event == "error":
+                self.logger.error(f"BinanceTrailingStopLossFleetManager.process_events() - {msg}")
+            else:
+                self.logger.info(f"BinanceTrailingStopLossFleetManager.process_events() - {msg}")
+            if self.print_notifications:
+                print(msg)
+            if event != "partially_filled":
+                self.workers[worker_id]['shard'].discard(profile_name)
+                self.workers[worker_id]['command_queue'].put(("remove", profile_name))
+                handoff = self.handoffs.get(profile_name)
+                if handoff is not None and handoff['source'] == worker_id:
+                    # The profile ended before the old worker removed it, nothing to resume
+                    del self.handoffs[profile_name]
+                    self.workers[handoff['target']]['shard'].discard(profile_name)
+
+    def rebalance_shards(self) -> None:
+        """
+        Move profiles from the largest to the smallest shard until they differ by at most one profile.
+
+        The old worker gets the `remove` command, the new worker gets the `add` command by `complete_handoff()` as soon
+        as the old worker confirmed the removal.
+
+        :return: None
+        """
+        while True:
+            largest = max(self.workers, key=lambda worker: len(worker['shard']))
+            smallest = min(self.workers, key=lambda worker: len(worker['shard']))
+            if len(largest['shard']) - len(smallest['shard']) <= 1:
+                return None
+            movable = largest['shard'].difference(self.handoffs)
+            if not movable:
+                return None
+            profile_name = sorted(movable)[-1]
+            self.logger.info(f"BinanceTrailingStopLossFleetManager.rebalance_shards() - Moving profile "
+                             f"`{profile_name}` to worker {self.workers.index(smallest)}")
+            largest['shard'].discard(profile_name)
+            largest['command_queue'].put(("remove", profile_name))
+            smallest['shard'].add(profile_name)
+            self.handoffs[profile_name] = {'source': self.workers.index(largest),
+                                           'target': self.workers.index(smallest)}
+
+    def run(self) -> None:
+        """
+        Supervisor: Start the worker processes, restart crashed workers and rebalance the shards until all profiles
+        are finished or the manager gets stopped.
+
+        :return: None
+        """
+        for worker_id in range(len(self.workers)):
+            self.start_worker(worker_id=worker_id, resume=False)
+        while self.is_manager_stopping() is False:
+            time.sleep(1)
+            self.process_events()
+            for worker_id, worker in enumerate(self.workers):
+                if worker['process'].is_alive() is False and self.is_manager_stopping() is False:
+                    msg = f"Worker {worker_id} crashed with exitcode {worker['process'].exitcode}, restarting it"
+                    self.logger.critical(f"BinanceTrailingStopLossFleetManager.run() - {msg}")
+                    if self.print_notifications:
+                        print(msg)
+                    for profile_name, handoff in list(self.handoffs.items()):
+                        if handoff['source'] == worker_id:
+                            # The crashed worker does not trail the moved profile anymore
+                            self.complete_handoff(profile_name)
+                    time.sleep(self.restart_delay)
+                    self.start_worker(worker_id=worker_id, resume=True)
+            self.rebalance_shards()
+            if not any(worker['shard'] for worker in self.workers):
+                self.logger.info(f"BinanceTrailingStopLossFleetManager.run() - All profiles are finished")
+                self.stop_manager()
+
+    def start_worker(self,
+                     worker_id: int = None,
+                     resume: bool = False) -> bool:
+        """
+        Start a worker process and send it the profiles of its shard.
+
+        :param worker_id: The index of the worker.
+        :type worker_id: int
+        :param resume: Set to True if the profiles of the shard were already started before.
+        :type resume: bool
+
+        :return: bool
+        """
+        worker = self.workers[worker_id]
+        worker['command_queue'] = multiprocessing.Queue()
+        worker['process'] = multiprocessing.Process(target=run_fleet_worker,
+                                                    args=(worker_id, worker['command_queue'], self.event_queue,
+                                                          self.shared_kwargs, len(self.workers)),
+                                                    name=f"ubtsl-fleet-worker-{worker_id}",
+                                                    daemon=True)
+        worker['process'].start()
+        for profile_name in sorted(worker['shard'].difference(self.handoffs)):
+            if resume is True:
+                kwargs = self.get_resume_kwargs(profile_name)
+            else:
+                kwargs = dict(self.profiles[profile_name])
+            worker['command_queue'].put(("add", profile_name, kwargs))
+        self.logger.info(f"BinanceTrailingStopLossFleetManager.start_worker() - Worker {worker_id} started with "
+                         f"{len(worker['shard'])} profiles")
+        return True
+
+    def stop_manager(self, timeout: float = 30.0) -> bool:
+        """
+        Stop all worker processes. The open stop/loss orders stay on the exchange.
+
+        :param timeout: Seconds to wait for each worker before it gets terminated.
+        :type timeout: float
+
+        :return: bool
+        """
+        self.logger.info(f"BinanceTrailingStopLossFleetManager.stop_manager() - Gracefully stopping the fleet")
+        self.stop_manager_request = True
+        for worker in self.workers:
+            if worker['process'] is not None and worker['process'].is_alive():
+                worker['command_queue'].put(("stop",))
+        for worker in self.workers:
+            if worker['process'] is not None:
+                worker['process'].join(timeout=timeout)
+                if worker['process'].is_alive():
+                    worker['process'].terminate()
+        return True
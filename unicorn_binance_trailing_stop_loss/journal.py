@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/journal.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from typing import Optional
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+
+class BinanceTrailingStopLossJournal(object):
+    """
+    Crash-safe append-only journal of the state of one trailed market.
+
+    Every change is appended as one JSON line: `stop_loss_price`, `order` (placed stop/loss order with id, price and
+    quantity), `balance`, `filled` and `reset`. Records written with `sync=True` are fsynced before `append()`
+    returns, all others are fsynced in batches by a background thread at most `fsync_interval` seconds later. After
+    `compaction_threshold` records the journal is rewritten atomically as a single `snapshot` record.
+
+    `open()` replays the journal and returns the restored state. A torn last line of a crash during a write is cut off.
+
+    :param file_path: Path including filename of the journal.
+    :type file_path: str
+    :param fsync_interval: Maximum delay in seconds of the fsync of records written with `sync=False`.
+    :type fsync_interval: float
+    :param compaction_threshold: Number of records after which the journal gets compacted.
+    :type compaction_threshold: int
+    """
+    def __init__(self,
+                 file_path: str = None,
+                 fsync_interval: float = 0.1,
+                 compaction_threshold: int = 1000):
+        self.logger = __logger__
+        self.compaction_threshold = compaction_threshold
+        self.file_path = os.path.abspath(file_path)
+        self.fh_journal = None
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.records: int = 0
+        self.state: dict = self.get_empty_state()
+        self.stop_request: bool = False
+        self.sync_request = threading.Event()
+        self.sync_thread: Optional[threading.Thread] = None
+        self.unsynced: bool = False
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, error_traceback):
+        self.close()
+
+    @staticmethod
+    def apply_record(state: dict = None,
+                     record: dict = None) -> dict:
+        """
+        Apply a journal record to a state.
+
+        :param state: The state of `get_empty_state()`.
+        :type state: dict
+        :param record: The journal record.
+        :type record: dict
+
+        :return: dict
+        """
+        record_type = record.get('type')
+        if record_type == "snapshot":
+            state = copy.deepcopy(record['state'])
+        elif record_type == "reset":
+            state = BinanceTrailingStopLossJournal.get_empty_state()
+        elif record_type == "stop_loss_price":
+            state['stop_loss_price'] = record['stop_loss_price']
+        elif record_type == "order":
+            state['stop_loss_order_id'] = record['order_id']
+            state['stop_loss_price'] = record['stop_loss_price']
+            state['stop_loss_quantity'] = record['stop_loss_quantity']
+        elif record_type == "balance":
+            state['balances'][record['asset']] = {'total': record['total'], 'free': record['free']}
+        elif record_type == "filled":
+            state['finished'] = True
+        state['update_time'] = record.get('time', state.get('update_time'))
+        return state
+
+    def append(self,
+               record_type: str = None,
+               sync: bool = False,
+               **data) -> bool:
+        """
+        Append a record to the journal.
+
+        :param record_type: `stop_loss_price`, `order`, `balance`, `filled` or `reset`
+        :type record_type: str
+        :param sync: Fsync before returning, use it for records that must survive a crash right away.
+        :type sync: bool
+        :param data: The fields of the record.
+
+        :return: bool
+        """
+        record = {'type': record_type, 'time': time.time(), **data}
+        with self.lock:
+            if self.fh_journal is None:
+                return False
+            self.state = self.apply_record(self.state, record)
+            try:
+                self.fh_journal.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+                self.fh_journal.flush()
+                self.records += 1
+                if sync is True:
+                    os.fsync(self.fh_journal.fileno())
+                    self.unsynced = False
+                else:
+                    self.unsynced = True
+            except OSError as error_msg:
+                self.logger.error(f"BinanceTrailingStopLossJournal.append() - {error_msg}")
+                return False
+            compaction_due = self.records >= self.compaction_threshold
+        if compaction_due is True:
+            self.compact()
+        elif sync is False:
+            self.sync_request.set()
+        return True
+
+    def close(self) -> bool:
+        """
+        Fsync and close the journal.
+
+        :return: bool
+        """
+        self.stop_request = True
+        self.sync_request.set()
+        with self.lock:
+            if self.fh_journal is None:
+                return False
+            try:
+                os.fsync(self.fh_journal.fileno())
+            except OSError as error_msg:
+                self.logger.error(f"BinanceTrailingStopLossJournal.close() - {error_msg}")
+            self.fh_journal.close()
+            self.fh_journal = None
+        return True
+
+    def compact(self) -> bool:
+        """
+        Rewrite the journal atomically as a single `snapshot` record of the current state.
+
+        :return: bool
+        """
+        with self.lock:
+            if self.fh_journal is None:
+                return False
+            record = {'type': "snapshot", 'time': time.time(), 'state': self.state}
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.file_path),
+                                                prefix=f".{os.path.basename(self.file_path)}.", suffix=".tmp")
+                with os.fdopen(fd, "wb") as fh_tmp:
+                    fh_tmp.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+                    fh_tmp.flush()
+                    os.fsync(fh_tmp.fileno())
+                self.fh_journal.close()
+                os.replace(tmp_path, self.file_path)
+                self.sync_directory()
+                self.fh_journal = open(self.file_path, "ab")
+            except OSError as error_msg:
+                self.logger.error(f"BinanceTrailingStopLossJournal.compact() - {error_msg}")
+                if self.fh_journal.closed:
+                    self.fh_journal = open(self.file_path, "ab")
+                return False
+            self.records = 1
+            self.unsynced = False
+        self.logger.debug(f"BinanceTrailingStopLossJournal.compact() - Compacted `{self.file_path}`")
+        return True
+
+    @staticmethod
+    def get_empty_state() -> dict:
+        """
+        Get the state of an empty journal.
+
+        :return: dict
+        """
+        return {'balances': {},
+                'finished': False,
+                'stop_loss_order_id': None,
+                'stop_loss_price': None,
+                'stop_loss_quantity': None,
+                'update_time': None}
+
+    def get_state(self) -> dict:
+        """
+        Get a copy of the current state.
+
+        :return: dict
+        """
+        with self.lock:
+            return copy.deepcopy(self.state)
+
+    def open(self) -> dict:
+        """
+        Replay the journal, open it for appending and start the fsync thread.
+
+        :return: dict (the restored state)
+        """
+        os.makedirs(os.path.dirname(self.file_path), exist_ok=True)
+        with self.lock:
+            self.state, self.records = self.replay(file_path=self.file_path)
+            self.fh_journal = open(self.file_path, "ab")
+        self.stop_request = False
+        self.sync_thread = threading.Thread(target=self.process_sync,
+                                            name=f"ubtsl-journal-{os.path.basename(self.file_path)}",
+                                            daemon=True)
+        self.sync_thread.start()
+        self.logger.info(f"BinanceTrailingStopLossJournal.open() - Replayed {self.records} records of "
+                         f"`{self.file_path}`: {self.state}")
+        return copy.deepcopy(self.state)
+
+    def process_sync(self) -> None:
+        """
+        Fsync thread: batch the fsyncs of the records written with `sync=False`.
+
+        :return: None
+        """
+        while self.stop_request is False:
+            self.sync_request.wait()
+            self.sync_request.clear()
+            if self.stop_request is True:
+                break
+            time.sleep(self.fsync_interval)
+            self.sync()
+
+    @staticmethod
+    def replay(file_path: str = None) -> tuple:
+        """
+        Read a journal and build its state. A torn or corrupt record ends the replay and the file is truncated behind
+        the last valid record.
+
+        :param file_path: Path including filename of the journal.
+        :type file_path: str
+
+        :return: tuple (state, number of records)
+        """
+        state = BinanceTrailingStopLossJournal.get_empty_state()
+        records = 0
+        valid_size = 0
+        try:
+            with open(file_path, "rb") as fh_journal:
+                for line in fh_journal:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("Incomplete record")
+                        record = json.loads(line)
+                    except ValueError as error_msg:
+                        __logger__.warning(f"BinanceTrailingStopLossJournal.replay() - Cutting `{file_path}` at "
+                                           f"byte {valid_size}: {error_msg}")
+                        break
+                    state = BinanceTrailingStopLossJournal.apply_record(state, record)
+                    records += 1
+                    valid_size += len(line)
+        except FileNotFoundError:
+            return state, 0
+        if valid_size < os.path.getsize(file_path):
+            os.truncate(file_path, valid_size)
+        return state, records
+
+    def reset(self) -> bool:
+        """
+        Forget the state, for example after the stop/loss order got filled or `reset_stop_loss_price` is used.
+
+        :return: bool
+        """
+        if self.append("reset", sync=True) is False:
+            return False
+        return self.compact()
+
+    def sync(self) -> bool:
+        """
+        Fsync the records written with `sync=False`.
+
+        :return: bool
+        """
+        with self.lock:
+            if self.fh_journal is None or self.unsynced is False:
+                return False
+            try:
+                os.fsync(self.fh_journal.fileno())
+            except OSError as error_msg:
+                self.logger.error(f"BinanceTrailingStopLossJournal.sync() - {error_msg}")
+                return False
+            self.unsynced = False
+        return True
+
+    def sync_directory(self) -> None:
+        """
+        Fsync the directory of the journal to persist a rename. Not supported on Windows.
+
+        :return: None
+        """
+        try:
+            fd = os.open(os.path.dirname(self.file_path), os.O_RDONLY)
+        except (OSError, AttributeError):
+            return None
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
@@ -18,27 +18,56 @@
 # Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
 # All rights reserved.
 
-from .licensing_manager import LucitLicensingManager, NoValidatedLucitLicense
+from . import __app_name__, __version__
+from .exchange_info_cache import ExchangeInfoCache
+from .exchanges import get_exchange_adapter, ExchangeAdapter
+from .journal import BinanceTrailingStopLossJournal
+from .licensing_exceptions import NoValidatedLucitLicense
+from .metrics import measure_duration, start_metrics_server, FUNCTION_DURATION, ORDER_RETRIES, \
+    REST_REQUEST_DURATION, REST_REQUEST_ERRORS, STOP_LOSS_UPDATES, STREAM_LAG, TICKS_RECEIVED, USED_WEIGHT
+from .notifications import get_notification_dispatcher, BinanceTrailingStopLossNotificationDispatcher, \
+    CHANNEL_EMAIL, CHANNEL_TELEGRAM
+from .quantizer import SymbolQuantizer
+from .rate_limit_scheduler import get_rate_limit_scheduler, PRIORITY_DEFAULT, PRIORITY_RECONCILIATION, \
+    RateLimitScheduler
 from unicorn_binance_rest_api import BinanceRestApiManager, BinanceAPIException
-from unicorn_binance_websocket_api import BinanceWebSocketApiManager, UnknownExchange
-from typing import Optional, Union
+from pathlib import Path
+from typing import Optional, Union, TYPE_CHECKING
+import concurrent.futures
 import cython
-import datetime
 import logging
 import math
+import os
 import platform
-import smtplib
+import re
 import requests
-import socket
-import ssl
 import sys
 import threading
 import time
 
-__app_name__ = "unicorn-binance-trailing-stop-loss"
-__version__ = "1.1.0.dev"
+if TYPE_CHECKING:
+    # The licensing client and the websocket client are imported in `__init__()` only if the instances are not
+    # provided, the static methods and the CLI paths without engine do not need them.
+    from .licensing_manager import LucitLicensingManager
+    from unicorn_binance_websocket_api import BinanceWebSocketApiManager
+
 __logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
 
+# Channels of the price sources: the best bid of `bookTicker` is the price a stop/loss can sell at, `kline_1s` (spot
+# and margin only) and `miniTicker` push the close price once per second and `markPrice` (futures only) the mark price
+PRICE_SOURCE_CHANNELS = {'aggTrade': "aggTrade",
+                         'bookTicker': "bookTicker",
+                         'kline_1s': "kline_1s",
+                         'markPrice': "markPrice@1s",
+                         'miniTicker': "miniTicker"}
+
+# Keys of the price in the raw frames of the price sources, the raw price feed reads the value behind them
+RAW_PRICE_SOURCE_KEYS = {'aggTrade': '"p":',
+                         'bookTicker': '"b":',
+                         'kline_1s': '"c":',
+                         'markPrice': '"p":',
+                         'miniTicker': '"c":'}
+
 
 class BinanceTrailingStopLossManager(threading.Thread):
     """
@@ -59,6 +88,11 @@ class BinanceTrailingStopLossManager(threading.Thread):
     :type api_key: str
     :param api_secret: Provide the Binance API secret.
     :type api_secret: str
+    :param balance_reconciliation_interval: The balance of the stop/loss asset is maintained locally by the
+                                            `outboundAccountPosition` events of the userData stream. Every
+                                            `balance_reconciliation_interval` seconds it gets reconciled via REST.
+                                            Default is 300.
+    :type balance_reconciliation_interval: float
     :param borrow_threshold: Provide the private Binance key.
     :type borrow_threshold: str
     :param callback_error: Callback function used if an error occurs.
@@ -69,21 +103,48 @@ class BinanceTrailingStopLossManager(threading.Thread):
     :type callback_partially_filled: function or None
     :param disable_colorama: set to True to disable the use of `colorama <https://pypi.org/project/colorama/>`_
     :type disable_colorama: bool
-    :param engine: Option `trail` (default) for standard trailing stop/loss or `jump-in-and-trail` to activate smart
-                   entry function.
+    :param engine: Option `trail` (default) for standard trailing stop/loss, `jump-in-and-trail` to activate smart
+                   entry function or `native-trail` to place one native trailing order that is trailed by the exchange
+                   (binance.com, binance.com-testnet and binance.com-futures). The `native-trail` engine subscribes no
+                   price feed and sends no REST requests per tick, it only watches the userData stream for the fill.
     :type engine: str
     :param exchange: Choose the exchange endpoint: binance.com, binance.com-futures, binance.com-margin,
                      binance.com-isolated_margin
     :type exchange: str
+    :param exchange_info_cache_ttl: Time to live in seconds of the exchangeInfo symbol data cached in
+                                    `~/.lucit/ubtsl_cache/`. Default is 3600.
+    :type exchange_info_cache_ttl: int
+    :param journal: Write the stop/loss price, the order id and quantity, the fills and the balances to a crash-safe
+                    journal per market and restore them on the next start without discovery REST calls. Default is
+                    False.
+    :type journal: bool
+    :param journal_path: Path of the journal directory. Default is `~/.lucit/ubtsl_journal/`.
+    :type journal_path: str
     :param keep_threshold: If empty we sell the full balance, use integer or percent values.
     :type keep_threshold: str
     :param market: The market to enforce stop/loss.
     :type market: str
+    :param metrics_port: Collect latency and throughput metrics and serve them in the Prometheus text format on
+                         `http://127.0.0.1:<metrics_port>/metrics`. All managers of a process share one endpoint.
+                         Default is None (no metrics).
+    :type metrics_port: int
+    :param price_source: The stream the stop/loss price is trailed on: `aggTrade` (price of the last trade, default),
+                         `bookTicker` (best bid), `kline_1s` (close price, updated every second, not available on
+                         binance.com-futures), `miniTicker` (close price, updated every second) or `markPrice` (mark
+                         price, updated every second, only binance.com-futures).
+    :type price_source: str
     :param print_notifications: If True the lib is printing user friendly information to terminal.
     :type print_notifications: bool
+    :param raw_price_feed: Receive the raw frames of the price feed and read only the price (and the event time if
+                           metrics are enabled) with a targeted scan instead of converting every frame with UnicornFy.
+                           Default is False.
+    :type raw_price_feed: bool
     :param reset_stop_loss_price: Reset an existing stop_loss_price and calculate a new one. Only True is True, anything
                                   else is False!
     :type reset_stop_loss_price: bool
+    :param rest_api_endpoint: Base URL of a REST API that replaces the endpoint of the exchange, for example the one of
+                              `BinanceMockExchange.get_rest_api_endpoint()`. Default is None.
+    :type rest_api_endpoint: str
     :param send_to_email_address: Email address of receiver
     :type send_to_email_address: str
     :param send_from_email_address: Email address of sender
@@ -110,6 +171,14 @@ class BinanceTrailingStopLossManager(threading.Thread):
     :type stop_loss_start_limit: str
     :param stop_loss_trigger_gap: Gap between stopPrice and limit order price, use integer or percent values.
     :type stop_loss_trigger_gap: str
+    :param stop_loss_update_interval: Minimum time in seconds between two replacements of the stop/loss order. Price
+                                      updates received in the meantime are coalesced and only the newest stop/loss
+                                      price gets placed. Default is 0.0 (no throttling).
+    :type stop_loss_update_interval: float
+    :param stop_loss_update_min_improvement: Minimum improvement of the stop/loss price that is needed to replace the
+                                             order, use integer, percent (`0.05%`), basis points (`5bps`) or ticks
+                                             (`3ticks`) values. Default is None (every improvement is used).
+    :type stop_loss_update_min_improvement: str
     :param test: Use this to test specific systems like "notification", "binance-connectivity" and "streams". The
                  streams test needs a valid exchange and market. If test is not None the engine will NOT start! It
                  only tests!
@@ -123,6 +192,9 @@ class BinanceTrailingStopLossManager(threading.Thread):
     :type trading_fee_use_bnb: bool
     :param warn_on_update: set to `False` to disable the update warning
     :type warn_on_update: bool
+    :param websocket_api_endpoint: Base URL of a websocket API that replaces the endpoint of the exchange, for example
+                                   the one of `BinanceMockExchange.get_websocket_api_endpoint()`. Default is None.
+    :type websocket_api_endpoint: str
     :param lucit_api_secret: The `api_secret` of your UNICORN Binance Suite license from
                              https://shop.lucit.services/software/unicorn-binance-suite
     :type lucit_api_secret:  str
@@ -134,6 +206,11 @@ class BinanceTrailingStopLossManager(threading.Thread):
     :param lucit_license_token: The `license_token` of your UNICORN Binance Suite license from
                                 https://shop.lucit.services/software/unicorn-binance-suite
     :type lucit_license_token:  str
+    :param llm_manager: Provide a shared `LucitLicensingManager` instance.
+    :type llm_manager: LucitLicensingManager
+    :param portfolio_manager: Used by `BinanceTrailingStopLossPortfolioManager` for the managers of its markets. The
+                              streams, the ubra, the ubwa and the llm instance are owned by the portfolio manager.
+    :type portfolio_manager: BinanceTrailingStopLossPortfolioManager
     :param ubra_manager: Provide a shared unicorn_binance_rest_api.manager instance
     :type ubra_manager: BinanceRestApiManager
     :param ubwa_manager: Provide a shared unicorn_binance_websocket_api.manager instance.
@@ -143,6 +220,7 @@ class BinanceTrailingStopLossManager(threading.Thread):
     def __init__(self,
                  api_key: str = None,
                  api_secret: str = None,
+                 balance_reconciliation_interval: float = 300.0,
                  borrow_threshold: str = None,
                  callback_error: Optional[type(abs)] = None,
                  callback_finished: Optional[type(abs)] = None,
@@ -150,10 +228,17 @@ class BinanceTrailingStopLossManager(threading.Thread):
                  disable_colorama: bool = False,
                  engine: str = "trail",
                  exchange: str = "binance.com",
+                 exchange_info_cache_ttl: int = 3600,
+                 journal: bool = False,
+                 journal_path: Optional[str] = None,
                  keep_threshold: str = None,
                  market: str = None,
+                 metrics_port: Optional[int] = None,
+                 price_source: str = "aggTrade",
                  print_notifications: bool = False,
+                 raw_price_feed: bool = False,
                  reset_stop_loss_price: bool = False,
+                 rest_api_endpoint: Optional[str] = None,
                  send_to_email_address: str = None,
                  send_from_email_address: str = None,
                  send_from_email_password: str = None,
@@ -165,6 +250,8 @@ class BinanceTrailingStopLossManager(threading.Thread):
                  stop_loss_price: float = None,
                  stop_loss_start_limit: str = None,
                  stop_loss_trigger_gap: str = "0.01",
+                 stop_loss_update_interval: float = 0.0,
+                 stop_loss_update_min_improvement: str = None,
                  telegram_bot_token: str = None,
                  telegram_send_to: str = None,
                  test: str = None,
@@ -177,9 +264,12 @@ class BinanceTrailingStopLossManager(threading.Thread):
                  lucit_license_ini: str = None,
                  lucit_license_profile: str = None,
                  lucit_license_token: str = None,
+                 llm_manager: Optional["LucitLicensingManager"] = None,
+                 portfolio_manager=None,
                  ubra_manager: Optional[Union[BinanceRestApiManager]] = None,
-                 ubwa_manager: Optional[Union[BinanceWebSocketApiManager]] = None,
-                 warn_on_update=True):
+                 ubwa_manager: Optional[Union["BinanceWebSocketApiManager"]] = None,
+                 warn_on_update=True,
+                 websocket_api_endpoint: Optional[str] = None):
         threading.Thread.__init__(self)
         self.name = __app_name__
         self.logger = __logger__
@@ -188,6 +278,10 @@ class BinanceTrailingStopLossManager(threading.Thread):
                          f"{str(platform.system())} {str(platform.release())} for exchange {exchange} started")
         self.api_key = api_key
         self.api_secret = api_secret
+        self.balance_book: dict = {}
+        self.balance_book_last_reconciliation: float = 0.0
+        self.balance_book_valid = threading.Event()
+        self.balance_reconciliation_interval: float = float(balance_reconciliation_interval)
         self.borrow_threshold = borrow_threshold
         self.callback_error = callback_error
         self.callback_finished = callback_finished
@@ -195,14 +289,51 @@ class BinanceTrailingStopLossManager(threading.Thread):
         self.current_price: float = 0.0
         self.engine = engine
         self.exchange = exchange
+        # Chosen once, the exchange specific operations do not need to dispatch on `exchange` anymore
+        self.exchange_adapter: ExchangeAdapter = get_exchange_adapter(manager=self, exchange=exchange)
         self.exchange_info: dict = {}
+        self.journal: Optional[BinanceTrailingStopLossJournal] = None
+        if journal is True:
+            if journal_path is None:
+                journal_path = f"{Path.home()}{os.sep}.lucit{os.sep}ubtsl_journal{os.sep}"
+            journal_file = f"{re.sub(r'[^A-Za-z0-9.]+', '_', f'{exchange}_{market}')}.jsonl"
+            self.journal = BinanceTrailingStopLossJournal(file_path=os.path.join(journal_path, journal_file))
         self.keep_threshold = keep_threshold
         self.last_update_check_github = {'timestamp': time.time(), 'status': {'tag_name': None}}
+        self.notification_dispatcher: Optional[BinanceTrailingStopLossNotificationDispatcher] = None
+        self.metrics_enabled: bool = metrics_port is not None
+        self.metrics_port = metrics_port
+        # Values of the hot path metrics are looked up once
+        self.metric_price_feed_duration = FUNCTION_DURATION.labels(market, "process_price_feed_stream") \
+            if self.metrics_enabled else None
+        self.metric_price_feed_lag = STREAM_LAG.labels(market, "price_feed") if self.metrics_enabled else None
+        self.metric_ticks_received = TICKS_RECEIVED.labels(market) if self.metrics_enabled else None
+        self.metric_userdata_lag = STREAM_LAG.labels(market, "userdata") if self.metrics_enabled else None
         self.lock_create_stop_loss_order = threading.Lock()
-        self.precision_price: int = 8
-        self.precision_quantity: int = 8
+        self.lock_stop_loss_price_pending = threading.Lock()
+        self.order_worker: Optional[threading.Thread] = None
+        self.portfolio_manager = portfolio_manager
+        self.price_feed_ready = threading.Event()
+        # Set by `load_startup_state()`, the order worker does not place orders before
+        self.startup_complete = threading.Event()
+        if price_source not in PRICE_SOURCE_CHANNELS:
+            raise ValueError(f"BinanceTrailingStopLossManager() - Unknown `price_source` '{price_source}', use one of "
+                             f"{', '.join(PRICE_SOURCE_CHANNELS)}")
+        if (price_source == "markPrice" and exchange != "binance.com-futures") or \
+                (price_source == "kline_1s" and exchange == "binance.com-futures"):
+            raise ValueError(f"BinanceTrailingStopLossManager() - `price_source` '{price_source}' is not supported "
+                             f"for exchange '{exchange}'")
+        self.price_source = price_source
+        # Resolved once, the price feed calls it on every tick
+        self.price_extractor = self.get_price_extractor(price_source=price_source)
         self.print_notifications = print_notifications
+        # Replaced by the quantizer of the filters of `market` in `load_startup_state()`
+        self.quantizer: SymbolQuantizer = SymbolQuantizer()
+        self.rate_limit_scheduler: Optional[RateLimitScheduler] = None
+        self.raw_price_feed: bool = raw_price_feed is True
+        self.raw_price_key: str = RAW_PRICE_SOURCE_KEYS[price_source]
         self.reset_stop_loss_price = True if reset_stop_loss_price is True else False
+        self.rest_api_endpoint = rest_api_endpoint
         self.send_to_email_address = send_to_email_address
         self.send_from_email_address = send_from_email_address
         self.send_from_email_password = send_from_email_password
@@ -214,39 +345,57 @@ class BinanceTrailingStopLossManager(threading.Thread):
         self.stop_loss_asset_amount_free: float = 0.0
         self.stop_loss_limit = stop_loss_limit
         self.market = market
+        self.order_cache: dict = {}
+        self.order_cache_resync_request: bool = False
         self.stop_loss_order_id: int = 0
+        self.stop_loss_order_ids_replaced: set = set()
         self.stop_loss_order_type = stop_loss_order_type
         self.stop_loss_price: float = None if stop_loss_price is None else float(stop_loss_price)
         self.stop_loss_start_limit = stop_loss_start_limit
         self.stop_loss_quantity: float = 0.0
         self.stop_loss_trigger_gap = stop_loss_trigger_gap
+        self.stop_loss_order_recreate_request: bool = False
+        self.stop_loss_order_request = threading.Event()
+        self.stop_loss_price_pending: Optional[float] = None
         self.stop_loss_request: bool = False
+        self.stop_loss_update_interval: float = float(stop_loss_update_interval or 0.0)
+        self.stop_loss_update_last_timestamp: float = 0.0
+        self.stop_loss_update_min_improvement = stop_loss_update_min_improvement
         self.stop_manager_request: bool = False
+        # Stream signals of a `BinanceWebSocketApiManager` instance provided by the caller do not reach this manager
+        self.stream_signals_enabled: bool = ubwa_manager is None
         self.symbol_info: dict = {}
         self.telegram_bot_token = telegram_bot_token
         self.telegram_send_to = telegram_send_to
         self.test = test
+        self.tick_size: float = 0.01
         self.trade_stream_id = None
         self.trading_fee_discount_futures_percent = trading_fee_discount_futures_percent
         self.trading_fee_discount_margin_percent = trading_fee_discount_margin_percent
         self.trading_fee_discount_spot_percent = trading_fee_discount_spot_percent
         self.trading_fee_percent = trading_fee_percent
         self.trading_fee_use_bnb = trading_fee_use_bnb
+        self.user_stream_connected: bool = False
         self.user_stream_id = None
+        self.user_stream_ready = threading.Event()
+        self.websocket_api_endpoint = websocket_api_endpoint
         self.lucit_api_secret = lucit_api_secret
         self.lucit_license_ini = lucit_license_ini
         self.lucit_license_profile = lucit_license_profile
         self.lucit_license_token = lucit_license_token
         self.ubra = ubra_manager
         self.ubwa = ubwa_manager
-        self.llm = LucitLicensingManager(api_secret=self.lucit_api_secret,
-                                         license_ini=self.lucit_license_ini,
-                                         license_profile=self.lucit_license_profile,
-                                         license_token=self.lucit_license_token,
-                                         parent_shutdown_function=self.stop_manager,
-                                         program_used=self.name,
-                                         needed_license_type="UNICORN-BINANCE-SUITE",
-                                         start=True)
+        if llm_manager is None:
+            from .licensing_manager import LucitLicensingManager
+            llm_manager = LucitLicensingManager(api_secret=self.lucit_api_secret,
+                                                license_ini=self.lucit_license_ini,
+                                                license_profile=self.lucit_license_profile,
+                                                license_token=self.lucit_license_token,
+                                                parent_shutdown_function=self.stop_manager,
+                                                program_used=self.name,
+                                                needed_license_type="UNICORN-BINANCE-SUITE",
+                                                start=True)
+        self.llm = llm_manager
         licensing_exception = self.llm.get_license_exception()
         if licensing_exception is not None:
             raise NoValidatedLucitLicense(licensing_exception)
@@ -260,30 +409,44 @@ class BinanceTrailingStopLossManager(threading.Thread):
                                                                                  lucit_license_ini=self.lucit_license_ini,
                                                                                  lucit_license_profile=self.lucit_license_profile,
                                                                                  lucit_license_token=self.lucit_license_token)
-        if warn_on_update and self.is_update_available():
-            update_msg = f"Release {self.name}_{self.get_latest_version()} is available, please consider updating! " \
-                         f"(Changelog: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech/changelog.html)"
-            print(update_msg)
-            self.logger.warning(update_msg)
-        try:
-            self.ubwa: BinanceWebSocketApiManager = ubwa_manager or \
-                                                        BinanceWebSocketApiManager(exchange=self.exchange,
-                                                                                   output_default="UnicornFy",
-                                                                                   disable_colorama=disable_colorama,
-                                                                                   high_performance=True,
-                                                                                   warn_on_update=warn_on_update,
-                                                                                   lucit_api_secret=self.lucit_api_secret,
-                                                                                   lucit_license_ini=self.lucit_license_ini,
-                                                                                   lucit_license_profile=self.lucit_license_profile,
-                                                                                   lucit_license_token=self.lucit_license_token,
-                                                                                   ubra_manager=self.ubra,
-                                                                                   show_secrets_in_logs=True)
-        except UnknownExchange:
-            self.logger.critical("BinanceTrailingStopLossManager() - Please use a valid exchange!")
-            if test is None or "streams" in str(test):
-                if self.print_notifications:
-                    print(f"Please use a valid exchange!")
-                sys.exit(1)
+        if self.rest_api_endpoint is not None:
+            self.set_rest_api_endpoint(rest_api_endpoint=self.rest_api_endpoint)
+            # Keep the symbols of the custom endpoint apart from the cache of the exchange
+            exchange_info_cache_path = f"{Path.home()}{os.sep}.lucit{os.sep}ubtsl_cache{os.sep}" \
+                                       f"{re.sub(r'[^A-Za-z0-9]+', '_', self.rest_api_endpoint)}{os.sep}"
+        else:
+            exchange_info_cache_path = None
+        self.exchange_info_cache = ExchangeInfoCache(exchange=self.exchange,
+                                                     ubra_manager=self.ubra,
+                                                     cache_path=exchange_info_cache_path,
+                                                     ttl=exchange_info_cache_ttl)
+        if warn_on_update:
+            threading.Thread(target=self.check_for_update, name=f"ubtsl-update-check", daemon=True).start()
+        if ubwa_manager is None:
+            from unicorn_binance_websocket_api import BinanceWebSocketApiManager, UnknownExchange
+            try:
+                self.ubwa = BinanceWebSocketApiManager(exchange=self.exchange,
+                                                       output_default="UnicornFy",
+                                                       disable_colorama=disable_colorama,
+                                                       high_performance=True,
+                                                       warn_on_update=warn_on_update,
+                                                       lucit_api_secret=self.lucit_api_secret,
+                                                       lucit_license_ini=self.lucit_license_ini,
+                                                       lucit_license_profile=self.lucit_license_profile,
+                                                       lucit_license_token=self.lucit_license_token,
+                                                       ubra_manager=self.ubra,
+                                                       process_stream_signals=self.process_stream_signals,
+                                                       show_secrets_in_logs=True)
+            except UnknownExchange:
+                self.logger.critical("BinanceTrailingStopLossManager() - Please use a valid exchange!")
+                if test is None or "streams" in str(test):
+                    if self.print_notifications:
+                        print(f"Please use a valid exchange!")
+                    sys.exit(1)
+        if self.websocket_api_endpoint is not None:
+            self.set_websocket_api_endpoint(websocket_api_endpoint=self.websocket_api_endpoint)
+        if self.metrics_enabled is True:
+            start_metrics_server(port=self.metrics_port)
         if test is None and start_engine is True:
             msg = f"Starting the ubtsl engine"
             self.logger.info(msg)
@@ -296,12 +459,12 @@ class BinanceTrailingStopLossManager(threading.Thread):
             if self.print_notifications:
                 print(msg)
             notification_text = f"Subject: unicorn-binance-trailing-stop-loss notificaton test\n\nTest notification"
-            if self.send_email_notification(notification_text):
+            if self.send_email_notification(notification_text, blocking=True):
                 msg = f"E-Mail sent, please check for incoming messages!"
                 self.logger.info(msg)
                 if self.print_notifications:
                     print(msg)
-            if self.send_telegram_notification(notification_text):
+            if self.send_telegram_notification(notification_text, blocking=True):
                 msg = f"Telegram sent, please check for incoming messages!"
                 self.logger.info(msg)
                 if self.print_notifications:
@@ -366,11 +529,48 @@ class BinanceTrailingStopLossManager(threading.Thread):
         if exc_type:
             self.logger.critical(f"An exception occurred: {exc_type} - {exc_value} - {error_traceback}")
 
+    def append_journal_record(self,
+                              record_type: str = None,
+                              sync: bool = False,
+                              **data) -> bool:
+        """
+        Append a record to the journal of the market if `journal` is enabled.
+
+        :param record_type: `stop_loss_price`, `order`, `balance` or `filled`
+        :type record_type: str
+        :param sync: Fsync the record before returning.
+        :type sync: bool
+
+        :return: bool
+        """
+        if self.journal is None:
+            return False
+        return self.journal.append(record_type, sync=sync, **data)
+
+    @staticmethod
+    def calculate_native_trailing_percent(limit: Union[str, float] = None,
+                                          price: Union[str, float] = None) -> Optional[float]:
+        """
+        Convert a stop/loss limit into the distance in percent of a native trailing order.
+
+        :param limit: Stop loss limit in percent or as fixed float value
+        :type limit: float, str
+        :param price: Current price, only needed for a fixed limit.
+        :type price: float, str
+
+        :return: float or None
+        """
+        if "%" in str(limit):
+            return float(str(limit).rstrip("%"))
+        if price is None or float(price) <= 0.0:
+            return None
+        return float(limit) / float(price) * 100.0
+
     def calculate_stop_loss_amount(self,
                                    amount: float
                                    ) -> Optional[float]:
         """
-        Calculate the tradeable stop/loss asset amount (= owning and free - trading fee)
+        Calculate the tradeable stop/loss asset amount (= owning and free - trading fee), rounded down to the step size.
 
         :param amount: The full owning asset amount.
         :type amount: float
@@ -379,22 +579,42 @@ class BinanceTrailingStopLossManager(threading.Thread):
         """
         self.logger.debug(f"BinanceTrailingStopLossManager.calculate_stop_loss_amount() - Calculation stop/loss "
                           f"amount without trading fee")
-        fee = self.trading_fee_percent
-        final_fee = 0
-        if self.exchange == "binance.com":
-            final_fee = fee
-        elif self.exchange == "binance.com-futures":
-            final_fee = fee
-        elif self.exchange == "binance.com-margin":
-            final_fee = fee / 100 * (100-self.trading_fee_discount_margin_percent)
-        elif self.exchange == "binance.com-isolated_margin":
-            final_fee = fee / 100 * (100-self.trading_fee_discount_margin_percent)
+        final_fee = self.exchange_adapter.get_trading_fee(self.trading_fee_percent)
         amount_without_fee = amount/100*(100-final_fee)
-        return amount_without_fee
+        return self.quantizer.quantize_quantity(amount_without_fee)
+
+    @staticmethod
+    def calculate_stop_loss_min_improvement(stop_loss_price: float = None,
+                                            min_improvement: str = None,
+                                            tick_size: float = 0.01) -> float:
+        """
+        Calculate the minimum price improvement needed to replace a stop/loss order.
+
+        :param stop_loss_price: The price of the current stop/loss order.
+        :type stop_loss_price: float
+        :param min_improvement: Minimum improvement in float, percent, basis points (`5bps`) or ticks (`3ticks`).
+        :type min_improvement: str
+        :param tick_size: The `tickSize` of the PRICE_FILTER.
+        :type tick_size: float
+
+        :return: float
+        """
+        if min_improvement is None or stop_loss_price is None:
+            return 0.0
+        min_improvement = str(min_improvement).strip()
+        if min_improvement.endswith("%"):
+            return stop_loss_price / 100 * float(min_improvement.rstrip("%"))
+        elif min_improvement.endswith("bps"):
+            return stop_loss_price / 10000 * float(min_improvement[:-3])
+        elif min_improvement.endswith("ticks"):
+            return tick_size * float(min_improvement[:-5])
+        else:
+            return float(min_improvement)
 
     @staticmethod
     def calculate_stop_loss_price(price: Union[str, float] = None,
-                                  limit: Union[str, float] = None
+                                  limit: Union[str, float] = None,
+                                  quantizer: Optional[SymbolQuantizer] = None
                                   ) -> Optional[float]:
         """
         Calculate the stop/loss price.
@@ -403,6 +623,8 @@ class BinanceTrailingStopLossManager(threading.Thread):
         :type price: float, str
         :param limit: Stop loss limit in percent or as fixed float value
         :type limit: float, str
+        :param quantizer: Round down to the tick size of this quantizer instead of 2 decimal places.
+        :type quantizer: SymbolQuantizer
 
         :return: float or None
         """
@@ -414,45 +636,77 @@ class BinanceTrailingStopLossManager(threading.Thread):
             sl_price = float(price / 100) * float(100.0 - limit_percent)
         else:
             sl_price = price - float(limit)
+        if quantizer is not None:
+            return quantizer.quantize_price(sl_price)
         return BinanceTrailingStopLossManager.round_decimals_down(sl_price, 2)
 
+    @staticmethod
+    def calculate_stop_loss_trigger_price(stop_loss_price: float = None,
+                                          trigger_gap: str = "0.01",
+                                          precision: int = 8,
+                                          current_stop_loss_price: float = None,
+                                          quantizer: Optional[SymbolQuantizer] = None) -> float:
+        """
+        Calculate the stop/loss trigger price - if this price gets touched the limit order will get placed in the
+        orderbook.
+
+        :param stop_loss_price: The limit price of the stop/loss order.
+        :type stop_loss_price: float
+        :param trigger_gap: Gap between stopPrice and limit order price, use integer or percent values.
+        :type trigger_gap: str
+        :param precision: Decimal places of the trigger price, not used with `quantizer`.
+        :type precision: int
+        :param current_stop_loss_price: Stop/loss price used for percent values of `trigger_gap`. Default is
+                                        `stop_loss_price`.
+        :type current_stop_loss_price: float
+        :param quantizer: Add the gap in whole ticks of this quantizer to the stop/loss price.
+        :type quantizer: SymbolQuantizer
+
+        :return: float
+        """
+        if current_stop_loss_price is None:
+            current_stop_loss_price = stop_loss_price
+        if "%" in str(trigger_gap):
+            gap_percent = float(str(trigger_gap).rstrip("%"))
+            trigger_gap = float(current_stop_loss_price/100)*float(100.0-gap_percent)
+        else:
+            trigger_gap = float(trigger_gap)
+        if quantizer is not None:
+            return quantizer.get_price(quantizer.get_price_ticks(stop_loss_price) +
+                                       quantizer.get_price_ticks(trigger_gap))
+        trigger_gap = float(BinanceTrailingStopLossManager.round_decimals_down(trigger_gap, precision))
+        trigger_price = round(stop_loss_price + trigger_gap, 2)
+        if len(str(trigger_price).split(".")[1]) <= precision:
+            return trigger_price
+        else:
+            return BinanceTrailingStopLossManager.round_decimals_down(trigger_price, precision)
+
+    @measure_duration
     def cancel_open_stop_loss_order(self) -> bool:
         """
         Cancel all open stop/loss orders.
 
         :return: bool
         """
-        open_orders = self.get_open_orders(market=self.market)
+        open_orders = self.get_open_stop_loss_orders()
         if open_orders:
             for open_order in open_orders:
-                if open_order['type'] == "STOP_LOSS_LIMIT":
+                if open_order['type'] == self.get_stop_loss_order_type():
                     self.logger.info(f"BinanceTrailingStopLossManager.cancel_open_stop_loss_order() - Cancelling "
-                                     f"open STOP_LOSS_LIMIT order (orderID={open_order['orderId']}) "
+                                     f"open {open_order['type']} order (orderID={open_order['order_id']}) "
                                      f"with stop_loss_price={open_order['price']}.")
+                    # The cancellation unlocks the asset amount, we wait for the next `outboundAccountPosition`
+                    self.balance_book_valid.clear()
                     try:
-                        if self.exchange == "binance.com" or self.exchange == "binance.com-testnet":
-                            canceled_order = self.ubra.cancel_order(symbol=self.market,
-                                                                    orderId=open_order['orderId'])
-                        elif self.exchange == "binance.com-isolated_margin":
-                            canceled_order = self.ubra.cancel_margin_order(symbol=self.market,
-                                                                           isIsolated="TRUE",
-                                                                           orderId=open_order['orderId'])
-                        elif self.exchange == "binance.com-margin":
-                            canceled_order = self.ubra.cancel_margin_order(symbol=self.market,
-                                                                           orderId=open_order['orderId'])
-                        elif self.exchange == "binance.com-futures":
-                            canceled_order = self.ubra.futures_cancel_order(symbol=self.market,
-                                                                            orderId=open_order['orderId'])
-                        else:
-                            self.logger.info(
-                                f"BinanceTrailingStopLossManager.create_stop_loss_order() - Invalid exchange "
-                                f"`{self.exchange}`")
-                            if self.print_notifications:
-                                print(f"Invalid exchange `{self.exchange}`")
+                        canceled_order = self.exchange_adapter.cancel_order(order_id=open_order['order_id'])
+                        if canceled_order is None:
                             return False
                     except BinanceAPIException as error_msg:
                         self.logger.error(f"BinanceTrailingStopLossManager.cancel_open_stop_loss_order() - "
                                           f"error_msg: {error_msg}")
+                        if "code=-2011" in str(error_msg):
+                            # Unknown order: The cache missed the final execution report of this order
+                            self.order_cache.pop(open_order['order_id'], None)
                         return False
                     self.logger.info(f"BinanceTrailingStopLossManager.cancel_open_stop_loss_order() - New "
                                      f"order_status of orderID={canceled_order['orderId']} is"
@@ -462,6 +716,95 @@ class BinanceTrailingStopLossManager(threading.Thread):
                          f"cancellation found!")
         return False
 
+    def check_for_update(self) -> bool:
+        """
+        Warn if a new release of this package is available. It runs in a background thread started by `__init__()`,
+        so the request to GitHub does not delay the start.
+
+        :return: bool
+        """
+        try:
+            if self.is_update_available() is False:
+                return False
+        except requests.exceptions.RequestException as error_msg:
+            self.logger.debug(f"BinanceTrailingStopLossManager.check_for_update() - {error_msg}")
+            return False
+        update_msg = f"Release {self.name}_{self.get_latest_version()} is available, please consider updating! " \
+                     f"(Changelog: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech/changelog.html)"
+        print(update_msg)
+        self.logger.warning(update_msg)
+        return True
+
+    def create_native_trailing_order(self) -> bool:
+        """
+        Create the order of the `native-trail` engine: a `STOP_LOSS` order with `trailingDelta` on binance.com and
+        binance.com-testnet or a `TRAILING_STOP_MARKET` order with `callbackRate` on binance.com-futures. The exchange
+        trails the order, the manager only watches the userData stream for the fill.
+
+        :return: bool
+        """
+        with self.lock_create_stop_loss_order:
+            order_parameters = self.get_native_trailing_order_parameters()
+            if order_parameters is None:
+                return False
+            total, free = self.update_stop_loss_asset_amount()
+            if self.keep_threshold is not None:
+                stop_loss_quantity = self.quantizer.quantize_quantity(self.update_stop_loss_quantity(total=total,
+                                                                                                     free=free))
+            else:
+                stop_loss_quantity = self.calculate_stop_loss_amount(free)
+            if stop_loss_quantity == 0:
+                msg = f"Empty stop_loss_quantity in create_native_trailing_order()"
+                self.logger.error(f"BinanceTrailingStopLossManager.create_native_trailing_order() - {msg}")
+                if self.print_notifications:
+                    print(f"Stopping because stop_loss_quantity is zero!")
+                self.send_email_notification(msg)
+                self.send_telegram_notification(msg)
+                self.stop_manager()
+                if self.callback_error is not None:
+                    self.callback_error(msg)
+                return False
+            self.logger.info(f"BinanceTrailingStopLossManager.create_native_trailing_order() - Creating native "
+                             f"trailing order: {order_parameters}, owning_amount={total}, owning_amount_free={free}, "
+                             f"stop_loss_quantity={stop_loss_quantity}")
+            new_order = None
+            while new_order is None:
+                try:
+                    new_order = self.exchange_adapter.create_order(side="SELL",
+                                                                   quantity=self.quantizer.format_quantity(
+                                                                       stop_loss_quantity),
+                                                                   **order_parameters)
+                except BinanceAPIException as error_msg:
+                    if "code=-2010" in str(error_msg) and self.is_manager_stopping() is False:
+                        if self.metrics_enabled is True:
+                            ORDER_RETRIES.labels(self.market, "-2010").inc()
+                        waiting_time = 5
+                        self.logger.info(f"BinanceTrailingStopLossManager.create_native_trailing_order() - Retrying "
+                                         f"in {waiting_time} seconds")
+                        if self.print_notifications:
+                            print(f"Retrying in {waiting_time} seconds")
+                        time.sleep(waiting_time)
+                    else:
+                        self.logger.error(f"BinanceTrailingStopLossManager.create_native_trailing_order() - "
+                                          f"{error_msg}")
+                        if self.print_notifications:
+                            print(f"Can not create native trailing order! error: {error_msg}")
+                        return False
+            self.stop_loss_order_id = new_order['orderId']
+            self.stop_loss_quantity = stop_loss_quantity
+            self.logger.info(f"BinanceTrailingStopLossManager.create_native_trailing_order() - Created native "
+                             f"trailing order for market {new_order['symbol']} - Response: {new_order}.")
+            if self.print_notifications:
+                print(f"Created native trailing order for market {new_order['symbol']}: {order_parameters} and "
+                      f"stop_loss_quantity={self.stop_loss_quantity}")
+            self.append_journal_record("order", sync=True, order_id=self.stop_loss_order_id,
+                                       stop_loss_price=self.stop_loss_price,
+                                       stop_loss_quantity=self.stop_loss_quantity)
+            if self.metrics_enabled is True:
+                STOP_LOSS_UPDATES.labels(self.market, "create").inc()
+            return True
+
+    @measure_duration
     def create_stop_loss_order(self,
                                stop_loss_price: float = None,
                                current_price: float = None) -> bool:
@@ -475,6 +818,8 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
         :return: bool
         """
+        if self.engine == "native-trail":
+            return self.create_native_trailing_order()
         order_is_placed = False
         with self.lock_create_stop_loss_order:
             if self.stop_loss_price is None and stop_loss_price is not None:
@@ -486,13 +831,23 @@ class BinanceTrailingStopLossManager(threading.Thread):
                     self.set_stop_loss_price(stop_loss_price)
                 else:
                     stop_loss_price = self.stop_loss_price
+            with self.lock_stop_loss_price_pending:
+                if self.stop_loss_price_pending is not None and self.stop_loss_price_pending <= self.stop_loss_price:
+                    self.stop_loss_price_pending = None
+            self.stop_loss_update_last_timestamp = time.time()
+            if self.replace_stop_loss_order(stop_loss_price=stop_loss_price, current_price=current_price):
+                self.append_journal_record("order", sync=True, order_id=self.stop_loss_order_id,
+                                           stop_loss_price=self.stop_loss_price,
+                                           stop_loss_quantity=self.stop_loss_quantity)
+                if self.metrics_enabled is True:
+                    STOP_LOSS_UPDATES.labels(self.market, "replace").inc()
+                return True
             if self.cancel_open_stop_loss_order():
                 return True
             total, free = self.update_stop_loss_asset_amount()
             if self.keep_threshold is not None:
-                stop_loss_quantity = self.round_decimals_down(self.update_stop_loss_quantity(total=total,
-                                                                                             free=free),
-                                                              self.precision_quantity)
+                stop_loss_quantity = self.quantizer.quantize_quantity(self.update_stop_loss_quantity(total=total,
+                                                                                                     free=free))
             else:
                 stop_loss_quantity = self.calculate_stop_loss_amount(free)
 
@@ -503,18 +858,25 @@ class BinanceTrailingStopLossManager(threading.Thread):
                 current_price_str = f"current_price={current_price}, "
             else:
                 current_price_str = ""
+            stop_price = self.get_stop_loss_trigger_price(stop_loss_price)
             self.logger.info(f"BinanceTrailingStopLossManager.create_stop_loss_order() - Creating stop/loss "
                              f"order: {current_price_str}"
-                             f"stop_price={self.get_stop_loss_trigger_price(stop_loss_price)}, "
+                             f"stop_price={stop_price}, "
                              f"sell_price={stop_loss_price}, "
                              f"owning_amount={total}, "
                              f"owning_amount_free={free}, "
                              f"stop_loss_quantity={stop_loss_quantity}")
             if stop_loss_quantity == 0:
                 msg = f"Empty stop_loss_quantity in create_stop_loss_order()"
+            elif self.quantizer.is_order_valid(price=stop_loss_price, quantity=stop_loss_quantity) is False:
+                msg = f"stop_loss_quantity={stop_loss_quantity} at sell_price={stop_loss_price} is below the " \
+                      f"`minQty` or `minNotional` of {self.market} in create_stop_loss_order()"
+            else:
+                msg = None
+            if msg is not None:
                 self.logger.error(f"BinanceTrailingStopLossManager.create_stop_loss_order() - {msg}")
                 if self.print_notifications:
-                    print(f"Stopping because stop_loss_quantity is zero!")
+                    print(f"Stopping: {msg}")
                 self.send_email_notification(msg)
                 self.send_telegram_notification(msg)
                 self.stop_manager()
@@ -523,50 +885,18 @@ class BinanceTrailingStopLossManager(threading.Thread):
                 return False
             while order_is_placed is False:
                 try:
-                    if self.exchange == "binance.com" or self.exchange == "binance.com-testnet":
-                        new_order = self.ubra.create_order(symbol=self.market,
-                                                           side="SELL",
-                                                           type="STOP_LOSS_LIMIT",
-                                                           price=self.stop_loss_price,
-                                                           stopPrice=self.get_stop_loss_trigger_price(stop_loss_price),
-                                                           quantity=str(round(stop_loss_quantity,
-                                                                              self.precision_quantity)),
-                                                           timeInForce="GTC")
-                    elif self.exchange == "binance.com-isolated_margin":
-                        new_order = self.ubra.create_margin_order(symbol=self.market,
-                                                                  isIsolated="TRUE",
-                                                                  side="SELL",
-                                                                  type="STOP_LOSS_LIMIT",
-                                                                  price=self.stop_loss_price,
-                                                                  stopPrice=self.get_stop_loss_trigger_price(stop_loss_price),
-                                                                  quantity=str(round(stop_loss_quantity,
-                                                                                     self.precision_quantity)),
-                                                                  timeInForce="GTC")
-                    elif self.exchange == "binance.com-margin":
-                        new_order = self.ubra.create_margin_order(symbol=self.market,
-                                                                  side="SELL",
-                                                                  type="STOP_LOSS_LIMIT",
-                                                                  price=self.stop_loss_price,
-                                                                  stopPrice=self.get_stop_loss_trigger_price(stop_loss_price),
-                                                                  quantity=str(round(stop_loss_quantity,
-                                                                                     self.precision_quantity)),
-                                                                  timeInForce="GTC")
-                    elif self.exchange == "binance.com-futures":
-                        new_order = self.ubra.futures_create_order(symbol=self.market,
-                                                                   side="SELL",
+                    new_order = self.exchange_adapter.create_order(side="SELL",
                                                                    type="STOP_LOSS_LIMIT",
-                                                                   price=self.stop_loss_price,
-                                                                   stopPrice=self.get_stop_loss_trigger_price(stop_loss_price),
-                                                                   quantity=str(round(stop_loss_quantity,
-                                                                                      self.precision_quantity)),
+                                                                   price=self.quantizer.format_price(
+                                                                       self.stop_loss_price),
+                                                                   stopPrice=self.quantizer.format_price(stop_price),
+                                                                   quantity=self.quantizer.format_quantity(
+                                                                       stop_loss_quantity),
                                                                    timeInForce="GTC")
-                    else:
-                        self.logger.info(f"BinanceTrailingStopLossManager.create_stop_loss_order() - Invalid exchange "
-                                         f"`{self.exchange}`")
-                        if self.print_notifications:
-                            print(f"Invalid exchange `{self.exchange}`")
+                    if new_order is None:
                         return False
                     self.stop_loss_order_id = new_order['orderId']
+                    self.stop_loss_quantity = stop_loss_quantity
                     self.logger.info(f"BinanceTrailingStopLossManager.create_stop_loss_order() - Created stop/loss "
                                      f"order for market {new_order['symbol']} - Response: {new_order}.")
                     if self.print_notifications:
@@ -574,14 +904,28 @@ class BinanceTrailingStopLossManager(threading.Thread):
                               f"stop_loss_price={self.stop_loss_price} and "
                               f"stop_loss_quantity={self.stop_loss_quantity}")
                     order_is_placed = True
+                    self.append_journal_record("order", sync=True, order_id=self.stop_loss_order_id,
+                                               stop_loss_price=self.stop_loss_price,
+                                               stop_loss_quantity=self.stop_loss_quantity)
+                    if self.metrics_enabled is True:
+                        STOP_LOSS_UPDATES.labels(self.market, "create").inc()
                 except BinanceAPIException as error_msg:
                     if "code=-2010" in str(error_msg):
+                        if self.metrics_enabled is True:
+                            ORDER_RETRIES.labels(self.market, "-2010").inc()
                         waiting_time = 5
                         self.logger.info(f"BinanceTrailingStopLossManager.create_stop_loss_order() - Retrying in "
                                          f"{waiting_time} seconds")
                         if self.print_notifications:
                             print(f"Retrying in {waiting_time} seconds")
                         time.sleep(waiting_time)
+                        # Always retry with the newest stop/loss price received in the meantime
+                        with self.lock_stop_loss_price_pending:
+                            if self.stop_loss_price_pending is not None and \
+                                    self.stop_loss_price_pending > self.stop_loss_price:
+                                stop_loss_price = self.stop_loss_price_pending
+                                self.stop_loss_price_pending = None
+                                self.set_stop_loss_price(stop_loss_price)
                     else:
                         self.logger.error(f"BinanceTrailingStopLossManager.create_stop_loss_order() - {error_msg}")
                         if self.print_notifications:
@@ -589,6 +933,62 @@ class BinanceTrailingStopLossManager(threading.Thread):
                         return False
             return True
 
+    def execute_rest_request(self,
+                             function,
+                             *args,
+                             priority: int = PRIORITY_DEFAULT,
+                             weight: int = 1,
+                             orders: int = 0,
+                             **kwargs):
+        """
+        Execute a REST request via the `RateLimitScheduler` shared by all managers of the same API key.
+
+        :param function: The method of the `BinanceRestApiManager` to execute.
+        :param priority: `PRIORITY_PROTECTIVE`, `PRIORITY_DEFAULT` or `PRIORITY_RECONCILIATION`
+        :type priority: int
+        :param weight: Request weight of the endpoint.
+        :type weight: int
+        :param orders: Number of orders the request places.
+        :type orders: int
+
+        :return: The response of `function`
+        """
+        if self.rate_limit_scheduler is None:
+            self.rate_limit_scheduler = get_rate_limit_scheduler(api_key=self.api_key,
+                                                                 exchange=self.exchange,
+                                                                 rate_limits=self.exchange_info_cache.get_rate_limits())
+        if self.metrics_enabled is False:
+            return self.rate_limit_scheduler.execute(function, *args, priority=priority, weight=weight, orders=orders,
+                                                     **kwargs)
+        function_name = getattr(function, "__name__", str(function))
+        start_time = time.perf_counter()
+        try:
+            return self.rate_limit_scheduler.execute(function, *args, priority=priority, weight=weight, orders=orders,
+                                                     **kwargs)
+        except BinanceAPIException as error_msg:
+            REST_REQUEST_ERRORS.labels(self.exchange, function_name, str(getattr(error_msg, "code", None))).inc()
+            raise
+        finally:
+            REST_REQUEST_DURATION.labels(self.exchange, function_name).observe(time.perf_counter() - start_time)
+            self.update_used_weight_metric()
+
+    def get_current_price(self) -> Optional[float]:
+        """
+        Get the last price of the price feed or request it via REST if the price feed has not delivered one.
+
+        :return: float or None
+        """
+        if self.current_price:
+            return float(self.current_price)
+        try:
+            ticker = self.exchange_adapter.get_symbol_ticker()
+        except BinanceAPIException as error_msg:
+            self.logger.error(f"BinanceTrailingStopLossManager.get_current_price() - {error_msg}")
+            return None
+        if ticker is None:
+            return None
+        return float(ticker['price'])
+
     @staticmethod
     def get_latest_release_info():
         """
@@ -622,109 +1022,176 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
     def get_exchange_info(self) -> Union[dict, bool]:
         """
-        Get the exchange info.
+        Get the exchange info of the market from the exchangeInfo cache.
 
         :return: dict or bool
         """
-        if self.exchange == "binance.com" or self.exchange == "binance.com-testnet" or \
-                self.exchange == "binance.com-margin" or self.exchange == "binance.com-isolated_margin":
-            self.exchange_info = self.ubra.get_exchange_info()
-        elif self.exchange == "binance.com-futures":
-            self.exchange_info = self.ubra.futures_exchange_info()
-        else:
-            self.logger.error(f"BinanceTrailingStopLossManager.get_exchange_info() - Invalid exchange "
-                              f"`{self.exchange}`")
-            if self.print_notifications:
-                print(f"Invalid exchange `{self.exchange}`")
+        if self.exchange_adapter.supported is False:
+            self.exchange_adapter.log_invalid_exchange("get_exchange_info")
             return False
+        symbol_info = self.exchange_info_cache.get_symbol(symbol=self.market)
+        if symbol_info is None:
+            return False
+        return symbol_info
 
-        for item in self.exchange_info['symbols']:
-            if item['symbol'] == self.market:
-                return item
-        return False
+    def get_native_trailing_order_parameters(self) -> Optional[dict]:
+        """
+        Get the order type and the trailing distance of the native trailing order with `stop_loss_limit` converted into
+        the unit of the exchange: `trailingDelta` in BIPS (0.01%) within the `TRAILING_DELTA` filter of the symbol on
+        binance.com and binance.com-testnet and `callbackRate` in percent with one decimal on binance.com-futures. The
+        conversion is done by the `ExchangeAdapter` of the exchange.
+
+        :return: dict or None
+        """
+        if "%" in str(self.stop_loss_limit):
+            percent = self.calculate_native_trailing_percent(self.stop_loss_limit)
+        else:
+            percent = self.calculate_native_trailing_percent(self.stop_loss_limit, price=self.get_current_price())
+        if percent is None:
+            self.logger.error(f"BinanceTrailingStopLossManager.get_native_trailing_order_parameters() - Can not "
+                              f"convert stop_loss_limit={self.stop_loss_limit} without the current price")
+            return None
+        return self.exchange_adapter.get_native_trailing_order_parameters(percent=percent)
 
     def get_open_orders(self,
-                        market: str = None) -> Optional[dict]:
+                        market: str = None,
+                        priority: int = PRIORITY_DEFAULT) -> Optional[dict]:
         """
-        Get the owning amount of the stop/loss asset.
+        Get the open orders of a market.
+
+        :param market: The market.
+        :type market: str
+        :param priority: Priority of the request in the `RateLimitScheduler`.
+        :type priority: int
 
         :return: dict or None
         """
         try:
-            if self.exchange == "binance.com" or self.exchange == "binance.com-testnet":
-                open_orders = self.ubra.get_open_orders(symbol=market)
-            elif self.exchange == "binance.com-futures":
-                open_orders = self.ubra.futures_get_open_orders(symbol=market)
-            elif self.exchange == "binance.com-margin":
-                open_orders = self.ubra.get_open_margin_orders(symbol=market)
-            elif self.exchange == "binance.com-isolated_margin":
-                open_orders = self.ubra.get_open_margin_orders(symbol=market, isIsolated="TRUE")
-            else:
-                return None
+            open_orders = self.exchange_adapter.get_open_orders(market=market, priority=priority)
             return open_orders
         except BinanceAPIException as error_msg:
             self.logger.error(f"BinanceTrailingStopLossManager.get_open_orders() - {error_msg}")
             return None
 
+    def get_open_stop_loss_orders(self) -> list:
+        """
+        Get the open stop/loss orders of the market from the local order cache.
+
+        :return: list
+        """
+        stop_loss_order_type = self.get_stop_loss_order_type()
+        return [order for order in list(self.order_cache.values())
+                if order['type'] == stop_loss_order_type and order['symbol'] == self.market]
+
+    @measure_duration
     def get_owning_amount(self,
-                          base_asset: str = None) -> Optional[tuple]:
+                          base_asset: str = None,
+                          priority: int = PRIORITY_DEFAULT) -> Optional[tuple]:
         """
         Get the owning amount of the stop/loss asset.
 
+        :param base_asset: The stop/loss asset.
+        :type base_asset: str
+        :param priority: Priority of the request in the `RateLimitScheduler`.
+        :type priority: int
+
         :return: tuple (total, free) or None
         """
         try:
-            if self.exchange == "binance.com" or self.exchange == "binance.com-testnet":
-                account_info = self.ubra.get_account()
-            elif self.exchange == "binance.com-futures":
-                account_info = self.ubra.futures_account()
-            elif self.exchange == "binance.com-margin":
-                account_info = self.ubra.get_margin_account()
-            elif self.exchange == "binance.com-isolated_margin":
-                account_info = self.ubra.get_isolated_margin_account()
-            else:
-                self.logger.error(f"BinanceTrailingStopLossManager.get_owning_amount() - Invalid exchange "
-                                  f"`{self.exchange}`")
-                if self.print_notifications:
-                    print(f"Invalid exchange `{self.exchange}`")
-                return None
+            balance = self.exchange_adapter.get_account_balance(asset=base_asset, priority=priority)
         except BinanceAPIException as error_msg:
             self.logger.error(f"BinanceTrailingStopLossManager.get_owning_amount() - {error_msg}")
             return None
+        if balance is None:
+            return None
+        self.logger.info(f"BinanceTrailingStopLossManager.get_owning_amount() - Owning {balance['asset']}: "
+                         f"{balance}")
+        return balance['total'], balance['free']
 
-        if self.exchange == "binance.com":
-            for item in account_info['balances']:
-                base_asset_pool = item
-                if base_asset_pool['asset'] == base_asset:
-                    self.logger.info(f"BinanceTrailingStopLossManager.get_owning_amount() - Owning "
-                                     f"{base_asset_pool['asset']}: free={base_asset_pool['free']}, "
-                                     f"total={base_asset_pool['free']})")
-                    return float(base_asset_pool['free']), float(base_asset_pool['free'])
-        else:
-            for item in account_info['assets']:
-                base_asset_pool = item['baseAsset']
-                if base_asset_pool['asset'] == base_asset:
-                    self.logger.info(f"BinanceTrailingStopLossManager.get_owning_amount() - Owning "
-                                     f"{base_asset_pool['asset']}: free={base_asset_pool['free']}, "
-                                     f"total={base_asset_pool['totalAsset']} "
-                                     f"(interest={base_asset_pool['interest']})")
-                    return float(base_asset_pool['totalAsset']), float(base_asset_pool['free'])
-        return None
+    def get_owning_amount_from_balance_book(self,
+                                            base_asset: str = None) -> Optional[tuple]:
+        """
+        Get the owning amount of the stop/loss asset from the local balance book.
 
-    @staticmethod
-    def get_precision(step_size=None):
-        if step_size is None:
+        The balance book is fed by the `outboundAccountPosition` events of the userData stream. If the stream has not
+        confirmed the balance after our last order change within one second or the asset is unknown, None is returned.
+
+        :return: tuple (total, free) or None
+        """
+        if self.exchange_adapter.balance_stream is False:
+            # Futures accounts do not send `outboundAccountPosition` events
             return None
-        parts = str(step_size).split('.')
-        if len(parts) == 2:
-            count = 0
-            for char in parts[1]:
-                count += 1
-                if char == '1':
-                    return count
-            return count
-        else:
-            return 0
+        if self.balance_book_valid.wait(timeout=1.0) is False:
+            self.logger.debug(f"BinanceTrailingStopLossManager.get_owning_amount_from_balance_book() - Balance book "
+                              f"is outdated")
+            return None
+        balance = self.balance_book.get(base_asset)
+        if balance is None:
+            return None
+        return balance['total'], balance['free']
+
+    @staticmethod
+    def get_price_extractor(price_source: str = None):
+        """
+        Get the function that reads the price of a `price_source` from the UnicornFy stream data.
+
+        :param price_source: `aggTrade`, `bookTicker`, `kline_1s`, `markPrice` or `miniTicker`
+        :type price_source: str
+
+        :return: function
+        """
+        return {'aggTrade': BinanceTrailingStopLossManager.get_price_from_agg_trade,
+                'bookTicker': BinanceTrailingStopLossManager.get_price_from_book_ticker,
+                'kline_1s': BinanceTrailingStopLossManager.get_price_from_kline,
+                'markPrice': BinanceTrailingStopLossManager.get_price_from_mark_price,
+                'miniTicker': BinanceTrailingStopLossManager.get_price_from_mini_ticker}[price_source]
+
+    @staticmethod
+    def get_price_from_agg_trade(stream_data: dict = None) -> Optional[str]:
+        """
+        Get the trade price of an `aggTrade` record.
+
+        :return: str or None
+        """
+        return stream_data.get('price')
+
+    @staticmethod
+    def get_price_from_book_ticker(stream_data: dict = None) -> Optional[str]:
+        """
+        Get the best bid of a `bookTicker` record.
+
+        :return: str or None
+        """
+        return stream_data.get('best_bid_price')
+
+    @staticmethod
+    def get_price_from_kline(stream_data: dict = None) -> Optional[str]:
+        """
+        Get the close price of a `kline` record.
+
+        :return: str or None
+        """
+        kline = stream_data.get('kline')
+        return None if kline is None else kline.get('close_price')
+
+    @staticmethod
+    def get_price_from_mark_price(stream_data: dict = None) -> Optional[str]:
+        """
+        Get the mark price of a `markPrice` record.
+
+        :return: str or None
+        """
+        return stream_data.get('mark_price')
+
+    @staticmethod
+    def get_price_from_mini_ticker(stream_data: dict = None) -> Optional[str]:
+        """
+        Get the close price of a `miniTicker` record.
+
+        :return: str or None
+        """
+        data = stream_data.get('data')
+        return data[0].get('close_price') if data else None
 
     def get_stop_loss_asset_amount(self) -> Optional[float]:
         """
@@ -732,7 +1199,7 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
         :return: float
         """
-        return self.round_decimals_down(self.stop_loss_asset_amount, self.precision_quantity)
+        return self.quantizer.quantize_quantity(self.stop_loss_asset_amount)
 
     def get_stop_loss_asset_amount_free(self) -> Optional[float]:
         """
@@ -740,7 +1207,41 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
         :return: float
         """
-        return self.round_decimals_down(self.stop_loss_asset_amount_free, self.precision_quantity)
+        return self.quantizer.quantize_quantity(self.stop_loss_asset_amount_free)
+
+    def get_stop_loss_min_improvement(self) -> float:
+        """
+        Get the minimum price improvement needed to replace the current stop/loss order.
+
+        :return: float
+        """
+        return self.calculate_stop_loss_min_improvement(stop_loss_price=self.stop_loss_price,
+                                                        min_improvement=self.stop_loss_update_min_improvement,
+                                                        tick_size=self.tick_size)
+
+    def get_stop_loss_order_request_timeout(self) -> float:
+        """
+        Get the time in seconds the order worker waits for a new request before it checks the pending requests again.
+
+        :return: float
+        """
+        timeout = 1.0
+        if self.stop_loss_price_pending is not None and self.stop_loss_update_interval > 0:
+            remaining = self.stop_loss_update_interval - (time.time() - self.stop_loss_update_last_timestamp)
+            if 0 < remaining < timeout:
+                timeout = remaining
+        return timeout
+
+    def get_stop_loss_order_type(self) -> str:
+        """
+        Get the type of the stop/loss orders of this manager on the exchange: `STOP_LOSS_LIMIT` or the type of the
+        native trailing order of the `native-trail` engine.
+
+        :return: str
+        """
+        if self.engine == "native-trail":
+            return self.exchange_adapter.native_trailing_order_type
+        return "STOP_LOSS_LIMIT"
 
     def get_stop_loss_price(self) -> Optional[float]:
         """
@@ -748,16 +1249,9 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
         :return: float
         """
-        if self.exchange == "binance.com":
-            if self.symbol_info['quoteAsset'] == "USDT":
-                return self.round_decimals_down(self.stop_loss_price, 2)
-            else:
-                return self.stop_loss_price
-        else:
-            if self.symbol_info['quote'] == "USDT":
-                return self.round_decimals_down(self.stop_loss_price, 2)
-            else:
-                return self.stop_loss_price
+        if self.stop_loss_price is None:
+            return None
+        return self.quantizer.quantize_price(self.stop_loss_price)
 
     def get_stop_loss_trigger_price(self,
                                     stop_loss_price: float = 0.0) -> Optional[float]:
@@ -767,21 +1261,16 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
         :return: float
         """
-        if "%" in self.stop_loss_trigger_gap:
-            gap_percent = float(self.stop_loss_trigger_gap.rstrip("%"))
-            trigger_gap = float(self.get_stop_loss_price()/100)*float(100.0-gap_percent)
-        else:
-            trigger_gap = float(self.stop_loss_trigger_gap)
-        trigger_gap = float(self.round_decimals_down(trigger_gap, self.precision_quantity))
-        precision = self.precision_quantity
-
         if stop_loss_price == 0:
             stop_loss_price = self.stop_loss_price
-        trigger_price = round(stop_loss_price + trigger_gap, 2)
-        if len(str(trigger_price).split(".")[1]) <= precision:
-            return trigger_price
+        if "%" in self.stop_loss_trigger_gap:
+            current_stop_loss_price = self.get_stop_loss_price()
         else:
-            return self.round_decimals_down(trigger_price, precision)
+            current_stop_loss_price = None
+        return self.calculate_stop_loss_trigger_price(stop_loss_price=stop_loss_price,
+                                                      trigger_gap=self.stop_loss_trigger_gap,
+                                                      current_stop_loss_price=current_stop_loss_price,
+                                                      quantizer=self.quantizer)
 
     def get_symbol_info(self,
                         symbol: str = None) -> Optional[dict]:
@@ -791,16 +1280,7 @@ class BinanceTrailingStopLossManager(threading.Thread):
          :return: dict
          """
         try:
-            if self.exchange == "binance.com":
-                symbol_info = self.ubra.get_symbol_info(symbol=symbol)
-            elif self.exchange == "binance.com-futures":
-                symbol_info = self.ubra.get_symbol_info(symbol=symbol)
-            elif self.exchange == "binance.com-margin":
-                symbol_info = self.ubra.get_margin_symbol(symbol=symbol)
-            elif self.exchange == "binance.com-isolated_margin":
-                symbol_info = self.ubra.get_isolated_margin_symbol(symbol=symbol)
-            else:
-                symbol_info = None
+            symbol_info = self.exchange_adapter.get_symbol_info(symbol=symbol)
             return symbol_info
         except BinanceAPIException as error_msg:
             self.logger.error(f"BinanceTrailingStopLossManager.get_symbol_info() - {error_msg}")
@@ -818,6 +1298,34 @@ class BinanceTrailingStopLossManager(threading.Thread):
         user_agent = f"{self.name}_{str(self.get_version())}-python_{str(platform.python_version())}"
         return user_agent
 
+    @staticmethod
+    def get_value_from_raw_data(stream_data: str = None,
+                                key: str = None) -> Optional[str]:
+        """
+        Read the value of a key from a raw JSON frame of Binance without parsing the frame. The first occurrence of the
+        key is used, which works for the flat frames of the price sources also if they are wrapped by a combined
+        stream.
+
+        :param stream_data: The raw frame.
+        :type stream_data: str
+        :param key: The quoted key including the colon, for example `"p":`.
+        :type key: str
+
+        :return: str or None
+        """
+        start = stream_data.find(key)
+        if start == -1:
+            return None
+        start += len(key)
+        if stream_data[start] == '"':
+            start += 1
+            return stream_data[start:stream_data.find('"', start)]
+        end = stream_data.find(",", start)
+        end_object = stream_data.find("}", start)
+        if end == -1 or -1 < end_object < end:
+            end = end_object
+        return stream_data[start:end]
+
     @staticmethod
     def get_version() -> str:
         """
@@ -837,6 +1345,30 @@ class BinanceTrailingStopLossManager(threading.Thread):
         else:
             return True
 
+    def is_stop_loss_update_due(self,
+                                stop_loss_price: float = None) -> bool:
+        """
+        Check whether a new stop/loss price is allowed to replace the current stop/loss order. It must improve the
+        current `stop_loss_price` by at least `stop_loss_update_min_improvement` and the last replacement has to be
+        older than `stop_loss_update_interval` seconds.
+
+        :param stop_loss_price: The new stop/loss price.
+        :type stop_loss_price: float
+
+        :return: bool
+        """
+        if stop_loss_price is None:
+            return False
+        if self.stop_loss_price is None:
+            return True
+        if stop_loss_price <= self.stop_loss_price:
+            return False
+        if stop_loss_price - self.stop_loss_price < self.get_stop_loss_min_improvement():
+            return False
+        if time.time() - self.stop_loss_update_last_timestamp < self.stop_loss_update_interval:
+            return False
+        return True
+
     def is_update_available(self) -> bool:
         """
         Is a new release of this package available?
@@ -853,6 +1385,74 @@ class BinanceTrailingStopLossManager(threading.Thread):
         else:
             return True
 
+    def load_startup_state(self) -> bool:
+        """
+        Startup pipeline: load the symbol info while the streams connect, then resync the order cache and the balance
+        book with concurrent REST requests.
+
+        The snapshots of the open orders and the balance are requested after the userData stream is connected, so no
+        execution report or account update can get lost in between.
+
+        :return: bool
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2,
+                                                   thread_name_prefix=f"ubtsl-startup-{self.market}") as executor:
+            symbol_info_future = executor.submit(self.get_symbol_info, symbol=self.market)
+            if self.portfolio_manager is None:
+                self.logger.info(f"BinanceTrailingStopLossManager.load_startup_state() - Waiting till streams are "
+                                 f"ready")
+                if self.wait_till_streams_are_ready():
+                    self.logger.info(f"BinanceTrailingStopLossManager.load_startup_state() - UserData and Trade "
+                                     f"streams are running!")
+            self.symbol_info = symbol_info_future.result()
+            if self.symbol_info is None:
+                return False
+            self.stop_loss_asset_name = self.symbol_info['base_asset']
+            order_cache_future = executor.submit(self.resync_order_cache)
+            balance_book_future = executor.submit(self.reconcile_balance_book)
+            quantizer = self.exchange_info_cache.get_quantizer(symbol=self.market)
+            if quantizer is not None:
+                self.quantizer = quantizer
+                self.tick_size = quantizer.tick_size
+            self.exchange_info = self.get_exchange_info()
+            order_cache_future.result()
+            balance_book_future.result()
+        with self.lock_stop_loss_price_pending:
+            if self.stop_loss_price_pending is not None:
+                # Calculated by ticks before the quantizer of the symbol was loaded
+                self.stop_loss_price_pending = self.quantizer.quantize_price(self.stop_loss_price_pending)
+        self.startup_complete.set()
+        self.stop_loss_order_request.set()
+        return True
+
+    def process_stream_signals(self,
+                               signal_type: str = None,
+                               stream_id=None,
+                               data_record=None,
+                               error_msg=None) -> None:
+        """
+        Process the stream signals of the UNICORN Binance WebSocket API.
+
+        After a reconnect of the userData stream, execution reports and account updates could have been missed, so the
+        order worker resyncs the local order cache and the balance book.
+
+        :return: None
+        """
+        self.logger.debug(f"BinanceTrailingStopLossManager.process_stream_signals() - Received stream signal: "
+                          f"signal_type={signal_type}, stream_id={stream_id}, error_msg={error_msg}")
+        if signal_type == "CONNECT" and self.is_manager_stopping() is False:
+            if stream_id == self.user_stream_id:
+                if self.user_stream_connected is True:
+                    self.logger.info(f"BinanceTrailingStopLossManager.process_stream_signals() - UserData stream "
+                                     f"reconnected, resyncing the order cache")
+                    self.order_cache_resync_request = True
+                    self.stop_loss_order_request.set()
+                self.user_stream_connected = True
+                self.user_stream_ready.set()
+            elif stream_id == self.trade_stream_id:
+                self.price_feed_ready.set()
+
+    @measure_duration
     def process_userdata_stream(self,
                                 stream_data: dict = None,
                                 stream_buffer_name=False):
@@ -864,7 +1464,19 @@ class BinanceTrailingStopLossManager(threading.Thread):
         self.logger.debug(f"BinanceTrailingStopLossManager.process_userdata_stream(stream_data={stream_data}, "
                           f"stream_buffer_name={stream_buffer_name}) started")
         if self.is_manager_stopping() is False:
+            if self.metrics_enabled is True and stream_data.get('event_time'):
+                self.metric_userdata_lag.observe(max(0.0, time.time() - int(stream_data['event_time']) / 1000))
             if stream_data['event_type'] == "executionReport":
+                if stream_data.get('symbol') == self.market:
+                    self.update_order_cache(stream_data)
+                if stream_data['current_order_status'] == "CANCELED" and \
+                        stream_data['order_id'] in self.stop_loss_order_ids_replaced:
+                    # Arrives before or after the response of the cancel-replace request changed `stop_loss_order_id`
+                    self.balance_book_valid.clear()
+                    self.stop_loss_order_ids_replaced.discard(stream_data['order_id'])
+                    self.logger.debug(f"BinanceTrailingStopLossManager.process_userdata_stream() - Received "
+                                      f"CANCELED event of replaced order: {str(stream_data)}")
+                    return False
                 if stream_data['order_id'] == self.stop_loss_order_id:
                     if stream_data['current_order_status'] == "FILLED":
                         msg = f"Subject: unicorn-binance-trailing-stop-loss '{self.market}'\n\n" \
@@ -875,6 +1487,8 @@ class BinanceTrailingStopLossManager(threading.Thread):
                         self.logger.info(f"BinanceTrailingStopLossManager.process_userdata_stream() - {log_msg_short}")
                         if self.print_notifications:
                             print(msg_short)
+                        self.append_journal_record("filled", sync=True, order_id=stream_data['order_id'],
+                                                   price=stream_data['order_price'])
                         self.send_telegram_notification(msg)
                         self.send_email_notification(msg)
                         self.stop_manager()
@@ -882,13 +1496,16 @@ class BinanceTrailingStopLossManager(threading.Thread):
                             self.callback_finished(stream_data)
                         return True
                     elif stream_data['current_order_status'] == "CANCELED":
+                        self.balance_book_valid.clear()
                         self.logger.info(f"BinanceTrailingStopLossManager.process_userdata_stream() - "
                                          f"Received CANCELED event, trigger creation of new order")
                         if self.print_notifications:
                             print("Received CANCELED event, creating a new order")
-                        self.create_stop_loss_order(self.stop_loss_price, current_price=self.current_price)
+                        self.stop_loss_order_recreate_request = True
+                        self.stop_loss_order_request.set()
                         return False
                     elif stream_data['current_order_status'] == "PARTIALLY_FILLED":
+                        self.balance_book_valid.clear()
                         self.logger.warning(f"BinanceTrailingStopLossManager.process_userdata_stream() - "
                                             f"Received PARTIALLY_FILLED event")
                         if self.print_notifications:
@@ -917,6 +1534,7 @@ class BinanceTrailingStopLossManager(threading.Thread):
                         print("Unknown, please report:", str(stream_data))
             elif stream_data['event_type'] == "outboundAccountPosition":
                 self.logger.debug(f"BinanceTrailingStopLossManager.process_userdata_stream() - Received: {stream_data}")
+                self.update_balance_book(balances=stream_data.get('balances'))
             else:
                 self.logger.debug(f"BinanceTrailingStopLossManager.process_userdata_stream() - "
                                   f"Received unkown stream_data: {stream_data}")
@@ -932,28 +1550,297 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
         :return: bool
         """
-        if "streams" in str(self.test):
-            self.logger.debug(f"BinanceTrailingStopLossManager.process_price_feed_stream() - Not processing in test "
-                              f"mode")
-            return True
         self.logger.debug(f"BinanceTrailingStopLossManager.process_price_feed_stream(stream_data={stream_data}, "
                           f"stream_buffer_name={stream_buffer_name}) started")
+        return self.process_price_update(price=self.price_extractor(stream_data),
+                                         event_time=stream_data.get('event_time'))
+
+    def process_price_update(self,
+                             price: Union[str, float] = None,
+                             event_time: Union[str, int] = None) -> bool:
+        """
+        Control the current price and update `stop_loss_price` or trigger stop/loss if needed. Used by
+        `process_price_feed_stream()` and `process_raw_price_feed_stream()`.
+
+        :param price: The price of the price source.
+        :type price: str or float
+        :param event_time: Event time of the exchange in milliseconds, only used by the metrics.
+        :type event_time: str or int
+
+        :return: bool
+        """
+        if "streams" in str(self.test):
+            self.logger.debug(f"BinanceTrailingStopLossManager.process_price_update() - Not processing in test mode")
+            return True
         if self.is_manager_stopping() is False:
-            if stream_data.get('price'):
-                self.current_price = stream_data.get('price')
-                sl_price = self.calculate_stop_loss_price(stream_data.get('price'), self.stop_loss_limit)
-                if self.stop_loss_price is None:
-                    self.logger.info(f"BinanceTrailingStopLossManager.process_price_feed_stream() - Setting "
-                                     f"stop_loss_price from None to {sl_price}!")
-                    if self.print_notifications:
-                        print(f"Setting stop_loss_price from None to {sl_price}!")
-                    self.create_stop_loss_order(sl_price, current_price=stream_data.get('price'))
-                elif self.stop_loss_price < sl_price:
-                    self.logger.info(f"BinanceTrailingStopLossManager.process_price_feed_stream() - Setting "
-                                     f"stop_loss_price from {self.stop_loss_price} to {sl_price}!")
-                    if self.print_notifications:
-                        print(f"Setting stop_loss_price from {self.stop_loss_price} to {sl_price}!")
-                    self.create_stop_loss_order(sl_price, current_price=stream_data.get('price'))
+            if self.metrics_enabled is True:
+                # Measured inline instead of with `measure_duration`, which costs too much per tick
+                start_time = time.perf_counter()
+                self.metric_ticks_received.inc()
+                if event_time:
+                    self.metric_price_feed_lag.observe(max(0.0, time.time() - int(event_time) / 1000))
+            if price:
+                self.current_price = price
+                if self.price_feed_ready.is_set() is False:
+                    self.price_feed_ready.set()
+                sl_price = self.calculate_stop_loss_price(price, self.stop_loss_limit, quantizer=self.quantizer)
+                # Only compare and overwrite the single-slot mailbox, the order worker thread picks up the newest
+                # stop/loss price and talks to the exchange.
+                if self.stop_loss_price is None or self.stop_loss_price < sl_price:
+                    with self.lock_stop_loss_price_pending:
+                        if self.stop_loss_price_pending is None or self.stop_loss_price_pending < sl_price:
+                            self.stop_loss_price_pending = sl_price
+                            self.stop_loss_order_request.set()
+            if self.metrics_enabled is True:
+                self.metric_price_feed_duration.observe(time.perf_counter() - start_time)
+        return True
+
+    def process_raw_price_feed_stream(self,
+                                      stream_data: str = None,
+                                      stream_buffer_name=False) -> bool:
+        """
+        Process the raw frames of the price feed of `raw_price_feed`: Read only the price and, if metrics are enabled,
+        the event time and skip the conversion of the frame.
+
+        :return: bool
+        """
+        price = self.get_value_from_raw_data(stream_data, self.raw_price_key)
+        if price is None:
+            # Subscription results and other frames without price
+            return False
+        return self.process_price_update(price=price,
+                                         event_time=self.get_value_from_raw_data(stream_data, '"E":')
+                                         if self.metrics_enabled is True else None)
+
+    def process_stop_loss_order_requests(self) -> None:
+        """
+        Order worker: Wait for new stop/loss prices provided by `process_price_feed_stream()` or recreate requests of
+        `process_userdata_stream()` and place them on the exchange.
+
+        Intermediate prices are dropped, the worker always submits the newest stop/loss price as soon as
+        `is_stop_loss_update_due()` allows it.
+
+        :return: None
+        """
+        self.logger.info(f"BinanceTrailingStopLossManager.process_stop_loss_order_requests() - Order worker started")
+        while self.is_manager_stopping() is False:
+            self.stop_loss_order_request.wait(timeout=self.get_stop_loss_order_request_timeout())
+            self.stop_loss_order_request.clear()
+            self.process_stop_loss_order_request()
+        self.logger.info(f"BinanceTrailingStopLossManager.process_stop_loss_order_requests() - Order worker stopped")
+
+    def process_stop_loss_order_request(self) -> bool:
+        """
+        Process the pending requests of the order worker once: reconcile the balance book if it is due, resync the
+        order cache, recreate a canceled stop/loss order or submit the newest stop/loss price.
+
+        Nothing is processed before `load_startup_state()` has loaded the stop/loss asset, the order cache, the balance
+        book and the quantizer of the symbol.
+
+        This is the body of the `process_stop_loss_order_requests()` loop, it is also used by
+        `AsyncBinanceTrailingStopLossManager` to run the order worker as coroutine.
+
+        :return: bool
+        """
+        if self.is_manager_stopping() is True:
+            return False
+        if self.startup_complete.wait(timeout=self.get_stop_loss_order_request_timeout()) is False:
+            return False
+        if self.balance_reconciliation_interval > 0 and self.balance_book_last_reconciliation > 0 and \
+                time.time() - self.balance_book_last_reconciliation > self.balance_reconciliation_interval:
+            self.reconcile_balance_book()
+        if self.order_cache_resync_request is True:
+            self.order_cache_resync_request = False
+            self.resync_order_cache()
+            self.reconcile_balance_book()
+        if self.stop_loss_order_recreate_request is True:
+            self.stop_loss_order_recreate_request = False
+            self.create_stop_loss_order(self.stop_loss_price, current_price=self.current_price)
+            return True
+        if self.engine == "native-trail":
+            # The exchange trails the order, prices of a shared price feed are ignored
+            return False
+        sl_price = self.stop_loss_price_pending
+        if self.is_stop_loss_update_due(sl_price):
+            self.logger.info(f"BinanceTrailingStopLossManager.process_stop_loss_order_request() - Setting "
+                             f"stop_loss_price from {self.stop_loss_price} to {sl_price}!")
+            if self.print_notifications:
+                print(f"Setting stop_loss_price from {self.stop_loss_price} to {sl_price}!")
+            self.create_stop_loss_order(sl_price, current_price=self.current_price)
+            return True
+        return False
+
+    def reconcile_balance_book(self) -> bool:
+        """
+        Reconcile the local balance book of the stop/loss asset with the exchange via REST.
+
+        :return: bool
+        """
+        self.logger.debug(f"BinanceTrailingStopLossManager.reconcile_balance_book() - Reconciling balance of "
+                          f"{self.stop_loss_asset_name}")
+        self.balance_book_last_reconciliation = time.time()
+        owning_amount = self.get_owning_amount(base_asset=self.stop_loss_asset_name,
+                                               priority=PRIORITY_RECONCILIATION)
+        if owning_amount is None:
+            return False
+        total, free = owning_amount
+        balance = self.balance_book.get(self.stop_loss_asset_name)
+        if balance is not None and (balance['total'] != total or balance['free'] != free):
+            self.logger.warning(f"BinanceTrailingStopLossManager.reconcile_balance_book() - Balance book of "
+                                f"{self.stop_loss_asset_name} was out of sync: local={balance}, "
+                                f"exchange=(total={total}, free={free})")
+        self.balance_book[self.stop_loss_asset_name] = {'total': total, 'free': free, 'update_time': time.time()}
+        self.balance_book_valid.set()
+        return True
+
+    def reconcile_journal_state(self) -> bool:
+        """
+        Reconcile the state restored from the journal with the order cache and the balance book loaded by
+        `load_startup_state()` in one pass: take over a higher price of an open stop/loss order and only place an order
+        if the journaled order is not open with the journaled price anymore. The stop/loss price is never lowered.
+
+        :return: bool
+        """
+        open_orders = self.get_open_stop_loss_orders()
+        for open_order in open_orders:
+            if open_order['price'] > self.stop_loss_price:
+                self.logger.info(f"BinanceTrailingStopLossManager.reconcile_journal_state() - Taking over the higher "
+                                 f"stop_loss_price={open_order['price']} of the open order "
+                                 f"(orderID={open_order['order_id']})")
+                self.set_stop_loss_price(open_order['price'])
+        journaled_order = self.order_cache.get(self.stop_loss_order_id)
+        if journaled_order is not None and journaled_order['price'] == self.stop_loss_price and len(open_orders) == 1:
+            self.stop_loss_quantity = journaled_order['quantity']
+            self.logger.info(f"BinanceTrailingStopLossManager.reconcile_journal_state() - The journaled stop/loss "
+                             f"order (orderID={self.stop_loss_order_id}) is open with "
+                             f"stop_loss_price={self.stop_loss_price}")
+            return True
+        if journaled_order is None:
+            # The journaled order is gone, so a new one has to be created instead of replaced
+            self.stop_loss_order_id = 0
+            self.stop_loss_quantity = 0.0
+        return self.create_stop_loss_order(self.stop_loss_price)
+
+    def resync_order_cache(self) -> bool:
+        """
+        Resync the local order cache with the open orders of the market on the exchange via REST.
+
+        :return: bool
+        """
+        open_orders = self.get_open_orders(market=self.market, priority=PRIORITY_RECONCILIATION)
+        if open_orders is None:
+            return False
+        order_cache = {}
+        for open_order in open_orders:
+            order_cache[open_order['orderId']] = {'order_id': open_order['orderId'],
+                                                  'symbol': open_order['symbol'],
+                                                  'side': open_order['side'],
+                                                  'type': open_order['type'],
+                                                  'status': open_order['status'],
+                                                  'price': float(open_order['price']),
+                                                  'stop_price': float(open_order.get('stopPrice', 0.0)),
+                                                  'quantity': float(open_order['origQty']),
+                                                  'executed_quantity': float(open_order['executedQty']),
+                                                  'update_time': time.time()}
+        self.order_cache = order_cache
+        # Replaced orders that are not open anymore and whose CANCELED event got lost, for example during a reconnect
+        self.stop_loss_order_ids_replaced.intersection_update(order_cache)
+        self.logger.info(f"BinanceTrailingStopLossManager.resync_order_cache() - Found {len(self.order_cache)} open "
+                         f"orders for market {self.market}")
+        return True
+
+    def restore_from_journal(self) -> bool:
+        """
+        Open the journal and restore `stop_loss_price`, `stop_loss_order_id`, `stop_loss_quantity` and the balance book
+        of the last run. A journal of a filled stop/loss order or `reset_stop_loss_price=True` starts a new journal.
+
+        :return: bool (True if a state was restored)
+        """
+        if self.journal is None:
+            return False
+        state = self.journal.open()
+        if self.reset_stop_loss_price is True or state['finished'] is True:
+            self.journal.reset()
+            return False
+        if state['stop_loss_price'] is None:
+            return False
+        if self.stop_loss_price is None or state['stop_loss_price'] > self.stop_loss_price:
+            self.stop_loss_price = state['stop_loss_price']
+        self.stop_loss_order_id = state['stop_loss_order_id'] or 0
+        self.stop_loss_quantity = state['stop_loss_quantity'] or 0.0
+        for asset, balance in state['balances'].items():
+            self.balance_book[asset] = {'total': balance['total'],
+                                        'free': balance['free'],
+                                        'update_time': state['update_time']}
+        if state['balances']:
+            # Confirmed or corrected by `reconcile_journal_state()`
+            self.balance_book_valid.set()
+        msg = f"Restored stop_loss_price={self.stop_loss_price} and stop/loss order (orderID=" \
+              f"{self.stop_loss_order_id}, quantity={self.stop_loss_quantity}) from the journal"
+        self.logger.info(f"BinanceTrailingStopLossManager.restore_from_journal() - {msg}")
+        if self.print_notifications:
+            print(msg)
+        return True
+
+    def replace_stop_loss_order(self,
+                                stop_loss_price: float = None,
+                                current_price: float = None) -> bool:
+        """
+        Replace the known open stop/loss order with one atomic cancel-replace request.
+
+        This is only possible on exchanges providing the `order/cancelReplace` endpoint (binance.com and
+        binance.com-testnet) and if the `orderId` and the quantity of the current stop/loss order are known. In all other
+        cases `False` is returned and the caller has to fall back to cancel the order and create a new one.
+
+        :param stop_loss_price: Price to set for the SL order.
+        :type stop_loss_price: float
+        :param current_price: Current price is optional and only used for logging.
+        :type current_price: float
+
+        :return: bool
+        """
+        if self.exchange_adapter.supports_cancel_replace is False:
+            return False
+        if not self.stop_loss_order_id or not self.stop_loss_quantity:
+            return False
+        if stop_loss_price is None:
+            stop_loss_price = self.stop_loss_price
+        replaced_order_id = self.stop_loss_order_id
+        self.stop_loss_order_ids_replaced.add(replaced_order_id)
+        self.logger.info(f"BinanceTrailingStopLossManager.replace_stop_loss_order() - Replacing stop/loss order "
+                         f"(orderID={replaced_order_id}): current_price={current_price}, "
+                         f"stop_price={self.get_stop_loss_trigger_price(stop_loss_price)}, "
+                         f"sell_price={self.stop_loss_price}, "
+                         f"stop_loss_quantity={self.stop_loss_quantity}")
+        try:
+            response = self.exchange_adapter.cancel_replace_order(side="SELL",
+                                                                  type="STOP_LOSS_LIMIT",
+                                                                  cancelReplaceMode="STOP_ON_FAILURE",
+                                                                  cancelOrderId=replaced_order_id,
+                                                                  price=self.quantizer.format_price(
+                                                                      self.stop_loss_price),
+                                                                  stopPrice=self.quantizer.format_price(
+                                                                      self.get_stop_loss_trigger_price(
+                                                                          stop_loss_price)),
+                                                                  quantity=self.quantizer.format_quantity(
+                                                                      self.stop_loss_quantity),
+                                                                  timeInForce="GTC")
+        except BinanceAPIException as error_msg:
+            self.stop_loss_order_ids_replaced.discard(replaced_order_id)
+            self.logger.error(f"BinanceTrailingStopLossManager.replace_stop_loss_order() - {error_msg}")
+            return False
+        if response is None:
+            self.stop_loss_order_ids_replaced.discard(replaced_order_id)
+            return False
+        new_order = response['newOrderResponse']
+        self.stop_loss_order_id = new_order['orderId']
+        self.logger.info(f"BinanceTrailingStopLossManager.replace_stop_loss_order() - Replaced stop/loss order for "
+                         f"market {new_order['symbol']} - Response: {response}.")
+        if self.print_notifications:
+            print(f"Replaced stop/loss order for market {new_order['symbol']}: "
+                  f"stop_loss_price={self.stop_loss_price} and "
+                  f"stop_loss_quantity={self.stop_loss_quantity}")
+        return True
 
     @staticmethod
     def round_decimals_down(number: float,
@@ -977,25 +1864,43 @@ class BinanceTrailingStopLossManager(threading.Thread):
             factor = 10 ** decimals
             return math.floor(number * factor) / factor
 
+    def start_order_worker(self) -> bool:
+        """
+        Start the order worker thread which decouples the stream callbacks from the REST order placement.
+
+        :return: bool
+        """
+        if self.order_worker is not None and self.order_worker.is_alive():
+            return False
+        self.order_worker = threading.Thread(target=self.process_stop_loss_order_requests,
+                                             name=f"{self.name}-order-worker",
+                                             daemon=True)
+        self.order_worker.start()
+        return True
+
     def start_streams(self) -> bool:
         """
         Procedure to start the web streams
 
         :return: bool
         """
-        if self.exchange == "binance.com-isolated_margin":
-            symbol = self.market
-        else:
-            symbol = False
         self.user_stream_id = self.ubwa.create_stream("arr", "!userData",
                                                       api_key=self.api_key,
                                                       api_secret=self.api_secret,
                                                       process_stream_data=self.process_userdata_stream,
-                                                      symbols=symbol,
+                                                      symbols=self.exchange_adapter.get_user_stream_symbols(),
                                                       stream_label="UserData")
-        self.trade_stream_id = self.ubwa.create_stream(channels="aggTrade",
+        if self.engine == "native-trail":
+            # The exchange trails the order, no price feed needed
+            return True
+        if self.raw_price_feed is True:
+            process_price_feed = self.process_raw_price_feed_stream
+        else:
+            process_price_feed = self.process_price_feed_stream
+        self.trade_stream_id = self.ubwa.create_stream(channels=PRICE_SOURCE_CHANNELS[self.price_source],
                                                        markets=self.market,
-                                                       process_stream_data=self.process_price_feed_stream,
+                                                       output="raw_data" if self.raw_price_feed else None,
+                                                       process_stream_data=process_price_feed,
                                                        stream_label="PriceFeed")
         return True
 
@@ -1005,13 +1910,31 @@ class BinanceTrailingStopLossManager(threading.Thread):
 
         :return: None
         """
-        self.start_streams()
+        self.start_order_worker()
+        if self.portfolio_manager is None:
+            self.start_streams()
+        self.initialize_stop_loss()
+
+    def initialize_stop_loss(self) -> None:
+        """
+        Load the market data, the balance and the open orders and place the initial stop/loss order.
+
+        The order worker and the streams must be started before.
 
+        :return: None
+        """
         if self.stop_loss_start_limit:
             limit = self.stop_loss_start_limit
         else:
             limit = self.stop_loss_limit
 
+        journal_restored = self.restore_from_journal()
+        if journal_restored is True and self.engine == "jump-in-and-trail":
+            # The position was bought before the restart, only the trailing continues
+            self.logger.info(f"BinanceTrailingStopLossManager.initialize_stop_loss() - Continuing with the `trail` "
+                             f"engine")
+            self.engine = "trail"
+
         if self.engine == "jump-in-and-trail":
             self.logger.info(f"Starting jump-in-and-trail engine")
             if self.print_notifications:
@@ -1021,24 +1944,32 @@ class BinanceTrailingStopLossManager(threading.Thread):
             buy_price = None
 
             if self.exchange == "binance.com-isolated_margin":
-                isolated_margin_account = self.ubra.get_isolated_margin_account()
+                isolated_margin_account = self.execute_rest_request(self.ubra.get_isolated_margin_account,
+                                                                    priority=PRIORITY_DEFAULT,
+                                                                    weight=10)
 
                 for item in isolated_margin_account['assets']:
                     if item['symbol'] == self.market:
                         if self.borrow_threshold:
-                            loan_details = self.ubra.get_margin_loan_details()
+                            loan_details = self.execute_rest_request(self.ubra.get_margin_loan_details,
+                                                                     priority=PRIORITY_DEFAULT,
+                                                                     weight=10)
                             print(f"Loan details: {loan_details}")
                             # Todo: Take loan -> gain free quote asset
 
                         amount_to_buy = isolated_margin_account['assets'][0]['quoteAsset']['free']
 
                         try:
-                            buy_order = self.ubra.create_margin_order(symbol=self.market,
-                                                                      isIsolated="TRUE",
-                                                                      side="BUY",
-                                                                      type="MARKET",
-                                                                      quoteOrderQty=amount_to_buy,
-                                                                      sideEffectType="MARGIN_BUY")
+                            buy_order = self.execute_rest_request(self.ubra.create_margin_order,
+                                                                  priority=PRIORITY_DEFAULT,
+                                                                  weight=6,
+                                                                  orders=1,
+                                                                  symbol=self.market,
+                                                                  isIsolated="TRUE",
+                                                                  side="BUY",
+                                                                  type="MARKET",
+                                                                  quoteOrderQty=amount_to_buy,
+                                                                  sideEffectType="MARGIN_BUY")
 
                             print(f"Buy order: {buy_order}")
 
@@ -1046,7 +1977,8 @@ class BinanceTrailingStopLossManager(threading.Thread):
                             buy_price = buy_order['fills'][0]['price']
 
                             self.stop_loss_price = self.calculate_stop_loss_price(price=buy_price,
-                                                                                  limit=limit)
+                                                                                  limit=limit,
+                                                                                  quantizer=self.quantizer)
 
                         except BinanceAPIException as error_msg:
                             msg = f"Stopping because of Binance API exception: {error_msg}"
@@ -1074,6 +2006,21 @@ class BinanceTrailingStopLossManager(threading.Thread):
             self.logger.info(msg)
             if self.print_notifications:
                 print(msg)
+        elif self.engine == "native-trail":
+            if self.exchange_adapter.native_trailing_order_type is None:
+                msg = f"Option `native-trail` in parameter `engine` is not supported for exchange " \
+                      f"'{self.exchange}'!"
+                self.logger.critical(msg)
+                if self.print_notifications:
+                    print(msg)
+                sys.exit(1)
+            if self.stop_loss_start_limit:
+                self.logger.warning(f"BinanceTrailingStopLossManager.initialize_stop_loss() - `stop_loss_start_limit` "
+                                    f"is not used by the `native-trail` engine")
+            msg = f"Starting `native-trail` engine"
+            self.logger.info(msg)
+            if self.print_notifications:
+                print(msg)
         else:
             msg = f"Engine `{self.engine}` is not supported!"
             self.logger.critical(msg)
@@ -1086,38 +2033,36 @@ class BinanceTrailingStopLossManager(threading.Thread):
             print(f"Starting trailing stop/loss on {self.exchange} for the market {self.market}")
         self.logger.debug(f"BinanceTrailingStopLossManager.run() - reset_stop_loss_price="
                           f"{self.reset_stop_loss_price}")
-        self.symbol_info = self.get_symbol_info(symbol=self.market)
-
-        symbol_info_symbols = self.ubra.get_exchange_info(**{'symbol': self.market})['symbols']
-        for symbols in symbol_info_symbols:
-            if symbols.get('filters') is not None:
-                for filters in symbols.get('filters'):
-                    if filters.get('filterType') == "LOT_SIZE":
-                        self.precision_quantity = self.get_precision(filters['stepSize'])
-
-        self.logger.info(f"BinanceTrailingStopLossManager.run() -  used_weight: {self.ubra.get_used_weight()}")
-        if self.symbol_info is None:
+        if self.load_startup_state() is False:
             self.logger.critical(f"BinanceTrailingStopLossManager.run() - `symbol_info` is None")
             if self.print_notifications:
                 print(f"ERROR: `symbol_info` is None -> Stopping!")
             self.stop_manager()
             sys.exit(1)
-        if self.exchange == "binance.com":
-            self.stop_loss_asset_name = self.symbol_info['baseAsset']
-        else:
-            self.stop_loss_asset_name = self.symbol_info['base']
-        self.exchange_info = self.get_exchange_info()
+        self.logger.info(f"BinanceTrailingStopLossManager.run() -  used_weight: "
+                         f"{self.ubra.get_used_weight(cached=True)}")
+        if self.portfolio_manager is not None:
+            self.portfolio_manager.register_stop_loss_asset(market=self.market, asset=self.stop_loss_asset_name)
         self.update_stop_loss_asset_amount()
-
-        self.logger.info(f"BinanceTrailingStopLossManager.start() - Waiting till streams are running")
-        if self.ubwa.wait_till_stream_has_started(self.user_stream_id) and \
-                self.ubwa.wait_till_stream_has_started(self.trade_stream_id):
-            time.sleep(5)
-            self.logger.info(f"BinanceTrailingStopLossManager.start() - UserData and Trade streams are running!")
+        if self.engine == "native-trail":
+            open_orders = self.get_open_stop_loss_orders()
+            if open_orders and self.reset_stop_loss_price is not True:
+                self.stop_loss_order_id = open_orders[0]['order_id']
+                self.stop_loss_quantity = open_orders[0]['quantity']
+                self.logger.info(f"BinanceTrailingStopLossManager.initialize_stop_loss() - Watching the open "
+                                 f"{open_orders[0]['type']} order (orderID={self.stop_loss_order_id})")
+                return None
+            if open_orders:
+                self.cancel_open_stop_loss_order()
+            self.create_native_trailing_order()
+            return None
+        if journal_restored is True:
+            self.reconcile_journal_state()
+            return None
 
         if self.stop_loss_price is None or self.stop_loss_price == 0.0:
             if self.reset_stop_loss_price is not True:
-                open_orders = self.get_open_orders(market=self.market)
+                open_orders = self.get_open_stop_loss_orders()
                 if open_orders:
                     for open_order in open_orders:
                         if open_order['type'] == "STOP_LOSS_LIMIT":
@@ -1133,64 +2078,74 @@ class BinanceTrailingStopLossManager(threading.Thread):
                              f"{self.stop_loss_price}")
             self.create_stop_loss_order(self.stop_loss_price)
 
+    def get_notification_dispatcher(self) -> BinanceTrailingStopLossNotificationDispatcher:
+        """
+        Get the background dispatcher of the email and Telegram notifications, it is shared by all managers of the
+        process with the same notification settings.
+
+        :return: BinanceTrailingStopLossNotificationDispatcher
+        """
+        if self.notification_dispatcher is None:
+            self.notification_dispatcher = get_notification_dispatcher(
+                send_to_email_address=self.send_to_email_address,
+                send_from_email_address=self.send_from_email_address,
+                send_from_email_password=self.send_from_email_password,
+                send_from_email_server=self.send_from_email_server,
+                send_from_email_port=self.send_from_email_port,
+                telegram_bot_token=self.telegram_bot_token,
+                telegram_send_to=self.telegram_send_to)
+        return self.notification_dispatcher
+
     def send_email_notification(self,
-                                message: str = None) -> bool:
+                                message: str = None,
+                                blocking: bool = False) -> bool:
         """
-        Send a notification via email!
+        Send a notification via email! The email is queued and sent in the background by the notification dispatcher.
 
         :param message: Text to send via email.
         :type message: str
+        :param blocking: Send the email before returning, used by the notification test.
+        :type blocking: bool
 
-        :return:
+        :return: bool (True if the email was queued or sent)
         """
         self.logger.debug(f"BinanceTrailingStopLossManager.send_email_notification() - msg: {message}")
-        if self.send_to_email_address \
-                and self.send_from_email_address \
-                and self.send_from_email_server \
-                and self.send_from_email_port:
-            context = ssl.create_default_context()
-            try:
-                with smtplib.SMTP_SSL(self.send_from_email_server, self.send_from_email_port, context=context) as server:
-                    server.login(self.send_from_email_address, self.send_from_email_password)
-                    server.sendmail(self.send_from_email_address, self.send_to_email_address, message)
-                    self.logger.info(f"BinanceTrailingStopLossManager.send_email_notification() - Email sent!")
-                    if self.print_notifications:
-                        print("Email sent!")
-                    return True
-            except socket.gaierror as error_msg:
-                self.logger.info(f"BinanceTrailingStopLossManager.send_email_notification() - {error_msg}")
-                if self.print_notifications:
-                    print(f"ERROR: Email not sent! {error_msg}")
-        else:
+        dispatcher = self.get_notification_dispatcher()
+        if dispatcher.is_email_enabled() is False:
             self.logger.debug(f"BinanceTrailingStopLossManager.send_email_notification() - Data for email dispatch not "
                               f"available")
             return False
+        if blocking is True:
+            if dispatcher.deliver(channel=CHANNEL_EMAIL, message=message) is False:
+                if self.print_notifications:
+                    print(f"ERROR: Email not sent!")
+                return False
+            return True
+        return dispatcher.send_notification(message, channels=(CHANNEL_EMAIL, ))
 
     def send_telegram_notification(self,
-                                   message: str = None) -> bool:
+                                   message: str = None,
+                                   blocking: bool = False) -> bool:
         """
-        Send a notification via telegram!
+        Send a notification via telegram! The message is queued and sent in the background by the notification
+        dispatcher.
 
         :param message: Text to send via Telegram.
         :type message: str
+        :param blocking: Send the message before returning, used by the notification test.
+        :type blocking: bool
 
-        :return:
+        :return: bool (True if the message was queued or sent)
         """
         self.logger.debug(f"BinanceTrailingStopLossManager.send_telegram_message() - msg: {message}")
-        if self.telegram_send_to \
-                and self.telegram_bot_token:
-            date = datetime.datetime.now().strftime("%H:%M:%S")
-            msg = message.replace("%25", "%")
-            logging.info(" ".join([msg, "at", date]))
-            request_url = f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage?chat_id=" \
-                          f"{self.telegram_send_to}&parse_mode=HTML&text={message}"
-            response = requests.get(request_url)
-            self.logger.info(f"BinanceTrailingStopLossManager.send_telegram_message() - response: {response}")
-            return True
-        else:
+        dispatcher = self.get_notification_dispatcher()
+        if dispatcher.is_telegram_enabled() is False:
             self.logger.debug(f"BinanceTrailingStopLossManager.send_telegram_message() - Data for Telegram dispatch "
                               f"not available")
             return False
+        if blocking is True:
+            return dispatcher.deliver(channel=CHANNEL_TELEGRAM, message=message)
+        return dispatcher.send_notification(message, channels=(CHANNEL_TELEGRAM, ))
 
     def stop(self) -> bool:
         """
@@ -1209,6 +2164,13 @@ class BinanceTrailingStopLossManager(threading.Thread):
         self.logger.info(f"BinanceTrailingStopLossManager.stop_manager() - Gracefully stopping "
                          f"unicorn-binance-trailing-stop-loss engine")
         self.stop_manager_request = True
+        self.stop_loss_order_request.set()
+        if self.journal is not None:
+            self.journal.close()
+        if self.portfolio_manager is not None:
+            # The streams and API sessions are shared and owned by the portfolio manager
+            self.portfolio_manager.remove_market(market=self.market)
+            return True
         if self.ubwa is not None:
             self.ubwa.stop_manager()
         if self.ubra is not None:
@@ -1218,6 +2180,25 @@ class BinanceTrailingStopLossManager(threading.Thread):
             self.llm.close()
         return True
 
+    def set_rest_api_endpoint(self, rest_api_endpoint: str = None) -> bool:
+        """
+        Send the REST requests of the ubra instance to another base URL, for example to a `BinanceMockExchange`.
+
+        :param rest_api_endpoint: Base URL like `http://127.0.0.1:8080`, the paths `/api`, `/sapi` and `/fapi` are
+                                  appended.
+        :type rest_api_endpoint: str
+
+        :return: bool
+        """
+        base_url = rest_api_endpoint.rstrip("/")
+        self.logger.info(f"BinanceTrailingStopLossManager.set_rest_api_endpoint() - Using REST API endpoint "
+                         f"`{base_url}`")
+        self.ubra.API_URL = f"{base_url}/api"
+        self.ubra.API_TESTNET_URL = f"{base_url}/api"
+        self.ubra.MARGIN_API_URL = f"{base_url}/sapi"
+        self.ubra.FUTURES_URL = f"{base_url}/fapi"
+        return True
+
     def set_stop_loss_price(self, stop_loss_price: float = None) -> bool:
         """
         Set the stop/loss price.
@@ -1230,6 +2211,22 @@ class BinanceTrailingStopLossManager(threading.Thread):
         self.logger.debug(f"BinanceTrailingStopLossManager.set_stop_loss_price() - "
                           f"Setting new stop_loss_price={stop_loss_price}")
         self.stop_loss_price = stop_loss_price
+        self.append_journal_record("stop_loss_price", stop_loss_price=stop_loss_price)
+        return True
+
+    def set_websocket_api_endpoint(self, websocket_api_endpoint: str = None) -> bool:
+        """
+        Connect the streams of the ubwa instance to another base URL, for example to a `BinanceMockExchange`.
+
+        :param websocket_api_endpoint: Base URL like `ws://127.0.0.1:8081`.
+        :type websocket_api_endpoint: str
+
+        :return: bool
+        """
+        base_url = websocket_api_endpoint.rstrip("/")
+        self.logger.info(f"BinanceTrailingStopLossManager.set_websocket_api_endpoint() - Using websocket API endpoint "
+                         f"`{base_url}`")
+        self.ubwa.websocket_base_uri = f"{base_url}/"
         return True
 
     def update_stop_loss_quantity(self,
@@ -1266,6 +2263,57 @@ class BinanceTrailingStopLossManager(threading.Thread):
         self.stop_loss_quantity = stop_loss_quantity
         return stop_loss_quantity
 
+    def update_balance_book(self,
+                            balances: list = None) -> bool:
+        """
+        Update the local balance book with the balances of an `outboundAccountPosition` event.
+
+        :param balances: List of dicts with the keys `asset`, `free` and `locked`.
+        :type balances: list
+
+        :return: bool
+        """
+        if not balances:
+            return False
+        for balance in balances:
+            free = float(balance['free'])
+            if self.exchange_adapter.balance_total_includes_locked is True:
+                total = free + float(balance['locked'])
+            else:
+                total = free
+            self.balance_book[balance['asset']] = {'total': total, 'free': free, 'update_time': time.time()}
+            if balance['asset'] == self.stop_loss_asset_name:
+                self.balance_book_valid.set()
+                self.append_journal_record("balance", asset=balance['asset'], total=total, free=free)
+        return True
+
+    def update_order_cache(self,
+                           stream_data: dict = None) -> bool:
+        """
+        Update the local order cache with an `executionReport` of the userData stream. Orders in a final state get
+        removed.
+
+        :param stream_data: The UnicornFy `executionReport`
+        :type stream_data: dict
+
+        :return: bool
+        """
+        if stream_data['current_order_status'] in ("FILLED", "CANCELED", "EXPIRED", "REJECTED", "EXPIRED_IN_MATCH"):
+            self.order_cache.pop(stream_data['order_id'], None)
+            return True
+        order = {'order_id': stream_data['order_id'],
+                 'symbol': stream_data['symbol'],
+                 'side': stream_data['side'],
+                 'type': stream_data['order_type'],
+                 'status': stream_data['current_order_status'],
+                 'price': float(stream_data['order_price']),
+                 'stop_price': float(stream_data['stop_price']),
+                 'quantity': float(stream_data['order_quantity']),
+                 'executed_quantity': float(stream_data['cumulative_filled_quantity']),
+                 'update_time': time.time()}
+        self.order_cache[stream_data['order_id']] = order
+        return True
+
     def update_stop_loss_asset_amount(self,
                                       total: float = None,
                                       free: float = None) -> tuple:
@@ -1280,7 +2328,64 @@ class BinanceTrailingStopLossManager(threading.Thread):
         :return: tuple
         """
         if total is None or free is None:
-            total, free = self.get_owning_amount(base_asset=self.stop_loss_asset_name)
+            owning_amount = self.get_owning_amount_from_balance_book(base_asset=self.stop_loss_asset_name)
+            if owning_amount is None:
+                self.reconcile_balance_book()
+                balance = self.balance_book[self.stop_loss_asset_name]
+                owning_amount = balance['total'], balance['free']
+            total, free = owning_amount
         self.stop_loss_asset_amount = float(total)
         self.stop_loss_asset_amount_free = float(free)
         return total, free
+
+    def update_used_weight_metric(self) -> bool:
+        """
+        Update the `ubtsl_used_weight` metric with the used weight the exchange reported in the last REST response.
+
+        :return: bool
+        """
+        try:
+            # Cached, `get_used_weight()` would send a ping request to read the weight
+            used_weight = self.ubra.get_used_weight(cached=True)
+        except AttributeError:
+            # No response received yet
+            return False
+        if isinstance(used_weight, dict):
+            used_weight = used_weight.get('weight_1m') or used_weight.get('weight')
+        try:
+            USED_WEIGHT.labels(self.exchange).set(float(used_weight))
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    def wait_till_streams_are_ready(self,
+                                    timeout: float = 10.0) -> bool:
+        """
+        Wait till the userData stream is connected and the price feed is connected or delivered its first price.
+
+        If the `BinanceWebSocketApiManager` instance was provided by the caller, its stream signals do not reach this
+        manager and `wait_till_stream_has_started()` of the UNICORN Binance WebSocket API is used instead.
+
+        :param timeout: Maximum time to wait in seconds.
+        :type timeout: float
+
+        :return: bool
+        """
+        if self.stream_signals_enabled is False:
+            if self.trade_stream_id is None:
+                return self.ubwa.wait_till_stream_has_started(self.user_stream_id)
+            return self.ubwa.wait_till_stream_has_started(self.user_stream_id) and \
+                self.ubwa.wait_till_stream_has_started(self.trade_stream_id)
+        deadline = time.time() + timeout
+        if self.user_stream_ready.wait(timeout) is False:
+            self.logger.warning(f"BinanceTrailingStopLossManager.wait_till_streams_are_ready() - The userData stream "
+                                f"is not connected after {timeout} seconds")
+            return False
+        if self.trade_stream_id is None:
+            # The `native-trail` engine has no price feed
+            return True
+        if self.price_feed_ready.wait(max(0.0, deadline - time.time())) is False:
+            self.logger.warning(f"BinanceTrailingStopLossManager.wait_till_streams_are_ready() - The price feed is "
+                                f"not connected after {timeout} seconds")
+            return False
+        return True
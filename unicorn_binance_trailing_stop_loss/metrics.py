@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/metrics.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+import functools
+import logging
+import threading
+import time
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+# The values are updated without locks to keep the overhead per tick low: every value is written by one thread (the
+# stream callback of its market or the order worker), the scrapes only read them.
+
+# Upper bounds in seconds, from the few microseconds of a tick up to slow REST requests
+DURATION_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+metrics_servers: dict = {}
+metrics_servers_lock = threading.Lock()
+
+
+class MetricsValue(object):
+    """
+    Value of a metric for one combination of label values.
+    """
+    def __init__(self):
+        self.value: float = 0
+
+    def inc(self, value: float = 1) -> None:
+        """
+        Increase the value.
+
+        :param value: The increment.
+        :type value: float
+
+        :return: None
+        """
+        self.value += value
+
+    def set(self, value: float = None) -> None:
+        """
+        Set the value.
+
+        :param value: The new value.
+        :type value: float
+
+        :return: None
+        """
+        self.value = value
+
+    def get_samples(self) -> list:
+        """
+        Get the samples of the value.
+
+        :return: list of (suffix, extra labels, value)
+        """
+        return [("", (), self.value)]
+
+
+class MetricsHistogramValue(object):
+    """
+    Histogram of a metric for one combination of label values. An observation costs one binary search and one
+    increment, the cumulative bucket counts of the exposition format are only built on scrapes.
+
+    :param buckets: Sorted upper bounds of the buckets.
+    :type buckets: tuple
+    """
+    def __init__(self, buckets: tuple = None):
+        self.buckets = buckets
+        self.counts: list = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+
+    def observe(self, value: float = None) -> None:
+        """
+        Add an observation.
+
+        :param value: The observed value.
+        :type value: float
+
+        :return: None
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def get_samples(self) -> list:
+        """
+        Get the `_bucket`, `_sum` and `_count` samples of the histogram.
+
+        :return: list of (suffix, extra labels, value)
+        """
+        counts = list(self.counts)
+        total = self.sum
+        samples = []
+        cumulative = 0
+        for upper_bound, count in zip(self.buckets + ("+Inf", ), counts):
+            cumulative += count
+            samples.append(("_bucket", (("le", str(upper_bound)), ), cumulative))
+        samples.append(("_sum", (), total))
+        samples.append(("_count", (), cumulative))
+        return samples
+
+
+class MetricsCounter(object):
+    """
+    Monotonic counter. Use `labels()` once to get the `MetricsValue` of a combination of label values and keep it, so
+    the hot path does not need to look it up again.
+
+    :param name: Metric name.
+    :type name: str
+    :param documentation: Text of the `# HELP` line.
+    :type documentation: str
+    :param label_names: Names of the labels.
+    :type label_names: tuple
+    """
+    metric_type = "counter"
+
+    def __init__(self, name: str = None, documentation: str = None, label_names: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.lock = threading.Lock()
+        self.values: dict = {}
+
+    def create_value(self):
+        """
+        Create the value of a new combination of label values.
+
+        :return: MetricsValue
+        """
+        return MetricsValue()
+
+    def labels(self, *label_values):
+        """
+        Get the value of a combination of label values.
+
+        :param label_values: The label values in the order of `label_names`.
+
+        :return: MetricsValue or MetricsHistogramValue
+        """
+        value = self.values.get(label_values)
+        if value is None:
+            with self.lock:
+                value = self.values.setdefault(label_values, self.create_value())
+        return value
+
+    def get_samples(self) -> list:
+        """
+        Get the samples of the metric.
+
+        :return: list of (suffix, labels, value)
+        """
+        with self.lock:
+            values = list(self.values.items())
+        samples = []
+        for label_values, value in values:
+            labels = tuple(zip(self.label_names, label_values))
+            for suffix, extra_labels, sample in value.get_samples():
+                samples.append((suffix, labels + extra_labels, sample))
+        return samples
+
+
+class MetricsGauge(MetricsCounter):
+    """
+    Value that can go up and down.
+    """
+    metric_type = "gauge"
+
+
+class MetricsHistogram(MetricsCounter):
+    """
+    Histogram with fixed buckets.
+
+    :param buckets: Sorted upper bounds of the buckets, `+Inf` is added.
+    :type buckets: tuple
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name: str = None, documentation: str = None, label_names: tuple = (),
+                 buckets: tuple = DURATION_BUCKETS):
+        super().__init__(name=name, documentation=documentation, label_names=label_names)
+        self.buckets = tuple(buckets)
+
+    def create_value(self):
+        """
+        Create the histogram of a new combination of label values.
+
+        :return: MetricsHistogramValue
+        """
+        return MetricsHistogramValue(buckets=self.buckets)
+
+
+class MetricsRegistry(object):
+    """
+    Collection of the metrics of a process rendered in the Prometheus text exposition format.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: dict = {}
+
+    def add_metric(self, metric: MetricsCounter = None) -> MetricsCounter:
+        """
+        Add a metric or get the already registered metric of the same name.
+
+        :param metric: The metric.
+        :type metric: MetricsCounter, MetricsGauge or MetricsHistogram
+
+        :return: MetricsCounter, MetricsGauge or MetricsHistogram
+        """
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    @staticmethod
+    def escape_label_value(value=None) -> str:
+        """
+        Escape a label value for the exposition format.
+
+        :return: str
+        """
+        return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    def render(self) -> str:
+        """
+        Render all metrics in the Prometheus text exposition format version 0.0.4.
+
+        :return: str
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for suffix, labels, value in metric.get_samples():
+                if labels:
+                    label_str = "{" + ",".join(f"{key}=\"{self.escape_label_value(label_value)}\""
+                                               for key, label_value in labels) + "}"
+                else:
+                    label_str = ""
+                lines.append(f"{metric.name}{suffix}{label_str} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+FUNCTION_DURATION = REGISTRY.add_metric(MetricsHistogram("ubtsl_function_duration_seconds",
+                                                         "Duration of the instrumented manager functions.",
+                                                         ("market", "function")))
+ORDER_RETRIES = REGISTRY.add_metric(MetricsCounter("ubtsl_order_retries_total",
+                                                   "Retries of stop/loss order creations by error code.",
+                                                   ("market", "code")))
+REST_REQUEST_DURATION = REGISTRY.add_metric(MetricsHistogram("ubtsl_rest_request_duration_seconds",
+                                                             "Duration of REST requests including the wait for the "
+                                                             "rate limits.",
+                                                             ("exchange", "function")))
+REST_REQUEST_ERRORS = REGISTRY.add_metric(MetricsCounter("ubtsl_rest_request_errors_total",
+                                                         "Failed REST requests by error code.",
+                                                         ("exchange", "function", "code")))
+STOP_LOSS_UPDATES = REGISTRY.add_metric(MetricsCounter("ubtsl_stop_loss_updates_total",
+                                                       "Placed stop/loss orders by method (`create` or `replace`).",
+                                                       ("market", "method")))
+STREAM_LAG = REGISTRY.add_metric(MetricsHistogram("ubtsl_stream_lag_seconds",
+                                                  "Delay between the event time of the exchange and the processing "
+                                                  "of the stream data.",
+                                                  ("market", "stream"),
+                                                  buckets=LAG_BUCKETS))
+TICKS_RECEIVED = REGISTRY.add_metric(MetricsCounter("ubtsl_ticks_received_total",
+                                                    "Received price feed ticks.",
+                                                    ("market", )))
+USED_WEIGHT = REGISTRY.add_metric(MetricsGauge("ubtsl_used_weight",
+                                               "Used request weight of the last minute reported by the exchange.",
+                                               ("exchange", )))
+
+
+def measure_duration(function):
+    """
+    Decorator for methods of `BinanceTrailingStopLossManager` that observes their duration in `FUNCTION_DURATION` if
+    the metrics of the manager are enabled.
+
+    :return: function
+    """
+    function_name = function.__name__
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        if self.metrics_enabled is False:
+            return function(self, *args, **kwargs)
+        start_time = time.perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            FUNCTION_DURATION.labels(self.market, function_name).observe(time.perf_counter() - start_time)
+    return wrapper
+
+
+class MetricsHTTPRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP request handler of the `/metrics` endpoint.
+    """
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return None
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        __logger__.debug(f"MetricsHTTPRequestHandler() - {self.address_string()} - {format % args}")
+
+
+def start_metrics_server(port: int = None, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """
+    Start the `/metrics` endpoint of this process. All managers of a process share the same `REGISTRY`, so the server
+    is started only once per port.
+
+    :param port: TCP port.
+    :type port: int
+    :param host: Interface to listen on, default is localhost only.
+    :type host: str
+
+    :return: ThreadingHTTPServer or None
+    """
+    with metrics_servers_lock:
+        if (host, port) in metrics_servers:
+            return metrics_servers[(host, port)]
+        try:
+            server = ThreadingHTTPServer((host, int(port)), MetricsHTTPRequestHandler)
+        except OSError as error_msg:
+            __logger__.error(f"start_metrics_server() - Can not listen on {host}:{port} - {error_msg}")
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name=f"ubtsl-metrics-{port}", daemon=True).start()
+        metrics_servers[(host, port)] = server
+        __logger__.info(f"start_metrics_server() - Serving metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+
+def stop_metrics_server(port: int = None, host: str = "127.0.0.1") -> bool:
+    """
+    Stop the `/metrics` endpoint started with `start_metrics_server()`.
+
+    :return: bool
+    """
+    with metrics_servers_lock:
+        server = metrics_servers.pop((host, port), None)
+    if server is None:
+        return False
+    server.shutdown()
+    server.server_close()
+    return True
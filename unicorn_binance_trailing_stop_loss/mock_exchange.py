@@ -0,0 +1,938 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/mock_exchange.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qsl, urlparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+import websockets
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+# Quote assets used to split a market name if `base_asset` and `quote_asset` are not provided
+QUOTE_ASSETS = ("FDUSD", "USDT", "BUSD", "USDC", "TUSD", "BTC", "ETH", "BNB", "EUR", "TRY")
+
+ERRORS = {-1003: (429, "Too many requests; current limit is 1200 request weight per 1 MINUTE."),
+          -1013: (400, "Filter failure: LOT_SIZE"),
+          -1121: (400, "Invalid symbol."),
+          -2010: (400, "Account has insufficient balance for requested action."),
+          -2011: (400, "Unknown order sent."),
+          -2022: (400, "Order cancel-replace failed.")}
+
+
+class BinanceMockExchangeError(Exception):
+    """
+    Error response of the mock exchange.
+
+    :param code: Binance error code.
+    :type code: int
+    :param msg: Error message, default is the message of `ERRORS`.
+    :type msg: str
+    """
+    def __init__(self, code: int = None, msg: str = None):
+        self.code = code
+        self.status_code, default_msg = ERRORS.get(code, (400, "Unknown error."))
+        self.msg = msg or default_msg
+        super().__init__(f"{self.code}: {self.msg}")
+
+
+class BinanceMockExchangeRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP request handler of the REST API of `BinanceMockExchange`.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_DELETE(self):
+        self.process_request(method="DELETE")
+
+    def do_GET(self):
+        self.process_request(method="GET")
+
+    def do_POST(self):
+        self.process_request(method="POST")
+
+    def do_PUT(self):
+        self.process_request(method="PUT")
+
+    def log_message(self, format, *args):
+        __logger__.debug(f"BinanceMockExchangeRequestHandler() - {self.address_string()} - {format % args}")
+
+    def process_request(self, method: str = None) -> None:
+        """
+        Parse the query and the form body, let the exchange process the request and send the JSON response.
+
+        :return: None
+        """
+        url = urlparse(self.path)
+        params = dict(parse_qsl(url.query))
+        content_length = int(self.headers.get("Content-Length") or 0)
+        if content_length > 0:
+            params.update(dict(parse_qsl(self.rfile.read(content_length).decode("utf-8"))))
+        status_code, headers, response = self.server.exchange.process_rest_request(method=method,
+                                                                                   path=url.path,
+                                                                                   params=params)
+        body = json.dumps(response).encode("utf-8")
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json;charset=UTF-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class BinanceMockExchange(threading.Thread):
+    """
+    Local stand-in for the subset of the Binance spot REST and websocket API used by
+    `BinanceTrailingStopLossManager`, for load and latency tests without credentials.
+
+    REST: `ping`, `time`, `exchangeInfo`, `ticker/price`, `account`, `order` (create, query, cancel),
+    `order/cancelReplace`, `openOrders` and `userDataStream` (listenKey) below `/api/v3/`. API keys and signatures are
+    accepted without verification, all clients share one account.
+
+    Websocket: `/ws/<stream>` and `/stream?streams=<stream>/<stream>` with `SUBSCRIBE` and `UNSUBSCRIBE` requests.
+    Supported streams are `<symbol>@aggTrade` and the listenKeys of the userData stream, which receive
+    `executionReport` and `outboundAccountPosition` events.
+
+    The prices are generated by a geometric random walk with `volatility` per trade and `trades_per_second` trades of
+    each market. `STOP_LOSS_LIMIT`, `LIMIT` and `MARKET` orders are matched against them and always filled completely.
+
+    Latency and errors can be injected: every REST request is delayed by `latency` plus up to `latency_jitter` seconds,
+    order requests fail with a probability of `error_rate` with a random code of `error_codes`, and `inject_error()`
+    queues errors for the next requests. The code `-1003` is answered with HTTP 429 and a `Retry-After` header.
+
+    .. code-block:: python
+
+        with BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}) as mock_exchange:
+            mock_exchange.start()
+            mock_exchange.wait_till_ready()
+            ubtsl = BinanceTrailingStopLossManager(market="BTCUSDT",
+                                                   stop_loss_limit="0.5%",
+                                                   rest_api_endpoint=mock_exchange.get_rest_api_endpoint(),
+                                                   websocket_api_endpoint=mock_exchange.get_websocket_api_endpoint())
+
+    :param host: Interface to listen on.
+    :type host: str
+    :param rest_api_port: Port of the REST API, 0 chooses a free port.
+    :type rest_api_port: int
+    :param websocket_api_port: Port of the websocket API, 0 chooses a free port.
+    :type websocket_api_port: int
+    :param markets: Dict of markets with dicts of the optional keys `base_asset`, `quote_asset`, `price`,
+                    `tick_size`, `step_size` and `min_notional`. Default is `BTCUSDT` at 30000.
+    :type markets: dict or None
+    :param balances: Free balances by asset. Default is 1.0 of each base asset and 100000.0 of each quote asset.
+    :type balances: dict or None
+    :param trades_per_second: Generated trades per second and market, 0 disables the generator.
+    :type trades_per_second: float
+    :param volatility: Standard deviation of the relative price change per trade.
+    :type volatility: float
+    :param latency: Delay of each REST response in seconds.
+    :type latency: float
+    :param latency_jitter: Maximum additional random delay of each REST response in seconds.
+    :type latency_jitter: float
+    :param error_rate: Probability of an error response to order requests.
+    :type error_rate: float
+    :param error_codes: Binance error codes used for `error_rate`.
+    :type error_codes: tuple
+    :param retry_after: Value of the `Retry-After` header of HTTP 429 responses in seconds.
+    :type retry_after: int
+    :param seed: Seed of the random generator.
+    :type seed: int or None
+    :param print_notifications: If True the class will output notifications to the console.
+    :type print_notifications: bool
+    """
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 rest_api_port: int = 0,
+                 websocket_api_port: int = 0,
+                 markets: Optional[dict] = None,
+                 balances: Optional[dict] = None,
+                 trades_per_second: float = 10.0,
+                 volatility: float = 0.0005,
+                 latency: float = 0.0,
+                 latency_jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_codes: tuple = (-2010, -1003),
+                 retry_after: int = 1,
+                 seed: Optional[int] = None,
+                 print_notifications: bool = False):
+        threading.Thread.__init__(self, daemon=True)
+        self.logger = __logger__
+        self.host = host
+        self.rest_api_port = rest_api_port
+        self.websocket_api_port = websocket_api_port
+        self.trades_per_second = float(trades_per_second)
+        self.volatility = float(volatility)
+        self.latency = float(latency)
+        self.latency_jitter = float(latency_jitter)
+        self.error_rate = float(error_rate)
+        self.error_codes = tuple(error_codes)
+        self.retry_after = retry_after
+        self.print_notifications = print_notifications
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.ready = threading.Event()
+        self.stop_request: Optional[asyncio.Event] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.outbox: Optional[asyncio.Queue] = None
+        self.http_server: Optional[ThreadingHTTPServer] = None
+        self.connections: dict = {}
+        self.injected_errors: list = []
+        self.listen_keys: set = set()
+        self.order_ids = itertools.count(1)
+        self.orders: dict = {}
+        self.trade_ids = itertools.count(1)
+        self.request_timestamps: list = []
+        self.statistics: dict = {'orders': 0,
+                                 'requests': {},
+                                 'tick_to_order_latencies': [],
+                                 'trades': 0}
+        self.markets: dict = {}
+        for market, settings in (markets or {"BTCUSDT": {'price': 30000.0}}).items():
+            market = market.upper()
+            base_asset = settings.get('base_asset')
+            quote_asset = settings.get('quote_asset')
+            if base_asset is None or quote_asset is None:
+                quote_asset = next((asset for asset in QUOTE_ASSETS if market.endswith(asset)), market[-4:])
+                base_asset = market[:-len(quote_asset)]
+            self.markets[market] = {'base_asset': base_asset,
+                                    'quote_asset': quote_asset,
+                                    'price': float(settings.get('price', 100.0)),
+                                    'tick_size': float(settings.get('tick_size', 0.01)),
+                                    'step_size': float(settings.get('step_size', 0.00001)),
+                                    'min_notional': float(settings.get('min_notional', 5.0)),
+                                    'last_trade_time': None}
+        if balances is None:
+            balances = {}
+            for market in self.markets.values():
+                balances.setdefault(market['base_asset'], 1.0)
+                balances.setdefault(market['quote_asset'], 100000.0)
+        self.balances: dict = {asset: {'free': float(free), 'locked': 0.0} for asset, free in balances.items()}
+
+    def __enter__(self):
+        self.logger.debug(f"Entering 'with-context' ...")
+        return self
+
+    def __exit__(self, exc_type, exc_value, error_traceback):
+        self.logger.debug(f"Leaving 'with-context' ...")
+        self.stop_manager()
+        if exc_type:
+            self.logger.critical(f"An exception occurred: {exc_type} - {exc_value} - {error_traceback}")
+
+    def cancel_order(self, params: dict = None) -> dict:
+        """
+        Cancel an open order.
+
+        :return: dict (order)
+        """
+        order = self.get_order(params=params)
+        if order['status'] not in ("NEW", "PARTIALLY_FILLED"):
+            raise BinanceMockExchangeError(-2011)
+        order['status'] = "CANCELED"
+        self.release_balance(order)
+        del self.orders[order['orderId']]
+        self.publish_execution_report(order=order, execution_type="CANCELED")
+        self.publish_account_position(assets=self.get_order_assets(order))
+        return self.get_order_response(order)
+
+    def cancel_replace_order(self, params: dict = None) -> dict:
+        """
+        Cancel an open order and place a new one with `cancelReplaceMode` `STOP_ON_FAILURE`.
+
+        :return: dict
+        """
+        cancel_params = {'symbol': params.get('symbol'),
+                         'orderId': params.get('cancelOrderId'),
+                         'origClientOrderId': params.get('cancelOrigClientOrderId')}
+        try:
+            cancel_response = self.cancel_order(params=cancel_params)
+        except BinanceMockExchangeError as error_msg:
+            raise BinanceMockExchangeError(-2022, f"{error_msg.msg} (cancelResult=FAILURE, "
+                                                  f"newOrderResult=NOT_ATTEMPTED)")
+        new_order_response = self.create_order(params=params)
+        return {'cancelResult': "SUCCESS",
+                'newOrderResult': "SUCCESS",
+                'cancelResponse': cancel_response,
+                'newOrderResponse': new_order_response}
+
+    def create_order(self, params: dict = None) -> dict:
+        """
+        Validate and place a new order, it gets matched against the current price immediately.
+
+        :return: dict (order)
+        """
+        market = self.get_market(params.get('symbol'))
+        order_type = str(params.get('type', "")).upper()
+        side = str(params.get('side', "")).upper()
+        if order_type not in ("LIMIT", "MARKET", "STOP_LOSS_LIMIT") or side not in ("BUY", "SELL"):
+            raise BinanceMockExchangeError(-1013, f"Invalid order type or side: {order_type} {side}")
+        quantity = float(params.get('quantity') or 0)
+        if quantity <= 0:
+            raise BinanceMockExchangeError(-1013)
+        price = float(params.get('price') or market['price'])
+        stop_price = float(params.get('stopPrice') or 0)
+        if quantity * price < market['min_notional']:
+            raise BinanceMockExchangeError(-1013, "Filter failure: NOTIONAL")
+        if order_type == "STOP_LOSS_LIMIT":
+            if (side == "SELL" and stop_price >= market['price']) or (side == "BUY" and stop_price <= market['price']):
+                raise BinanceMockExchangeError(-2010, "Stop price would trigger immediately.")
+        now = int(time.time() * 1000)
+        order = {'symbol': params.get('symbol').upper(),
+                 'orderId': next(self.order_ids),
+                 'orderListId': -1,
+                 'clientOrderId': params.get('newClientOrderId') or uuid.uuid4().hex[:22],
+                 'price': price if order_type != "MARKET" else 0.0,
+                 'origQty': quantity,
+                 'executedQty': 0.0,
+                 'cummulativeQuoteQty': 0.0,
+                 'status': "NEW",
+                 'timeInForce': params.get('timeInForce', "GTC"),
+                 'type': order_type,
+                 'side': side,
+                 'stopPrice': stop_price,
+                 'time': now,
+                 'updateTime': now,
+                 'isWorking': order_type != "STOP_LOSS_LIMIT"}
+        self.lock_balance(order)
+        self.orders[order['orderId']] = order
+        self.statistics['orders'] += 1
+        if market['last_trade_time'] is not None:
+            self.statistics['tick_to_order_latencies'].append(time.perf_counter() - market['last_trade_time'])
+        self.publish_execution_report(order=order, execution_type="NEW")
+        self.publish_account_position(assets=self.get_order_assets(order))
+        self.match_order(order=order, market=market, is_resting=False)
+        return self.get_order_response(order)
+
+    def fill_order(self, order: dict = None, price: float = None) -> None:
+        """
+        Fill an order completely and update the balances.
+
+        :return: None
+        """
+        market = self.markets[order['symbol']]
+        base = self.balances.setdefault(market['base_asset'], {'free': 0.0, 'locked': 0.0})
+        quote = self.balances.setdefault(market['quote_asset'], {'free': 0.0, 'locked': 0.0})
+        quantity = order['origQty']
+        self.release_balance(order)
+        if order['side'] == "SELL":
+            base['free'] -= quantity
+            quote['free'] += quantity * price
+        else:
+            quote['free'] -= quantity * price
+            base['free'] += quantity
+        order['executedQty'] = quantity
+        order['cummulativeQuoteQty'] = quantity * price
+        order['status'] = "FILLED"
+        order['updateTime'] = int(time.time() * 1000)
+        del self.orders[order['orderId']]
+        self.publish_execution_report(order=order, execution_type="TRADE", last_price=price, last_quantity=quantity)
+        self.publish_account_position(assets=self.get_order_assets(order))
+
+    async def generate_prices(self) -> None:
+        """
+        Generate `trades_per_second` trades per market, several trades are generated per loop iteration if the event
+        loop can not keep up with the rate.
+
+        :return: None
+        """
+        if self.trades_per_second <= 0:
+            return None
+        start_time = time.perf_counter()
+        generated = 0
+        while self.stop_request.is_set() is False:
+            due = int((time.perf_counter() - start_time) * self.trades_per_second) - generated
+            for _ in range(due):
+                for symbol, market in self.markets.items():
+                    price = market['price'] * math.exp(self.random.gauss(0.0, self.volatility))
+                    self.process_trade(symbol=symbol, price=price)
+            generated += max(due, 0)
+            await asyncio.sleep(max(0.001, 1.0 / self.trades_per_second))
+
+    def get_account(self) -> dict:
+        """
+        Get the account information.
+
+        :return: dict
+        """
+        return {'makerCommission': 10,
+                'takerCommission': 10,
+                'buyerCommission': 0,
+                'sellerCommission': 0,
+                'canTrade': True,
+                'canWithdraw': True,
+                'canDeposit': True,
+                'updateTime': int(time.time() * 1000),
+                'accountType': "SPOT",
+                'balances': [{'asset': asset, 'free': f"{balance['free']:.8f}", 'locked': f"{balance['locked']:.8f}"}
+                             for asset, balance in self.balances.items()],
+                'permissions': ["SPOT"]}
+
+    def get_exchange_info(self, symbol: Optional[str] = None) -> dict:
+        """
+        Get the exchangeInfo of all or one market.
+
+        :return: dict
+        """
+        symbols = []
+        for name, market in self.markets.items():
+            if symbol is not None and name != symbol.upper():
+                continue
+            symbols.append({'symbol': name,
+                            'status': "TRADING",
+                            'baseAsset': market['base_asset'],
+                            'baseAssetPrecision': 8,
+                            'quoteAsset': market['quote_asset'],
+                            'quotePrecision': 8,
+                            'quoteAssetPrecision': 8,
+                            'orderTypes': ["LIMIT", "LIMIT_MAKER", "MARKET", "STOP_LOSS_LIMIT", "TAKE_PROFIT_LIMIT"],
+                            'icebergAllowed': True,
+                            'ocoAllowed': True,
+                            'cancelReplaceAllowed': True,
+                            'isSpotTradingAllowed': True,
+                            'isMarginTradingAllowed': False,
+                            'filters': [{'filterType': "PRICE_FILTER",
+                                         'minPrice': f"{market['tick_size']:.8f}",
+                                         'maxPrice': "1000000.00000000",
+                                         'tickSize': f"{market['tick_size']:.8f}"},
+                                        {'filterType': "LOT_SIZE",
+                                         'minQty': f"{market['step_size']:.8f}",
+                                         'maxQty': "9000.00000000",
+                                         'stepSize': f"{market['step_size']:.8f}"},
+                                        {'filterType': "NOTIONAL",
+                                         'minNotional': f"{market['min_notional']:.8f}",
+                                         'applyMinToMarket': True,
+                                         'maxNotional': "9000000.00000000",
+                                         'applyMaxToMarket': False,
+                                         'avgPriceMins': 5}],
+                            'permissions': ["SPOT"]})
+        if symbol is not None and not symbols:
+            raise BinanceMockExchangeError(-1121)
+        return {'timezone': "UTC",
+                'serverTime': int(time.time() * 1000),
+                'rateLimits': [{'rateLimitType': "REQUEST_WEIGHT", 'interval': "MINUTE", 'intervalNum': 1,
+                                'limit': 6000},
+                               {'rateLimitType': "ORDERS", 'interval': "SECOND", 'intervalNum': 10, 'limit': 100},
+                               {'rateLimitType': "ORDERS", 'interval': "DAY", 'intervalNum': 1, 'limit': 200000},
+                               {'rateLimitType': "RAW_REQUESTS", 'interval': "MINUTE", 'intervalNum': 5,
+                                'limit': 61000}],
+                'exchangeFilters': [],
+                'symbols': symbols}
+
+    def get_market(self, symbol: str = None) -> dict:
+        """
+        Get the settings and the current price of a market.
+
+        :return: dict
+        """
+        market = self.markets.get(str(symbol).upper())
+        if market is None:
+            raise BinanceMockExchangeError(-1121)
+        return market
+
+    def get_order(self, params: dict = None) -> dict:
+        """
+        Get an open order by `orderId` or `origClientOrderId`.
+
+        :return: dict
+        """
+        if params.get('orderId') is not None:
+            order = self.orders.get(int(params.get('orderId')))
+        else:
+            order = next((order for order in self.orders.values()
+                          if order['clientOrderId'] == params.get('origClientOrderId')), None)
+        if order is None or (params.get('symbol') is not None and order['symbol'] != params.get('symbol').upper()):
+            raise BinanceMockExchangeError(-2011)
+        return order
+
+    def get_order_assets(self, order: dict = None) -> tuple:
+        """
+        Get the base and the quote asset of an order.
+
+        :return: tuple
+        """
+        market = self.markets[order['symbol']]
+        return market['base_asset'], market['quote_asset']
+
+    @staticmethod
+    def get_order_response(order: dict = None) -> dict:
+        """
+        Convert an order into the format of the REST API.
+
+        :return: dict
+        """
+        response = {key: value for key, value in order.items() if key != "lockedAmount"}
+        for key in ("price", "origQty", "executedQty", "cummulativeQuoteQty", "stopPrice"):
+            response[key] = f"{order[key]:.8f}"
+        response['transactTime'] = order['updateTime']
+        response['workingTime'] = order['time'] if order['isWorking'] else -1
+        response['selfTradePreventionMode'] = "NONE"
+        return response
+
+    def get_rest_api_endpoint(self) -> str:
+        """
+        Get the base URL of the REST API for the `rest_api_endpoint` parameter of the manager.
+
+        :return: str
+        """
+        return f"http://{self.host}:{self.rest_api_port}"
+
+    def get_statistics(self) -> dict:
+        """
+        Get the number of generated trades, placed orders and REST requests by endpoint as well as the p50, p99 and
+        p99.9 of the time between the last trade of a market and the arrival of a new order, in seconds.
+
+        :return: dict
+        """
+        with self.lock:
+            latencies = sorted(self.statistics['tick_to_order_latencies'])
+            statistics = {'orders': self.statistics['orders'],
+                          'requests': dict(self.statistics['requests']),
+                          'trades': self.statistics['trades']}
+        for name, quantile in (("p50", 0.5), ("p99", 0.99), ("p999", 0.999)):
+            if latencies:
+                statistics[f"tick_to_order_latency_{name}"] = latencies[min(len(latencies) - 1,
+                                                                            int(quantile * len(latencies)))]
+            else:
+                statistics[f"tick_to_order_latency_{name}"] = None
+        return statistics
+
+    def get_websocket_api_endpoint(self) -> str:
+        """
+        Get the base URL of the websocket API for the `websocket_api_endpoint` parameter of the manager.
+
+        :return: str
+        """
+        return f"ws://{self.host}:{self.websocket_api_port}"
+
+    def inject_error(self,
+                     code: int = -2010,
+                     count: int = 1,
+                     path: Optional[str] = None) -> bool:
+        """
+        Answer the next `count` REST requests with an error.
+
+        :param code: Binance error code, `-1003` is answered with HTTP 429.
+        :type code: int
+        :param count: Number of requests that fail.
+        :type count: int
+        :param path: Only fail requests of this path, for example `/api/v3/order`.
+        :type path: str or None
+
+        :return: bool
+        """
+        with self.lock:
+            for _ in range(count):
+                self.injected_errors.append({'code': code, 'path': path})
+        return True
+
+    def lock_balance(self, order: dict = None) -> None:
+        """
+        Move the balance needed by an order from `free` to `locked`.
+
+        :return: None
+        """
+        base_asset, quote_asset = self.get_order_assets(order)
+        if order['side'] == "SELL":
+            asset, amount = base_asset, order['origQty']
+        else:
+            asset, amount = quote_asset, order['origQty'] * (order['price'] or self.markets[order['symbol']]['price'])
+        balance = self.balances.setdefault(asset, {'free': 0.0, 'locked': 0.0})
+        if balance['free'] + 1e-12 < amount:
+            raise BinanceMockExchangeError(-2010)
+        balance['free'] -= amount
+        balance['locked'] += amount
+        order['lockedAmount'] = amount
+
+    def match_order(self,
+                    order: dict = None,
+                    market: dict = None,
+                    is_resting: bool = True) -> None:
+        """
+        Trigger and fill an order if the current price of the market allows it. Orders that rest in the orderbook are
+        filled at their limit price, new and just triggered orders at the current price.
+
+        :return: None
+        """
+        price = market['price']
+        if order['type'] == "MARKET":
+            self.fill_order(order=order, price=price)
+            return None
+        if order['isWorking'] is False:
+            if (order['side'] == "SELL" and price <= order['stopPrice']) or \
+                    (order['side'] == "BUY" and price >= order['stopPrice']):
+                order['isWorking'] = True
+                is_resting = False
+            else:
+                return None
+        if (order['side'] == "SELL" and price >= order['price']) or \
+                (order['side'] == "BUY" and price <= order['price']):
+            self.fill_order(order=order, price=order['price'] if is_resting is True else price)
+
+    def process_rest_request(self,
+                             method: str = None,
+                             path: str = None,
+                             params: dict = None) -> tuple:
+        """
+        Process a REST request. Called by the threads of the HTTP server.
+
+        :return: tuple (status code, headers, response)
+        """
+        delay = self.latency + self.random.uniform(0.0, self.latency_jitter) if self.latency_jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+        now = time.time()
+        with self.lock:
+            self.request_timestamps = [timestamp for timestamp in self.request_timestamps if timestamp > now - 60]
+            self.request_timestamps.append(now)
+            headers = {'x-mbx-used-weight': str(len(self.request_timestamps)),
+                       'x-mbx-used-weight-1m': str(len(self.request_timestamps))}
+            endpoint = f"{method} {path}"
+            self.statistics['requests'][endpoint] = self.statistics['requests'].get(endpoint, 0) + 1
+            try:
+                error = next((error for error in self.injected_errors
+                              if error['path'] is None or error['path'] == path), None)
+                if error is not None:
+                    self.injected_errors.remove(error)
+                    raise BinanceMockExchangeError(error['code'])
+                if self.error_rate > 0 and path.startswith("/api/v3/order") and method != "GET" and \
+                        self.random.random() < self.error_rate:
+                    raise BinanceMockExchangeError(self.random.choice(self.error_codes))
+                return 200, headers, self.route_rest_request(method=method, path=path, params=params)
+            except BinanceMockExchangeError as error_msg:
+                self.logger.debug(f"BinanceMockExchange.process_rest_request() - {endpoint}: {error_msg}")
+                if error_msg.status_code == 429:
+                    headers['Retry-After'] = str(self.retry_after)
+                return error_msg.status_code, headers, {'code': error_msg.code, 'msg': error_msg.msg}
+
+    def process_trade(self,
+                      symbol: str = None,
+                      price: float = None) -> None:
+        """
+        Set the price of a market with a trade, publish the aggTrade and match the open orders. Thread safe, it can be
+        used to inject prices.
+
+        :param symbol: The market.
+        :type symbol: str
+        :param price: The new price, it gets rounded to the `tick_size`.
+        :type price: float
+
+        :return: None
+        """
+        with self.lock:
+            market = self.get_market(symbol)
+            decimals = max(0, -int(math.floor(math.log10(market['tick_size']))))
+            price = max(market['tick_size'], round(round(price / market['tick_size']) * market['tick_size'], decimals))
+            market['price'] = price
+            market['last_trade_time'] = time.perf_counter()
+            self.statistics['trades'] += 1
+            trade_id = next(self.trade_ids)
+            now = int(time.time() * 1000)
+            self.publish(stream=f"{symbol.lower()}@aggTrade",
+                         payload={'e': "aggTrade",
+                                  'E': now,
+                                  's': symbol.upper(),
+                                  'a': trade_id,
+                                  'p': f"{price:.8f}",
+                                  'q': f"{market['step_size'] * self.random.randint(1, 1000):.8f}",
+                                  'f': trade_id,
+                                  'l': trade_id,
+                                  'T': now,
+                                  'm': self.random.random() < 0.5,
+                                  'M': True})
+            for order in [order for order in self.orders.values() if order['symbol'] == symbol.upper()]:
+                self.match_order(order=order, market=market)
+
+    async def process_outbox(self) -> None:
+        """
+        Send the published events to the subscribed websocket connections in the order they were published.
+
+        :return: None
+        """
+        while self.stop_request.is_set() is False:
+            stream, payload = await self.outbox.get()
+            message = None
+            combined_message = None
+            receivers = []
+            for websocket, connection in list(self.connections.items()):
+                if stream is None:
+                    names = connection['streams'] & self.listen_keys
+                    name = next(iter(names), None)
+                else:
+                    name = stream if stream in connection['streams'] else None
+                if name is None:
+                    continue
+                if connection['combined'] is True:
+                    if combined_message is None or stream is None:
+                        combined_message = json.dumps({'stream': name, 'data': payload}, separators=(",", ":"))
+                    receivers.append(self.send(websocket, combined_message))
+                else:
+                    if message is None:
+                        message = json.dumps(payload, separators=(",", ":"))
+                    receivers.append(self.send(websocket, message))
+            if receivers:
+                await asyncio.gather(*receivers)
+
+    async def process_websocket(self, websocket, path: Optional[str] = None) -> None:
+        """
+        Handle a websocket connection to `/ws/<stream>` or `/stream?streams=<stream>/<stream>`.
+
+        :return: None
+        """
+        if path is None:
+            request = getattr(websocket, "request", None)
+            path = request.path if request is not None else getattr(websocket, "path", "/")
+        url = urlparse(path)
+        if url.path.startswith("/ws/"):
+            streams = {url.path[4:]}
+            combined = False
+        else:
+            streams = set(dict(parse_qsl(url.query)).get("streams", "").split("/")) - {""}
+            combined = True
+        self.connections[websocket] = {'streams': streams, 'combined': combined}
+        self.logger.debug(f"BinanceMockExchange.process_websocket() - New connection to `{path}`")
+        try:
+            async for message in websocket:
+                try:
+                    request = json.loads(message)
+                except ValueError:
+                    continue
+                if request.get('method') == "SUBSCRIBE":
+                    streams.update(request.get('params', []))
+                    await websocket.send(json.dumps({'result': None, 'id': request.get('id')}))
+                elif request.get('method') == "UNSUBSCRIBE":
+                    streams.difference_update(request.get('params', []))
+                    await websocket.send(json.dumps({'result': None, 'id': request.get('id')}))
+                elif request.get('method') == "LIST_SUBSCRIPTIONS":
+                    await websocket.send(json.dumps({'result': sorted(streams), 'id': request.get('id')}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.connections.pop(websocket, None)
+
+    def publish(self, stream: Optional[str] = None, payload: dict = None) -> None:
+        """
+        Publish an event to the websocket connections of a stream, `None` is the userData stream. Thread safe.
+
+        :return: None
+        """
+        if self.loop is not None and self.outbox is not None:
+            self.loop.call_soon_threadsafe(self.outbox.put_nowait, (stream, payload))
+
+    def publish_account_position(self, assets: tuple = None) -> None:
+        """
+        Publish an `outboundAccountPosition` event of the assets to the userData stream.
+
+        :return: None
+        """
+        now = int(time.time() * 1000)
+        self.publish(stream=None,
+                     payload={'e': "outboundAccountPosition",
+                              'E': now,
+                              'u': now,
+                              'B': [{'a': asset,
+                                     'f': f"{self.balances[asset]['free']:.8f}",
+                                     'l': f"{self.balances[asset]['locked']:.8f}"}
+                                    for asset in assets if asset in self.balances]})
+
+    def publish_execution_report(self,
+                                 order: dict = None,
+                                 execution_type: str = None,
+                                 last_price: float = 0.0,
+                                 last_quantity: float = 0.0) -> None:
+        """
+        Publish an `executionReport` event of an order to the userData stream.
+
+        :return: None
+        """
+        now = int(time.time() * 1000)
+        self.publish(stream=None,
+                     payload={'e': "executionReport",
+                              'E': now,
+                              's': order['symbol'],
+                              'c': order['clientOrderId'],
+                              'S': order['side'],
+                              'o': order['type'],
+                              'f': order['timeInForce'],
+                              'q': f"{order['origQty']:.8f}",
+                              'p': f"{order['price']:.8f}",
+                              'P': f"{order['stopPrice']:.8f}",
+                              'F': "0.00000000",
+                              'g': -1,
+                              'C': "",
+                              'x': execution_type,
+                              'X': order['status'],
+                              'r': "NONE",
+                              'i': order['orderId'],
+                              'l': f"{last_quantity:.8f}",
+                              'z': f"{order['executedQty']:.8f}",
+                              'L': f"{last_price:.8f}",
+                              'n': "0",
+                              'N': None,
+                              'T': now,
+                              't': next(self.trade_ids) if execution_type == "TRADE" else -1,
+                              'I': order['orderId'],
+                              'w': order['isWorking'],
+                              'm': False,
+                              'M': execution_type == "TRADE",
+                              'O': order['time'],
+                              'Z': f"{order['cummulativeQuoteQty']:.8f}",
+                              'Y': f"{last_price * last_quantity:.8f}",
+                              'Q': "0.00000000",
+                              'V': "NONE"})
+
+    def release_balance(self, order: dict = None) -> None:
+        """
+        Move the locked balance of an order back to `free`.
+
+        :return: None
+        """
+        base_asset, quote_asset = self.get_order_assets(order)
+        balance = self.balances[base_asset if order['side'] == "SELL" else quote_asset]
+        amount = order.pop('lockedAmount', 0.0)
+        balance['locked'] -= amount
+        balance['free'] += amount
+
+    def route_rest_request(self,
+                           method: str = None,
+                           path: str = None,
+                           params: dict = None):
+        """
+        Route a REST request to the method of the endpoint. Called with `self.lock` held.
+
+        :return: The response of the endpoint
+        """
+        if path == "/api/v3/ping":
+            return {}
+        elif path == "/api/v3/time":
+            return {'serverTime': int(time.time() * 1000)}
+        elif path == "/api/v3/exchangeInfo":
+            return self.get_exchange_info(symbol=params.get('symbol'))
+        elif path == "/api/v3/ticker/price":
+            if params.get('symbol') is not None:
+                return {'symbol': params['symbol'].upper(),
+                        'price': f"{self.get_market(params['symbol'])['price']:.8f}"}
+            return [{'symbol': symbol, 'price': f"{market['price']:.8f}"} for symbol, market in self.markets.items()]
+        elif path == "/api/v3/account":
+            return self.get_account()
+        elif path == "/api/v3/openOrders" and method == "GET":
+            return [self.get_order_response(order) for order in self.orders.values()
+                    if params.get('symbol') is None or order['symbol'] == params['symbol'].upper()]
+        elif path == "/api/v3/order" and method == "GET":
+            return self.get_order_response(self.get_order(params=params))
+        elif path == "/api/v3/order" and method == "POST":
+            return self.create_order(params=params)
+        elif path == "/api/v3/order" and method == "DELETE":
+            return self.cancel_order(params=params)
+        elif path == "/api/v3/order/cancelReplace" and method == "POST":
+            return self.cancel_replace_order(params=params)
+        elif path == "/api/v3/userDataStream":
+            if method == "POST":
+                listen_key = uuid.uuid4().hex + uuid.uuid4().hex
+                self.listen_keys.add(listen_key)
+                return {'listenKey': listen_key}
+            elif method == "DELETE":
+                self.listen_keys.discard(params.get('listenKey'))
+            return {}
+        raise BinanceMockExchangeError(-1121, f"Endpoint `{method} {path}` is not supported by the mock exchange.")
+
+    def run(self) -> None:
+        """
+        Start the HTTP server in a thread and the websocket server, the price generator and the event dispatcher in
+        an asyncio event loop of this thread.
+
+        :return: None
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.http_server = ThreadingHTTPServer((self.host, self.rest_api_port), BinanceMockExchangeRequestHandler)
+        self.http_server.daemon_threads = True
+        self.http_server.exchange = self
+        self.rest_api_port = self.http_server.server_address[1]
+        threading.Thread(target=self.http_server.serve_forever, name="BinanceMockExchangeRestApi", daemon=True).start()
+        try:
+            self.loop.run_until_complete(self.run_websocket_server())
+        finally:
+            self.loop.close()
+
+    async def run_websocket_server(self) -> None:
+        """
+        Serve the websocket API until `stop_manager()` is called.
+
+        :return: None
+        """
+        self.stop_request = asyncio.Event()
+        self.outbox = asyncio.Queue()
+        async with websockets.serve(self.process_websocket, self.host, self.websocket_api_port) as server:
+            self.websocket_api_port = list(server.sockets)[0].getsockname()[1]
+            tasks = [asyncio.create_task(self.generate_prices()), asyncio.create_task(self.process_outbox())]
+            self.ready.set()
+            msg = f"Mock exchange started: REST API {self.get_rest_api_endpoint()} - websocket API " \
+                  f"{self.get_websocket_api_endpoint()}"
+            self.logger.info(f"BinanceMockExchange.run() - {msg}")
+            if self.print_notifications:
+                print(msg)
+            await self.stop_request.wait()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    async def send(websocket, message: str = None) -> None:
+        """
+        Send a message and ignore closed connections.
+
+        :return: None
+        """
+        try:
+            await websocket.send(message)
+        except websockets.ConnectionClosed:
+            pass
+
+    def stop_manager(self) -> bool:
+        """
+        Stop the HTTP and the websocket server.
+
+        :return: bool
+        """
+        self.logger.info(f"BinanceMockExchange.stop_manager() - Stopping the mock exchange")
+        if self.http_server is not None:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+        if self.loop is not None and self.stop_request is not None and self.loop.is_closed() is False:
+            self.loop.call_soon_threadsafe(self.stop_request.set)
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=5)
+        return True
+
+    def wait_till_ready(self, timeout: float = 10.0) -> bool:
+        """
+        Wait until the servers are listening.
+
+        :return: bool
+        """
+        return self.ready.wait(timeout=timeout)
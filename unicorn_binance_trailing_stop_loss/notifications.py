@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/notifications.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from typing import Optional
+import atexit
+import logging
+import queue
+import smtplib
+import ssl
+import threading
+import time
+import requests
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+CHANNEL_EMAIL = "email"
+CHANNEL_TELEGRAM = "telegram"
+
+# Maximum length of a Telegram message
+TELEGRAM_MAX_LENGTH = 4096
+
+notification_dispatchers: dict = {}
+notification_dispatchers_lock = threading.Lock()
+
+
+def get_notification_dispatcher(**kwargs) -> "BinanceTrailingStopLossNotificationDispatcher":
+    """
+    Get the `BinanceTrailingStopLossNotificationDispatcher` shared by all managers of a process with the same
+    notification settings, so they share one SMTP connection and one HTTP session.
+
+    :param kwargs: The parameters of `BinanceTrailingStopLossNotificationDispatcher`.
+
+    :return: BinanceTrailingStopLossNotificationDispatcher
+    """
+    key = tuple(sorted(kwargs.items()))
+    with notification_dispatchers_lock:
+        dispatcher = notification_dispatchers.get(key)
+        if dispatcher is None or dispatcher.is_alive() is False:
+            dispatcher = BinanceTrailingStopLossNotificationDispatcher(**kwargs)
+            dispatcher.start()
+            notification_dispatchers[key] = dispatcher
+        return dispatcher
+
+
+class BinanceTrailingStopLossNotificationDispatcher(threading.Thread):
+    """
+    Deliver email and Telegram notifications in a background thread, so the stream callbacks and the order worker
+    never wait for SMTP or HTTP.
+
+    Messages are queued with `send_notification()`. If the bounded queue is full, the oldest message is dropped.
+    Messages arriving within `batch_delay` seconds are sent as one email and as few Telegram messages as possible. The
+    SMTP connection is kept open for `smtp_idle_timeout` seconds and the Telegram requests use a pooled
+    `requests.Session`. Failed deliveries are retried `max_retries` times with exponential backoff. Pending messages
+    are delivered before the interpreter exits.
+
+    :param send_to_email_address: Email address of receiver
+    :type send_to_email_address: str
+    :param send_from_email_address: Email address of sender
+    :type send_from_email_address: str
+    :param send_from_email_password: Password for SMTP auth
+    :type send_from_email_password: str
+    :param send_from_email_server: Hostname or IP of SMTP server
+    :type send_from_email_server: str
+    :param send_from_email_port: Port of SMTP server
+    :type send_from_email_port: int
+    :param telegram_bot_token: Token to connect with Telegram API.
+    :type telegram_bot_token: str
+    :param telegram_send_to: Receiver of the message sent via Telegram.
+    :type telegram_send_to: str
+    :param batch_delay: Seconds to wait for further messages of a burst.
+    :type batch_delay: float
+    :param max_queue_size: Maximum number of queued messages.
+    :type max_queue_size: int
+    :param max_retries: Retries of a failed delivery.
+    :type max_retries: int
+    :param request_timeout: Timeout in seconds of SMTP and HTTP requests.
+    :type request_timeout: float
+    :param retry_backoff: Seconds to wait before the first retry, doubled with every further retry.
+    :type retry_backoff: float
+    :param smtp_idle_timeout: Seconds an unused SMTP connection is kept open.
+    :type smtp_idle_timeout: float
+    """
+    def __init__(self,
+                 send_to_email_address: str = None,
+                 send_from_email_address: str = None,
+                 send_from_email_password: str = None,
+                 send_from_email_server: str = None,
+                 send_from_email_port: int = None,
+                 telegram_bot_token: str = None,
+                 telegram_send_to: str = None,
+                 batch_delay: float = 0.2,
+                 max_queue_size: int = 100,
+                 max_retries: int = 3,
+                 request_timeout: float = 10.0,
+                 retry_backoff: float = 1.0,
+                 smtp_idle_timeout: float = 60.0):
+        super().__init__(name="ubtsl-notifications", daemon=True)
+        self.logger = __logger__
+        self.batch_delay = batch_delay
+        self.lock = threading.Lock()
+        self.max_retries = max_retries
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self.request_timeout = request_timeout
+        self.retry_backoff = retry_backoff
+        self.send_to_email_address = send_to_email_address
+        self.send_from_email_address = send_from_email_address
+        self.send_from_email_password = send_from_email_password
+        self.send_from_email_server = send_from_email_server
+        self.send_from_email_port = send_from_email_port
+        self.session: Optional[requests.Session] = None
+        self.smtp: Optional[smtplib.SMTP_SSL] = None
+        self.smtp_idle_timeout = smtp_idle_timeout
+        self.smtp_last_used: float = 0.0
+        self.stop_manager_request: bool = False
+        self.telegram_bot_token = telegram_bot_token
+        self.telegram_send_to = telegram_send_to
+        atexit.register(self.stop_manager)
+
+    def close_smtp_connection(self) -> None:
+        """
+        Close the SMTP connection.
+
+        :return: None
+        """
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.smtp = None
+
+    def deliver(self,
+                channel: str = None,
+                message: str = None) -> bool:
+        """
+        Deliver a message synchronously and retry it with exponential backoff.
+
+        :param channel: `email` or `telegram`
+        :type channel: str
+        :param message: The message.
+        :type message: str
+
+        :return: bool
+        """
+        with self.lock:
+            for attempt in range(self.max_retries + 1):
+                if attempt > 0:
+                    time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+                try:
+                    if channel == CHANNEL_EMAIL:
+                        self.send_email(message)
+                    else:
+                        self.send_telegram(message)
+                    return True
+                except (smtplib.SMTPException, requests.exceptions.RequestException, OSError) as error_msg:
+                    self.logger.error(f"BinanceTrailingStopLossNotificationDispatcher.deliver() - Sending {channel} "
+                                      f"failed (attempt {attempt + 1} of {self.max_retries + 1}): {error_msg}")
+                    if channel == CHANNEL_EMAIL:
+                        self.close_smtp_connection()
+            return False
+
+    @staticmethod
+    def get_email_batch(messages: list = None) -> str:
+        """
+        Merge messages in the format `Subject: ...\\n\\nText` into one email.
+
+        :param messages: The messages.
+        :type messages: list
+
+        :return: str
+        """
+        if len(messages) == 1:
+            return messages[0]
+        texts = []
+        for message in messages:
+            if message.startswith("Subject:") and "\n\n" in message:
+                subject, text = message.split("\n\n", 1)
+                texts.append(f"{subject[len('Subject:'):].strip()}\n{text}")
+            else:
+                texts.append(message)
+        return f"Subject: unicorn-binance-trailing-stop-loss ({len(messages)} notifications)\n\n" + \
+               "\n\n".join(texts)
+
+    @staticmethod
+    def get_telegram_batches(messages: list = None,
+                             max_length: int = TELEGRAM_MAX_LENGTH) -> list:
+        """
+        Merge messages into as few Telegram messages as the maximum length allows.
+
+        :param messages: The messages.
+        :type messages: list
+        :param max_length: Maximum length of a Telegram message.
+        :type max_length: int
+
+        :return: list
+        """
+        batches = []
+        for message in messages:
+            if batches and len(batches[-1]) + 2 + len(message) <= max_length:
+                batches[-1] = f"{batches[-1]}\n\n{message}"
+            else:
+                batches.append(message)
+        return batches
+
+    def is_email_enabled(self) -> bool:
+        """
+        Are the email settings complete?
+
+        :return: bool
+        """
+        return bool(self.send_to_email_address and self.send_from_email_address and self.send_from_email_server
+                    and self.send_from_email_port)
+
+    def is_telegram_enabled(self) -> bool:
+        """
+        Are the Telegram settings complete?
+
+        :return: bool
+        """
+        return bool(self.telegram_send_to and self.telegram_bot_token)
+
+    def run(self) -> None:
+        """
+        Deliver the queued messages until `stop_manager()` is called and the queue is empty.
+
+        :return: None
+        """
+        while True:
+            try:
+                notifications = [self.queue.get(timeout=1.0)]
+            except queue.Empty:
+                if self.stop_manager_request is True:
+                    break
+                if self.smtp is not None and time.time() - self.smtp_last_used > self.smtp_idle_timeout:
+                    with self.lock:
+                        self.close_smtp_connection()
+                continue
+            # Collect the rest of a burst
+            deadline = time.time() + (0 if self.stop_manager_request else self.batch_delay)
+            while True:
+                try:
+                    notifications.append(self.queue.get(timeout=max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    break
+            for channel in (CHANNEL_EMAIL, CHANNEL_TELEGRAM):
+                messages = [message for message_channel, message in notifications if message_channel == channel]
+                if not messages:
+                    continue
+                if channel == CHANNEL_EMAIL:
+                    self.deliver(channel=channel, message=self.get_email_batch(messages))
+                else:
+                    for batch in self.get_telegram_batches(messages):
+                        self.deliver(channel=channel, message=batch)
+        self.close_smtp_connection()
+        if self.session is not None:
+            self.session.close()
+
+    def send_email(self,
+                   message: str = None) -> bool:
+        """
+        Send an email synchronously via the persistent SMTP connection.
+
+        :param message: Text to send via email.
+        :type message: str
+
+        :return: bool
+        """
+        if self.smtp is None:
+            self.smtp = smtplib.SMTP_SSL(self.send_from_email_server, self.send_from_email_port,
+                                         context=ssl.create_default_context(), timeout=self.request_timeout)
+            self.smtp.login(self.send_from_email_address, self.send_from_email_password)
+        self.smtp.sendmail(self.send_from_email_address, self.send_to_email_address, message)
+        self.smtp_last_used = time.time()
+        self.logger.info(f"BinanceTrailingStopLossNotificationDispatcher.send_email() - Email sent!")
+        return True
+
+    def send_notification(self,
+                          message: str = None,
+                          channels: tuple = (CHANNEL_EMAIL, CHANNEL_TELEGRAM)) -> bool:
+        """
+        Queue a message without blocking.
+
+        :param message: The message, emails use the format `Subject: ...\\n\\nText`.
+        :type message: str
+        :param channels: `email` and/or `telegram`, channels without complete settings are skipped.
+        :type channels: tuple
+
+        :return: bool (True if the message was queued for at least one channel)
+        """
+        queued = False
+        for channel in channels:
+            if (channel == CHANNEL_EMAIL and self.is_email_enabled() is False) or \
+                    (channel == CHANNEL_TELEGRAM and self.is_telegram_enabled() is False):
+                continue
+            while True:
+                try:
+                    self.queue.put_nowait((channel, message))
+                    queued = True
+                    break
+                except queue.Full:
+                    try:
+                        dropped = self.queue.get_nowait()
+                        self.logger.error(f"BinanceTrailingStopLossNotificationDispatcher.send_notification() - "
+                                          f"Queue is full, dropping the oldest notification: {dropped}")
+                    except queue.Empty:
+                        pass
+        return queued
+
+    def send_telegram(self,
+                      message: str = None) -> bool:
+        """
+        Send a Telegram message synchronously via the pooled HTTP session.
+
+        :param message: Text to send via Telegram.
+        :type message: str
+
+        :return: bool
+        """
+        if self.session is None:
+            self.session = requests.Session()
+        response = self.session.post(f"https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage",
+                                     data={'chat_id': self.telegram_send_to,
+                                           'parse_mode': "HTML",
+                                           'text': message.replace("%25", "%")},
+                                     timeout=self.request_timeout)
+        response.raise_for_status()
+        self.logger.info(f"BinanceTrailingStopLossNotificationDispatcher.send_telegram() - response: {response}")
+        return True
+
+    def stop_manager(self, timeout: float = 30.0) -> bool:
+        """
+        Stop the dispatcher after the queued messages are delivered.
+
+        :param timeout: Maximum seconds to wait for the delivery of the queued messages.
+        :type timeout: float
+
+        :return: bool
+        """
+        self.stop_manager_request = True
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=timeout)
+        return True
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/portfolio_manager.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from . import __app_name__
+from .licensing_manager import LucitLicensingManager, NoValidatedLucitLicense
+from .manager import BinanceTrailingStopLossManager, PRICE_SOURCE_CHANNELS
+from unicorn_binance_rest_api import BinanceRestApiManager
+from unicorn_binance_websocket_api import BinanceWebSocketApiManager
+from typing import Optional, Union
+import logging
+import threading
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+
+class BinanceTrailingStopLossPortfolioManager(object):
+    """
+    Trail the stop/loss orders of many markets of one Binance account.
+
+    All markets share one userData stream, one multiplexed price feed stream, one `BinanceRestApiManager`, one
+    `BinanceWebSocketApiManager` and one `LucitLicensingManager`. Received stream data is dispatched by symbol through
+    a dict index, so the cost per tick does not depend on the number of trailed markets. Markets can be added and
+    removed at runtime with `add_market()` and `remove_market()`.
+
+    Supported exchanges: binance.com, binance.com-testnet, binance.com-futures, binance.com-margin
+
+    binance.com-isolated_margin is not supported, because Binance provides a separate userData stream per isolated
+    margin symbol.
+
+    :param api_key: Provide the Binance API key.
+    :type api_key: str
+    :param api_secret: Provide the Binance API secret.
+    :type api_secret: str
+    :param callback_error: Default callback function used if an error occurs in one of the markets.
+    :type callback_error: function or None
+    :param callback_finished: Default callback function used if the stop_loss of one of the markets gets filled.
+    :type callback_finished: function or None
+    :param callback_partially_filled: Default callback function used if the stop_loss of one of the markets gets
+                                      partially filled.
+    :type callback_partially_filled: function or None
+    :param disable_colorama: set to True to disable the use of `colorama <https://pypi.org/project/colorama/>`_
+    :type disable_colorama: bool
+    :param exchange: Choose the exchange endpoint: binance.com, binance.com-testnet, binance.com-futures,
+                     binance.com-margin
+    :type exchange: str
+    :param price_source: The price feed stream of all markets: `aggTrade` (default), `bookTicker`, `kline_1s`,
+                         `miniTicker` or `markPrice`. See `BinanceTrailingStopLossManager`.
+    :type price_source: str
+    :param print_notifications: If True the lib is printing user friendly information to terminal.
+    :type print_notifications: bool
+    :param raw_price_feed: Receive the raw frames of the price feed of all markets and read only the symbol and the
+                           price instead of converting every frame with UnicornFy. Default is False.
+    :type raw_price_feed: bool
+    :param warn_on_update: set to `False` to disable the update warning
+    :type warn_on_update: bool
+    :param lucit_api_secret: The `api_secret` of your UNICORN Binance Suite license from
+                             https://shop.lucit.services/software/unicorn-binance-suite
+    :type lucit_api_secret:  str
+    :param lucit_license_ini: Specify the path including filename to the config file (ex: `~/license_a.ini`).
+    :type lucit_license_ini:  str
+    :param lucit_license_profile: The license profile to use. Default is 'LUCIT'.
+    :type lucit_license_profile:  str
+    :param lucit_license_token: The `license_token` of your UNICORN Binance Suite license from
+                                https://shop.lucit.services/software/unicorn-binance-suite
+    :type lucit_license_token:  str
+    :param ubra_manager: Provide a shared unicorn_binance_rest_api.manager instance
+    :type ubra_manager: BinanceRestApiManager
+    :param ubwa_manager: Provide a shared unicorn_binance_websocket_api.manager instance.
+    :type ubwa_manager: BinanceWebSocketApiManager
+    """
+
+    def __init__(self,
+                 api_key: str = None,
+                 api_secret: str = None,
+                 callback_error: Optional[type(abs)] = None,
+                 callback_finished: Optional[type(abs)] = None,
+                 callback_partially_filled: Optional[type(abs)] = None,
+                 disable_colorama: bool = False,
+                 exchange: str = "binance.com",
+                 price_source: str = "aggTrade",
+                 print_notifications: bool = False,
+                 raw_price_feed: bool = False,
+                 warn_on_update: bool = True,
+                 lucit_api_secret: str = None,
+                 lucit_license_ini: str = None,
+                 lucit_license_profile: str = None,
+                 lucit_license_token: str = None,
+                 ubra_manager: Optional[Union[BinanceRestApiManager]] = None,
+                 ubwa_manager: Optional[Union[BinanceWebSocketApiManager]] = None):
+        self.logger = __logger__
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.callback_error = callback_error
+        self.callback_finished = callback_finished
+        self.callback_partially_filled = callback_partially_filled
+        self.exchange = exchange
+        self.lock = threading.Lock()
+        self.managers: dict = {}
+        self.price_source = price_source
+        self.print_notifications = print_notifications
+        self.raw_price_feed: bool = raw_price_feed is True
+        self.stop_loss_assets: dict = {}
+        self.stop_manager_request: bool = False
+        self.trade_stream_id = None
+        self.user_stream_connected: bool = False
+        self.user_stream_id = None
+        self.warn_on_update = warn_on_update
+        if self.exchange == "binance.com-isolated_margin":
+            msg = f"Exchange `{self.exchange}` is not supported by the portfolio manager, because every isolated " \
+                  f"margin symbol has its own userData stream!"
+            self.logger.critical(f"BinanceTrailingStopLossPortfolioManager() - {msg}")
+            if self.print_notifications:
+                print(msg)
+            raise ValueError(msg)
+        self.llm = LucitLicensingManager(api_secret=lucit_api_secret,
+                                         license_ini=lucit_license_ini,
+                                         license_profile=lucit_license_profile,
+                                         license_token=lucit_license_token,
+                                         parent_shutdown_function=self.stop_manager,
+                                         program_used=__app_name__,
+                                         needed_license_type="UNICORN-BINANCE-SUITE",
+                                         start=True)
+        licensing_exception = self.llm.get_license_exception()
+        if licensing_exception is not None:
+            raise NoValidatedLucitLicense(licensing_exception)
+        self.ubra: BinanceRestApiManager = ubra_manager or \
+            BinanceRestApiManager(api_key=self.api_key,
+                                  api_secret=self.api_secret,
+                                  exchange=self.exchange,
+                                  disable_colorama=disable_colorama,
+                                  warn_on_update=warn_on_update,
+                                  lucit_api_secret=lucit_api_secret,
+                                  lucit_license_ini=lucit_license_ini,
+                                  lucit_license_profile=lucit_license_profile,
+                                  lucit_license_token=lucit_license_token)
+        self.ubwa: BinanceWebSocketApiManager = ubwa_manager or \
+            BinanceWebSocketApiManager(exchange=self.exchange,
+                                       output_default="UnicornFy",
+                                       disable_colorama=disable_colorama,
+                                       high_performance=True,
+                                       warn_on_update=warn_on_update,
+                                       lucit_api_secret=lucit_api_secret,
+                                       lucit_license_ini=lucit_license_ini,
+                                       lucit_license_profile=lucit_license_profile,
+                                       lucit_license_token=lucit_license_token,
+                                       ubra_manager=self.ubra,
+                                       process_stream_signals=self.process_stream_signals)
+        self.user_stream_id = self.ubwa.create_stream("arr", "!userData",
+                                                      api_key=self.api_key,
+                                                      api_secret=self.api_secret,
+                                                      process_stream_data=self.process_userdata_stream,
+                                                      stream_label="UserData")
+
+    def __enter__(self):
+        self.logger.debug(f"Entering 'with-context' ...")
+        return self
+
+    def __exit__(self, exc_type, exc_value, error_traceback):
+        self.logger.debug(f"Leaving 'with-context' ...")
+        self.stop_manager()
+        if exc_type:
+            self.logger.critical(f"An exception occurred: {exc_type} - {exc_value} - {error_traceback}")
+
+    def add_market(self,
+                   market: str = None,
+                   **kwargs) -> Optional[BinanceTrailingStopLossManager]:
+        """
+        Start trailing a stop/loss order on a new market.
+
+        :param market: The market to enforce stop/loss.
+        :type market: str
+        :param kwargs: Parameters of `BinanceTrailingStopLossManager` like `stop_loss_limit` or `keep_threshold`.
+                       All markets share the price feed, `price_source` and `raw_price_feed` have to match the ones
+                       of the portfolio.
+
+        :return: BinanceTrailingStopLossManager or None
+        """
+        if self.is_manager_stopping() is True:
+            return None
+        with self.lock:
+            if market in self.managers:
+                self.logger.error(f"BinanceTrailingStopLossPortfolioManager.add_market() - Market {market} is "
+                                  f"already trailed!")
+                return None
+            for key, value in (('price_source', self.price_source), ('raw_price_feed', self.raw_price_feed)):
+                if kwargs.setdefault(key, value) != value:
+                    self.logger.error(f"BinanceTrailingStopLossPortfolioManager.add_market() - The `{key}` "
+                                      f"'{kwargs[key]}' of market {market} does not match the `{key}` '{value}' of "
+                                      f"the portfolio!")
+                    return None
+            kwargs.setdefault('callback_error', self.callback_error)
+            kwargs.setdefault('callback_finished', self.callback_finished)
+            kwargs.setdefault('callback_partially_filled', self.callback_partially_filled)
+            kwargs.setdefault('print_notifications', self.print_notifications)
+            manager = BinanceTrailingStopLossManager(api_key=self.api_key,
+                                                     api_secret=self.api_secret,
+                                                     exchange=self.exchange,
+                                                     market=market,
+                                                     start_engine=False,
+                                                     warn_on_update=False,
+                                                     llm_manager=self.llm,
+                                                     portfolio_manager=self,
+                                                     ubra_manager=self.ubra,
+                                                     ubwa_manager=self.ubwa,
+                                                     **kwargs)
+            manager.user_stream_id = self.user_stream_id
+            if self.user_stream_connected is True:
+                manager.user_stream_ready.set()
+            self.managers[market] = manager
+            if manager.engine != "native-trail":
+                # The exchange trails the orders of the `native-trail` engine, they need no price feed
+                if self.trade_stream_id is None:
+                    if self.raw_price_feed is True:
+                        process_price_feed = self.process_raw_price_feed_stream
+                    else:
+                        process_price_feed = self.process_price_feed_stream
+                    self.trade_stream_id = self.ubwa.create_stream(channels=PRICE_SOURCE_CHANNELS[self.price_source],
+                                                                   markets=market,
+                                                                   output="raw_data" if self.raw_price_feed else None,
+                                                                   process_stream_data=process_price_feed,
+                                                                   stream_label="PriceFeed")
+                else:
+                    self.ubwa.subscribe_to_stream(self.trade_stream_id, markets=market)
+                manager.trade_stream_id = self.trade_stream_id
+        self.logger.info(f"BinanceTrailingStopLossPortfolioManager.add_market() - Added market {market}")
+        manager.start()
+        return manager
+
+    def get_manager(self,
+                    market: str = None) -> Optional[BinanceTrailingStopLossManager]:
+        """
+        Get the `BinanceTrailingStopLossManager` instance of a market.
+
+        :param market: The market.
+        :type market: str
+
+        :return: BinanceTrailingStopLossManager or None
+        """
+        return self.managers.get(market)
+
+    def get_markets(self) -> list:
+        """
+        Get a list of all trailed markets.
+
+        :return: list
+        """
+        return list(self.managers.keys())
+
+    def is_manager_stopping(self) -> bool:
+        """
+        Returns `True` if the manager has a stop request, 'False' if not.
+
+        :return: bool
+        """
+        return self.stop_manager_request
+
+    def process_price_feed_stream(self,
+                                  stream_data: dict = None,
+                                  stream_buffer_name=False) -> bool:
+        """
+        Dispatch the received price feed data to the manager of the market.
+
+        :return: bool
+        """
+        symbol = stream_data.get('symbol')
+        if symbol is None and stream_data.get('data'):
+            # `miniTicker` records carry the symbol in their data list
+            symbol = stream_data['data'][0].get('symbol')
+        manager = self.managers.get(symbol)
+        if manager is None:
+            return False
+        return manager.process_price_feed_stream(stream_data=stream_data, stream_buffer_name=stream_buffer_name)
+
+    def process_raw_price_feed_stream(self,
+                                      stream_data: str = None,
+                                      stream_buffer_name=False) -> bool:
+        """
+        Dispatch the received raw frames of the price feed to the manager of the market.
+
+        :return: bool
+        """
+        symbol = BinanceTrailingStopLossManager.get_value_from_raw_data(stream_data, '"s":')
+        manager = self.managers.get(symbol)
+        if manager is None:
+            return False
+        return manager.process_raw_price_feed_stream(stream_data=stream_data, stream_buffer_name=stream_buffer_name)
+
+    def process_stream_signals(self,
+                               signal_type: str = None,
+                               stream_id=None,
+                               data_record=None,
+                               error_msg=None) -> None:
+        """
+        Process the stream signals of the UNICORN Binance WebSocket API and request a resync of the order caches and
+        balance books of all markets after a reconnect of the userData stream.
+
+        :return: None
+        """
+        self.logger.debug(f"BinanceTrailingStopLossPortfolioManager.process_stream_signals() - Received stream "
+                          f"signal: signal_type={signal_type}, stream_id={stream_id}, error_msg={error_msg}")
+        if signal_type == "CONNECT" and stream_id == self.user_stream_id:
+            if self.user_stream_connected is True:
+                for manager in list(self.managers.values()):
+                    manager.order_cache_resync_request = True
+                    manager.stop_loss_order_request.set()
+            self.user_stream_connected = True
+            for manager in list(self.managers.values()):
+                manager.user_stream_ready.set()
+
+    def process_userdata_stream(self,
+                                stream_data: dict = None,
+                                stream_buffer_name=False) -> None:
+        """
+        Dispatch the received userData to the managers of the affected markets.
+
+        :return: None
+        """
+        if stream_data.get('event_type') == "executionReport":
+            manager = self.managers.get(stream_data.get('symbol'))
+            if manager is not None:
+                manager.process_userdata_stream(stream_data=stream_data, stream_buffer_name=stream_buffer_name)
+        elif stream_data.get('event_type') == "outboundAccountPosition":
+            for balance in stream_data.get('balances', []):
+                for market in self.stop_loss_assets.get(balance['asset'], ()):
+                    manager = self.managers.get(market)
+                    if manager is not None:
+                        manager.update_balance_book(balances=[balance])
+        else:
+            self.logger.debug(f"BinanceTrailingStopLossPortfolioManager.process_userdata_stream() - Received "
+                              f"stream_data: {stream_data}")
+
+    def register_stop_loss_asset(self,
+                                 market: str = None,
+                                 asset: str = None) -> bool:
+        """
+        Register the stop/loss asset of a market, so `outboundAccountPosition` events get dispatched to its manager.
+
+        :param market: The market.
+        :type market: str
+        :param asset: The stop/loss asset of the market.
+        :type asset: str
+
+        :return: bool
+        """
+        with self.lock:
+            self.stop_loss_assets.setdefault(asset, set()).add(market)
+        return True
+
+    def remove_market(self,
+                      market: str = None) -> bool:
+        """
+        Stop trailing the stop/loss order of a market and unsubscribe its price feed.
+
+        The open stop/loss order stays on the exchange.
+
+        :param market: The market.
+        :type market: str
+
+        :return: bool
+        """
+        with self.lock:
+            manager = self.managers.pop(market, None)
+            if manager is None:
+                return False
+            for markets in self.stop_loss_assets.values():
+                markets.discard(market)
+            if manager.trade_stream_id is not None and self.is_manager_stopping() is False:
+                self.ubwa.unsubscribe_from_stream(self.trade_stream_id, markets=market)
+        if manager.is_manager_stopping() is False:
+            manager.stop_manager()
+        self.logger.info(f"BinanceTrailingStopLossPortfolioManager.remove_market() - Removed market {market}")
+        return True
+
+    def stop_manager(self, close_api_session: bool = True) -> bool:
+        """
+        Stop trailing all markets and close the streams and API sessions.
+
+        :return: bool
+        """
+        self.logger.info(f"BinanceTrailingStopLossPortfolioManager.stop_manager() - Gracefully stopping all markets")
+        self.stop_manager_request = True
+        for market in self.get_markets():
+            self.remove_market(market=market)
+        if self.ubwa is not None:
+            self.ubwa.stop_manager()
+        if self.ubra is not None:
+            self.ubra.stop_manager()
+        if close_api_session is True:
+            self.llm.close()
+        return True
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/quantizer.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from decimal import Decimal, ROUND_CEILING
+from typing import Union
+import math
+
+# Tolerance in ticks and steps for the float error of `price / tick_size`, `0.29 / 0.01` is `28.999999999999996`
+QUANTIZE_EPSILON = 1e-6
+
+
+class SymbolQuantizer(object):
+    """
+    Integer tick quantizer of the prices and quantities of one symbol.
+
+    It is built once per symbol from the PRICE_FILTER `tickSize`, the LOT_SIZE `stepSize` and `minQty` and the
+    NOTIONAL/MIN_NOTIONAL `minNotional` (`notional` on binance.com-futures). Prices and quantities are converted to
+    integer numbers of ticks and steps and back with the precomputed factors, the exact decimal strings for the orders
+    are built from the integers. Prices are rounded down to the tick size and quantities are rounded down to the step
+    size, so a quantity never exceeds the free balance.
+
+    :param tick_size: The `tickSize` of the PRICE_FILTER.
+    :type tick_size: str
+    :param step_size: The `stepSize` of the LOT_SIZE filter.
+    :type step_size: str
+    :param min_qty: The `minQty` of the LOT_SIZE filter.
+    :type min_qty: str
+    :param min_notional: The `minNotional` of the NOTIONAL or MIN_NOTIONAL filter.
+    :type min_notional: str
+    """
+    def __init__(self,
+                 tick_size: str = "0.01",
+                 step_size: str = "0.00000001",
+                 min_qty: str = "0",
+                 min_notional: str = "0"):
+        self.price_decimals = self.get_decimals(tick_size)
+        self.price_scale = 10 ** self.price_decimals
+        self.tick_units = max(1, self.get_units(tick_size, self.price_decimals))
+        self.tick_size = self.tick_units / self.price_scale
+        self.quantity_decimals = self.get_decimals(step_size)
+        self.quantity_scale = 10 ** self.quantity_decimals
+        self.step_units = max(1, self.get_units(step_size, self.quantity_decimals))
+        self.step_size = self.step_units / self.quantity_scale
+        self.min_qty_steps = max(1, -(-self.get_units(min_qty, self.quantity_decimals) // self.step_units))
+        self.min_notional_units = self.get_units(min_notional, self.price_decimals + self.quantity_decimals)
+
+    def __repr__(self):
+        return f"SymbolQuantizer(tick_size={self.format_units(self.tick_units, self.price_decimals)}, " \
+               f"step_size={self.format_units(self.step_units, self.quantity_decimals)})"
+
+    @staticmethod
+    def format_units(units: int = None,
+                     decimals: int = 0) -> str:
+        """
+        Format an integer number of units of `10 ** -decimals` as exact decimal string.
+
+        :param units: The number of units.
+        :type units: int
+        :param decimals: The decimal places of one unit.
+        :type decimals: int
+
+        :return: str
+        """
+        if decimals == 0:
+            return str(units)
+        integer, fraction = divmod(units, 10 ** decimals)
+        return f"{integer}.{fraction:0{decimals}d}"
+
+    def format_price(self,
+                     price: Union[str, float] = None) -> str:
+        """
+        Get a price rounded down to the tick size as exact decimal string for the order parameters.
+
+        :param price: The price.
+        :type price: float, str
+
+        :return: str
+        """
+        return self.format_units(self.get_price_ticks(price) * self.tick_units, self.price_decimals)
+
+    def format_quantity(self,
+                        quantity: Union[str, float] = None) -> str:
+        """
+        Get a quantity rounded down to the step size as exact decimal string for the order parameters.
+
+        :param quantity: The quantity.
+        :type quantity: float, str
+
+        :return: str
+        """
+        return self.format_units(self.get_quantity_steps(quantity) * self.step_units, self.quantity_decimals)
+
+    @staticmethod
+    def from_filters(filters: dict = None) -> 'SymbolQuantizer':
+        """
+        Create the quantizer of a symbol from its filters indexed by `filterType`, like
+        `ExchangeInfoCache.get_filters()` returns them.
+
+        :param filters: The filters of the symbol.
+        :type filters: dict
+
+        :return: SymbolQuantizer
+        """
+        price_filter = filters.get('PRICE_FILTER') or {}
+        lot_size = filters.get('LOT_SIZE') or {}
+        notional = filters.get('NOTIONAL') or filters.get('MIN_NOTIONAL') or {}
+        return SymbolQuantizer(tick_size=price_filter.get('tickSize', "0.01"),
+                               step_size=lot_size.get('stepSize', "0.00000001"),
+                               min_qty=lot_size.get('minQty', "0"),
+                               min_notional=notional.get('minNotional', notional.get('notional', "0")))
+
+    @staticmethod
+    def get_decimals(value: str = None) -> int:
+        """
+        Get the decimal places of a filter value, for example 2 of `0.01000000`. A value of zero (the filter is
+        disabled) has the 8 decimal places of all Binance values.
+
+        :param value: The filter value.
+        :type value: str
+
+        :return: int
+        """
+        if Decimal(str(value)) <= 0:
+            return 8
+        return max(0, -Decimal(str(value)).normalize().as_tuple().exponent)
+
+    def get_price(self,
+                  ticks: int = None) -> float:
+        """
+        Get the price of an integer number of ticks.
+
+        :param ticks: The number of ticks.
+        :type ticks: int
+
+        :return: float
+        """
+        return ticks * self.tick_units / self.price_scale
+
+    def get_price_ticks(self,
+                        price: Union[str, float] = None,
+                        round_up: bool = False) -> int:
+        """
+        Get a price as integer number of ticks.
+
+        :param price: The price.
+        :type price: float, str
+        :param round_up: Round up instead of down.
+        :type round_up: bool
+
+        :return: int
+        """
+        ticks = float(price) / self.tick_size
+        if round_up is True:
+            return math.ceil(ticks - QUANTIZE_EPSILON)
+        return math.floor(ticks + QUANTIZE_EPSILON)
+
+    def get_quantity(self,
+                     steps: int = None) -> float:
+        """
+        Get the quantity of an integer number of steps.
+
+        :param steps: The number of steps.
+        :type steps: int
+
+        :return: float
+        """
+        return steps * self.step_units / self.quantity_scale
+
+    def get_quantity_steps(self,
+                           quantity: Union[str, float] = None) -> int:
+        """
+        Get a quantity rounded down as integer number of steps.
+
+        :param quantity: The quantity.
+        :type quantity: float, str
+
+        :return: int
+        """
+        return math.floor(float(quantity) / self.step_size + QUANTIZE_EPSILON)
+
+    @staticmethod
+    def get_units(value: str = None,
+                  decimals: int = 0) -> int:
+        """
+        Get a filter value as integer number of units of `10 ** -decimals`, rounded up.
+
+        :param value: The filter value.
+        :type value: str
+        :param decimals: The decimal places of one unit.
+        :type decimals: int
+
+        :return: int
+        """
+        return int(Decimal(str(value)).scaleb(decimals).to_integral_value(rounding=ROUND_CEILING))
+
+    def is_order_valid(self,
+                       price: Union[str, float] = None,
+                       quantity: Union[str, float] = None) -> bool:
+        """
+        Check the quantized price and quantity of an order against `minQty` and `minNotional`.
+
+        :param price: The price.
+        :type price: float, str
+        :param quantity: The quantity.
+        :type quantity: float, str
+
+        :return: bool
+        """
+        steps = self.get_quantity_steps(quantity)
+        if steps < self.min_qty_steps:
+            return False
+        notional_units = self.get_price_ticks(price) * self.tick_units * steps * self.step_units
+        return notional_units >= self.min_notional_units
+
+    def quantize_price(self,
+                       price: Union[str, float] = None,
+                       round_up: bool = False) -> float:
+        """
+        Round a price to the tick size.
+
+        :param price: The price.
+        :type price: float, str
+        :param round_up: Round up instead of down.
+        :type round_up: bool
+
+        :return: float
+        """
+        return self.get_price(self.get_price_ticks(price, round_up=round_up))
+
+    def quantize_quantity(self,
+                          quantity: Union[str, float] = None) -> float:
+        """
+        Round a quantity down to the step size.
+
+        :param quantity: The quantity.
+        :type quantity: float, str
+
+        :return: float
+        """
+        return self.get_quantity(self.get_quantity_steps(quantity))
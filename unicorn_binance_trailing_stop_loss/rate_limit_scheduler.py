@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/rate_limit_scheduler.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+
+from unicorn_binance_rest_api import BinanceAPIException
+from typing import Optional
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+# Request priorities, lower values are executed first
+PRIORITY_PROTECTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_RECONCILIATION = 2
+
+# Used if the exchangeInfo does not provide `rateLimits`
+DEFAULT_RATE_LIMITS = [{'rateLimitType': "REQUEST_WEIGHT", 'interval': "MINUTE", 'intervalNum': 1, 'limit': 1200},
+                       {'rateLimitType': "ORDERS", 'interval': "SECOND", 'intervalNum': 10, 'limit': 50},
+                       {'rateLimitType': "ORDERS", 'interval': "DAY", 'intervalNum': 1, 'limit': 160000}]
+
+INTERVAL_SECONDS = {'SECOND': 1, 'MINUTE': 60, 'HOUR': 3600, 'DAY': 86400}
+
+# Share of the published rate limits that is used, the rest is kept as reserve for other clients
+DEFAULT_RATE_LIMIT_UTILIZATION = 0.8
+
+# Share used by the schedulers of this process, see `set_rate_limit_utilization()`
+rate_limit_utilization: float = DEFAULT_RATE_LIMIT_UTILIZATION
+rate_limit_schedulers: dict = {}
+rate_limit_schedulers_lock = threading.Lock()
+
+
+def get_rate_limit_scheduler(api_key: str = None,
+                             exchange: str = None,
+                             rate_limits: Optional[list] = None) -> "RateLimitScheduler":
+    """
+    Get the `RateLimitScheduler` shared by all managers of an API key on an exchange.
+
+    :param api_key: The Binance API key.
+    :type api_key: str
+    :param exchange: The exchange.
+    :type exchange: str
+    :param rate_limits: The `rateLimits` of the exchangeInfo, only used if the scheduler does not exist yet.
+    :type rate_limits: list or None
+
+    :return: RateLimitScheduler
+    """
+    with rate_limit_schedulers_lock:
+        if (exchange, api_key) not in rate_limit_schedulers:
+            rate_limit_schedulers[(exchange, api_key)] = RateLimitScheduler(rate_limits=rate_limits,
+                                                                            utilization=rate_limit_utilization)
+        return rate_limit_schedulers[(exchange, api_key)]
+
+
+def set_rate_limit_utilization(utilization: float = DEFAULT_RATE_LIMIT_UTILIZATION) -> None:
+    """
+    Set the share of the published rate limits used by the schedulers `get_rate_limit_scheduler()` creates in this
+    process.
+
+    The limits apply per account and IP, so processes sharing them must split the share: each of N fleet workers uses
+    `DEFAULT_RATE_LIMIT_UTILIZATION / N`.
+
+    :param utilization: Share of the published limits.
+    :type utilization: float
+
+    :return: None
+    """
+    global rate_limit_utilization
+    rate_limit_utilization = utilization
+
+
+class RateLimitScheduler(object):
+    """
+    Token bucket scheduler for the REST requests of an API key.
+
+    One bucket is created for each `REQUEST_WEIGHT`, `RAW_REQUESTS` and `ORDERS` limit of the exchangeInfo
+    `rateLimits`. A request waits until all buckets hold enough tokens for it, waiting requests are executed by
+    priority and in FIFO order within the same priority. After a HTTP 429 or 418 response all requests are paused for
+    the time provided by the `Retry-After` header.
+
+    :param rate_limits: The `rateLimits` of the exchangeInfo.
+    :type rate_limits: list or None
+    :param utilization: Share of the published limits that is used, the rest is kept as reserve for other clients of
+                        the same account or IP.
+    :type utilization: float
+    """
+    def __init__(self,
+                 rate_limits: Optional[list] = None,
+                 utilization: float = DEFAULT_RATE_LIMIT_UTILIZATION):
+        self.logger = __logger__
+        self.blocked_until: float = 0.0
+        self.buckets: list = []
+        self.condition = threading.Condition()
+        self.counter = itertools.count()
+        self.waiting: list = []
+        for rate_limit in rate_limits or DEFAULT_RATE_LIMITS:
+            seconds = INTERVAL_SECONDS.get(rate_limit['interval'], 60) * int(rate_limit.get('intervalNum', 1))
+            capacity = max(1.0, float(rate_limit['limit']) * utilization)
+            self.buckets.append({'type': rate_limit['rateLimitType'],
+                                 'capacity': capacity,
+                                 'rate': capacity / seconds,
+                                 'tokens': capacity,
+                                 'timestamp': time.time()})
+        self.logger.debug(f"RateLimitScheduler() - Buckets: {self.buckets}")
+
+    def acquire(self,
+                priority: int = PRIORITY_DEFAULT,
+                weight: int = 1,
+                orders: int = 0) -> float:
+        """
+        Wait until the request is the next one by priority and all buckets hold enough tokens, then consume them.
+
+        :param priority: Priority of the request.
+        :type priority: int
+        :param weight: Request weight of the endpoint.
+        :type weight: int
+        :param orders: Number of orders the request places.
+        :type orders: int
+
+        :return: float (waited seconds)
+        """
+        start_time = time.time()
+        with self.condition:
+            ticket = (priority, next(self.counter))
+            heapq.heappush(self.waiting, ticket)
+            while True:
+                if self.waiting[0] == ticket:
+                    wait_time = self.get_wait_time(weight=weight, orders=orders)
+                    if wait_time == 0:
+                        self.consume(weight=weight, orders=orders)
+                        heapq.heappop(self.waiting)
+                        self.condition.notify_all()
+                        return time.time() - start_time
+                    self.condition.wait(timeout=wait_time)
+                else:
+                    self.condition.wait()
+
+    def consume(self,
+                weight: int = 1,
+                orders: int = 0) -> None:
+        """
+        Take the tokens of a request out of the buckets.
+
+        :return: None
+        """
+        for bucket in self.buckets:
+            bucket['tokens'] -= self.get_costs(bucket=bucket, weight=weight, orders=orders)
+
+    def execute(self,
+                function,
+                *args,
+                priority: int = PRIORITY_DEFAULT,
+                weight: int = 1,
+                orders: int = 0,
+                **kwargs):
+        """
+        Execute a REST request of the `BinanceRestApiManager` as soon as the rate limits allow it.
+
+        :param function: The method of the `BinanceRestApiManager` to execute.
+        :param priority: Priority of the request.
+        :type priority: int
+        :param weight: Request weight of the endpoint.
+        :type weight: int
+        :param orders: Number of orders the request places.
+        :type orders: int
+
+        :return: The response of `function`
+        """
+        waited = self.acquire(priority=priority, weight=weight, orders=orders)
+        if waited > 1:
+            self.logger.info(f"RateLimitScheduler.execute() - `{function.__name__}` waited {waited:.2f} seconds")
+        try:
+            return function(*args, **kwargs)
+        except BinanceAPIException as error_msg:
+            if getattr(error_msg, "status_code", None) in (418, 429):
+                retry_after = 60.0
+                response = getattr(error_msg, "response", None)
+                if response is not None and response.headers.get("Retry-After") is not None:
+                    retry_after = float(response.headers.get("Retry-After"))
+                self.logger.critical(f"RateLimitScheduler.execute() - Received HTTP {error_msg.status_code}, "
+                                     f"pausing all requests for {retry_after} seconds")
+                with self.condition:
+                    self.blocked_until = max(self.blocked_until, time.time() + retry_after)
+                    self.condition.notify_all()
+            raise
+
+    @staticmethod
+    def get_costs(bucket: dict = None,
+                  weight: int = 1,
+                  orders: int = 0) -> int:
+        """
+        Get the tokens a request takes out of a bucket.
+
+        :return: int
+        """
+        if bucket['type'] == "REQUEST_WEIGHT":
+            return weight
+        elif bucket['type'] == "ORDERS":
+            return orders
+        elif bucket['type'] == "RAW_REQUESTS":
+            return 1
+        return 0
+
+    def get_wait_time(self,
+                      weight: int = 1,
+                      orders: int = 0) -> float:
+        """
+        Refill the buckets and get the seconds until all of them hold enough tokens for the request.
+
+        :return: float
+        """
+        now = time.time()
+        wait_time = max(0.0, self.blocked_until - now)
+        for bucket in self.buckets:
+            bucket['tokens'] = min(bucket['capacity'], bucket['tokens'] + (now - bucket['timestamp']) * bucket['rate'])
+            bucket['timestamp'] = now
+            costs = min(self.get_costs(bucket=bucket, weight=weight, orders=orders), bucket['capacity'])
+            if bucket['tokens'] < costs:
+                wait_time = max(wait_time, (costs - bucket['tokens']) / bucket['rate'])
+        return wait_time
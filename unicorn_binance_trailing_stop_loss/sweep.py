@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/sweep.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+#
+# NumPy is an optional dependency: `pip install unicorn-binance-trailing-stop-loss[numpy]`
+
+from .backtest import read_agg_trades
+from .trailing_kernel import calculate_trailing_stop_loss
+from typing import Optional
+import calendar
+import csv
+import itertools
+import logging
+import multiprocessing
+import numpy as np
+import os
+import re
+
+__logger__ = logging.getLogger("unicorn_binance_trailing_stop_loss")
+
+# Binance public-data file names: `BTCUSDT-aggTrades-2023-10.zip` (monthly) or `BTCUSDT-aggTrades-2023-10-01.zip`
+AGG_TRADES_FILE_PATTERN = re.compile(r"^(?P<market>[A-Z0-9]+)-aggTrades-(?P<date>\d{4}-\d{2}(-\d{2})?)\.(csv|zip)$")
+
+SWEEP_RESULT_KEYS = ("market", "date_from", "date_to", "stop_loss_limit", "stop_loss_start_limit",
+                     "stop_loss_trigger_gap", "entry_price", "high_price", "trigger_price", "exit_price", "exit_time",
+                     "slippage", "replacements", "profit_percent")
+
+
+def get_agg_trades_files(data_dir: str = None,
+                         market: Optional[str] = None,
+                         date_from: Optional[str] = None,
+                         date_to: Optional[str] = None) -> dict:
+    """
+    Find the aggTrades files of https://data.binance.vision in a directory and group them by market.
+
+    Daily and monthly files are supported, a monthly file is selected if the month overlaps the date range. Use only
+    one of both kinds per market, otherwise the trades are replayed twice.
+
+    :param data_dir: Directory with the `.csv` or `.zip` files.
+    :type data_dir: str
+    :param market: Only return the files of this market.
+    :type market: str or None
+    :param date_from: First date `YYYY-MM-DD` of the range.
+    :type date_from: str or None
+    :param date_to: Last date `YYYY-MM-DD` of the range.
+    :type date_to: str or None
+
+    :return: dict (market -> list of file paths ordered by date)
+    """
+    files = {}
+    for file_name in sorted(os.listdir(data_dir)):
+        match = AGG_TRADES_FILE_PATTERN.match(file_name)
+        if match is None:
+            continue
+        if market is not None and match.group("market") != market.upper():
+            continue
+        date = match.group("date")
+        if len(date) == 7:
+            year, month = int(date[:4]), int(date[5:7])
+            file_date_from = f"{date}-01"
+            file_date_to = f"{date}-{calendar.monthrange(year, month)[1]:02d}"
+        else:
+            file_date_from = date
+            file_date_to = date
+        if date_from is not None and file_date_to < date_from:
+            continue
+        if date_to is not None and file_date_from > date_to:
+            continue
+        files.setdefault(match.group("market"), []).append((date, os.path.join(data_dir, file_name)))
+    return {market: [file_path for _, file_path in sorted(entries)] for market, entries in files.items()}
+
+
+def convert_agg_trades_to_npy(file_paths: list = None,
+                              prices_file: str = None,
+                              timestamps_file: str = None) -> int:
+    """
+    Read aggTrades files once and save the prices and timestamps as `.npy` files, which the sweep workers map into
+    memory with `np.load(mmap_mode="r")`. All workers share the pages of the operating system's file cache instead of
+    receiving a pickled copy of the data.
+
+    Existing `.npy` files are reused if they are newer than all source files.
+
+    :param file_paths: Paths of the `.csv` or `.zip` aggTrades files in trade order.
+    :type file_paths: list
+    :param prices_file: Path of the prices `.npy` file.
+    :type prices_file: str
+    :param timestamps_file: Path of the timestamps `.npy` file.
+    :type timestamps_file: str
+
+    :return: int (number of trades)
+    """
+    if os.path.isfile(prices_file) and os.path.isfile(timestamps_file):
+        cache_time = min(os.path.getmtime(prices_file), os.path.getmtime(timestamps_file))
+        if all(os.path.getmtime(file_path) <= cache_time for file_path in file_paths):
+            return len(np.load(prices_file, mmap_mode="r"))
+    prices = []
+    timestamps = []
+    for file_path in file_paths:
+        for prices_chunk, timestamps_chunk in read_agg_trades(file_path=file_path):
+            prices.append(np.asarray(prices_chunk, dtype=np.float64))
+            timestamps.append(np.asarray(timestamps_chunk, dtype=np.float64))
+    for file_path, arrays in ((prices_file, prices), (timestamps_file, timestamps)):
+        with open(f"{file_path}.tmp", "wb") as fh_npy:
+            np.save(fh_npy, np.concatenate(arrays) if arrays else np.empty(0, dtype=np.float64))
+        os.replace(f"{file_path}.tmp", file_path)
+    return sum(len(array) for array in prices)
+
+
+def run_sweep_task(task: dict = None) -> list:
+    """
+    Evaluate a slice of the parameter grid on one data set. Runs in a worker process of the sweep.
+
+    :param task: Dict with the keys `market`, `date_from`, `date_to`, `prices_file`, `timestamps_file` and `grid`
+                 (list of tuples with `stop_loss_limit`, `stop_loss_start_limit` and `stop_loss_trigger_gap`).
+    :type task: dict
+
+    :return: list of result dicts
+    """
+    prices = np.load(task['prices_file'], mmap_mode="r")
+    timestamps = np.load(task['timestamps_file'], mmap_mode="r")
+    results = []
+    for stop_loss_limit, stop_loss_start_limit, stop_loss_trigger_gap in task['grid']:
+        result = {'market': task['market'],
+                  'date_from': task['date_from'],
+                  'date_to': task['date_to'],
+                  'stop_loss_limit': stop_loss_limit,
+                  'stop_loss_start_limit': stop_loss_start_limit,
+                  'stop_loss_trigger_gap': stop_loss_trigger_gap,
+                  'entry_price': None,
+                  'high_price': None,
+                  'trigger_price': None,
+                  'exit_price': None,
+                  'exit_time': None,
+                  'slippage': None,
+                  'replacements': 0,
+                  'profit_percent': None}
+        if len(prices) > 0:
+            kernel_result = calculate_trailing_stop_loss(prices,
+                                                         stop_loss_limit=stop_loss_limit,
+                                                         stop_loss_start_limit=stop_loss_start_limit,
+                                                         stop_loss_trigger_gap=stop_loss_trigger_gap)
+            end = len(prices) if kernel_result['trigger_index'] is None else max(kernel_result['trigger_index'], 1)
+            result['entry_price'] = float(prices[0])
+            result['high_price'] = float(prices[:end].max())
+            result['replacements'] = kernel_result['replacements']
+            result['trigger_price'] = kernel_result['trigger_price']
+            if kernel_result['exit_index'] is not None:
+                result['exit_price'] = kernel_result['exit_price']
+                result['exit_time'] = float(timestamps[kernel_result['exit_index']])
+                result['slippage'] = kernel_result['trigger_price'] - kernel_result['exit_price']
+                exit_price = kernel_result['exit_price']
+            else:
+                # The position is still open at the end of the data set
+                exit_price = float(prices[-1])
+            result['profit_percent'] = (exit_price / result['entry_price'] - 1) * 100
+        results.append(result)
+    return results
+
+
+class BinanceTrailingStopLossSweep(object):
+    """
+    Evaluate a grid of `stop_loss_limit`, `stop_loss_start_limit` and `stop_loss_trigger_gap` values over many markets
+    and date ranges with the vectorized kernel in a process pool.
+
+    Each data set (market and date range) simulates one position that is opened with the first trade of the range. The
+    aggTrades files of a data set are converted once into memory mapped `.npy` files in `cache_dir`, the worker
+    processes only receive the file paths and a slice of the grid.
+
+    .. code-block:: python
+
+        sweep = BinanceTrailingStopLossSweep(data_dir="./aggTrades",
+                                             date_ranges=[("2023-09-01", "2023-09-30"), ("2023-10-01", "2023-10-31")],
+                                             stop_loss_limits=["0.5%", "1%", "1.5%", "2%"],
+                                             stop_loss_trigger_gaps=["0.01", "0.05"])
+        results = sweep.run()
+        best = sweep.get_best_parameters(results)
+
+    :param data_dir: Directory with the aggTrades files of https://data.binance.vision.
+    :type data_dir: str
+    :param markets: Markets to evaluate. If None, all markets found in `data_dir` are used.
+    :type markets: list or None
+    :param date_ranges: List of tuples (`date_from`, `date_to`) in the format `YYYY-MM-DD`, None values are open ends.
+                        If None, all files of a market form one data set.
+    :type date_ranges: list or None
+    :param stop_loss_limits: Values of `stop_loss_limit`.
+    :type stop_loss_limits: list
+    :param stop_loss_start_limits: Values of `stop_loss_start_limit`, None uses `stop_loss_limit`.
+    :type stop_loss_start_limits: list or None
+    :param stop_loss_trigger_gaps: Values of `stop_loss_trigger_gap`.
+    :type stop_loss_trigger_gaps: list or None
+    :param cache_dir: Directory of the `.npy` files. Default: `<data_dir>/npy`
+    :type cache_dir: str or None
+    :param workers: Number of worker processes. Default is the number of CPUs.
+    :type workers: int or None
+    :param grid_chunk_size: Number of parameter combinations per task.
+    :type grid_chunk_size: int
+    :param print_notifications: If True the class will output notifications to the console.
+    :type print_notifications: bool
+    """
+    def __init__(self,
+                 data_dir: str = None,
+                 markets: Optional[list] = None,
+                 date_ranges: Optional[list] = None,
+                 stop_loss_limits: list = None,
+                 stop_loss_start_limits: Optional[list] = None,
+                 stop_loss_trigger_gaps: Optional[list] = None,
+                 cache_dir: Optional[str] = None,
+                 workers: Optional[int] = None,
+                 grid_chunk_size: int = 16,
+                 print_notifications: bool = False):
+        self.logger = __logger__
+        self.data_dir = data_dir
+        self.markets = [market.upper() for market in markets] if markets else None
+        self.date_ranges = date_ranges or [(None, None)]
+        self.stop_loss_limits = stop_loss_limits
+        self.stop_loss_start_limits = stop_loss_start_limits or [None]
+        self.stop_loss_trigger_gaps = stop_loss_trigger_gaps or ["0.01"]
+        self.cache_dir = cache_dir or os.path.join(data_dir, "npy")
+        self.workers = workers or os.cpu_count() or 1
+        self.grid_chunk_size = grid_chunk_size
+        self.print_notifications = print_notifications
+        self.data_sets: list = []
+
+    def get_grid(self) -> list:
+        """
+        Get all combinations of the parameter values.
+
+        :return: list of tuples (`stop_loss_limit`, `stop_loss_start_limit`, `stop_loss_trigger_gap`)
+        """
+        return list(itertools.product(self.stop_loss_limits, self.stop_loss_start_limits, self.stop_loss_trigger_gaps))
+
+    @staticmethod
+    def get_best_parameters(results: list = None) -> dict:
+        """
+        Get the parameter combination with the highest average `profit_percent` of each market.
+
+        :param results: Results of `run()`.
+        :type results: list
+
+        :return: dict (market -> dict with the parameters, `profit_percent` and `data_sets`)
+        """
+        profits = {}
+        for result in results:
+            if result['profit_percent'] is None:
+                continue
+            parameters = (result['stop_loss_limit'], result['stop_loss_start_limit'], result['stop_loss_trigger_gap'])
+            profits.setdefault(result['market'], {}).setdefault(parameters, []).append(result['profit_percent'])
+        best = {}
+        for market, market_profits in profits.items():
+            parameters, values = max(market_profits.items(), key=lambda item: sum(item[1]) / len(item[1]))
+            best[market] = {'stop_loss_limit': parameters[0],
+                            'stop_loss_start_limit': parameters[1],
+                            'stop_loss_trigger_gap': parameters[2],
+                            'profit_percent': sum(values) / len(values),
+                            'data_sets': len(values)}
+        return best
+
+    def get_tasks(self) -> list:
+        """
+        Split the grid of each data set into tasks of `grid_chunk_size` combinations.
+
+        :return: list of task dicts for `run_sweep_task()`
+        """
+        grid = self.get_grid()
+        tasks = []
+        for data_set in self.data_sets:
+            for index in range(0, len(grid), self.grid_chunk_size):
+                tasks.append({**data_set, 'grid': grid[index:index + self.grid_chunk_size]})
+        return tasks
+
+    def prepare(self) -> list:
+        """
+        Find the files of all data sets and convert them into `.npy` files, the data sets are converted in parallel.
+
+        :return: list of data set dicts
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        conversions = []
+        self.data_sets = []
+        for date_from, date_to in self.date_ranges:
+            files = get_agg_trades_files(data_dir=self.data_dir, date_from=date_from, date_to=date_to)
+            for market in sorted(files):
+                if self.markets is not None and market not in self.markets:
+                    continue
+                name = f"{market}_{date_from or 'start'}_{date_to or 'end'}"
+                data_set = {'market': market,
+                            'date_from': date_from,
+                            'date_to': date_to,
+                            'prices_file': os.path.join(self.cache_dir, f"{name}_prices.npy"),
+                            'timestamps_file': os.path.join(self.cache_dir, f"{name}_timestamps.npy")}
+                self.data_sets.append(data_set)
+                conversions.append((files[market], data_set['prices_file'], data_set['timestamps_file']))
+        self.logger.info(f"BinanceTrailingStopLossSweep.prepare() - Converting {len(conversions)} data sets")
+        if self.print_notifications:
+            print(f"Preparing {len(conversions)} data sets ...")
+        with multiprocessing.Pool(processes=min(self.workers, max(1, len(conversions)))) as pool:
+            pool.starmap(convert_agg_trades_to_npy, conversions)
+        return self.data_sets
+
+    def run(self) -> list:
+        """
+        Prepare the data sets and evaluate the grid on all of them.
+
+        :return: list of result dicts, see `SWEEP_RESULT_KEYS`
+        """
+        self.prepare()
+        tasks = self.get_tasks()
+        self.logger.info(f"BinanceTrailingStopLossSweep.run() - Evaluating {len(self.get_grid())} parameter "
+                         f"combinations on {len(self.data_sets)} data sets with {self.workers} workers")
+        if self.print_notifications:
+            print(f"Evaluating {len(self.get_grid())} parameter combinations on {len(self.data_sets)} data sets with "
+                  f"{self.workers} workers ...")
+        results = []
+        with multiprocessing.Pool(processes=self.workers) as pool:
+            for task_results in pool.imap_unordered(run_sweep_task, tasks):
+                results.extend(task_results)
+        results.sort(key=lambda result: (result['market'], str(result['date_from']), str(result['stop_loss_limit']),
+                                         str(result['stop_loss_start_limit']), str(result['stop_loss_trigger_gap'])))
+        return results
+
+    @staticmethod
+    def save_results(results: list = None, file_path: str = None) -> bool:
+        """
+        Save the results as CSV file.
+
+        :param results: Results of `run()`.
+        :type results: list
+        :param file_path: Path of the CSV file.
+        :type file_path: str
+
+        :return: bool
+        """
+        with open(file_path, "w", newline="") as fh_csv:
+            writer = csv.DictWriter(fh_csv, fieldnames=SWEEP_RESULT_KEYS)
+            writer.writeheader()
+            writer.writerows(results)
+        return True
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# File: unicorn_binance_trailing_stop_loss/trailing_kernel.py
+#
+# Part of ‘UNICORN Binance Trailing Stop Loss’
+# Project website: https://www.lucit.tech/unicorn-binance-trailing-stop-loss.html
+# Github: https://github.com/LUCIT-Systems-and-Development/unicorn-binance-trailing-stop-loss
+# Documentation: https://unicorn-binance-trailing-stop-loss.docs.lucit.tech
+# PyPI: https://pypi.org/project/unicorn-binance-trailing-stop-loss
+# LUCIT Online Shop: https://shop.lucit.services/software
+#
+# License: LSOSL - LUCIT Synergetic Open Source License
+# https://github.com/LUCIT-Systems-and-Development/unicorn-binance-websocket-api/blob/master/LICENSE
+#
+# Author: LUCIT Systems and Development
+#
+# Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
+# All rights reserved.
+#
+# NumPy is an optional dependency: `pip install unicorn-binance-trailing-stop-loss[numpy]`
+
+from .manager import BinanceTrailingStopLossManager
+from typing import Optional, Union
+import numpy as np
+
+
+def calculate_stop_loss_prices(prices: np.ndarray = None,
+                               limit: Union[str, float] = None) -> np.ndarray:
+    """
+    Vectorized `BinanceTrailingStopLossManager.calculate_stop_loss_price()` with the same float operations, so the
+    results are bit identical.
+
+    :param prices: The prices.
+    :type prices: np.ndarray
+    :param limit: Stop loss limit in percent or as fixed float value
+    :type limit: float, str
+
+    :return: np.ndarray
+    """
+    if "%" in str(limit):
+        limit_percent = float(str(limit).rstrip("%"))
+        sl_prices = (prices / 100) * (100.0 - limit_percent)
+    else:
+        sl_prices = prices - float(limit)
+    return np.floor(sl_prices * 100) / 100
+
+
+def calculate_trailing_stop_loss(prices: np.ndarray = None,
+                                 stop_loss_limit: Union[str, float] = None,
+                                 stop_loss_start_limit: Union[str, float] = None,
+                                 stop_loss_trigger_gap: str = "0.01",
+                                 stop_loss_price: Optional[float] = None,
+                                 precision: int = 8) -> dict:
+    """
+    Calculate the stop/loss trajectory, the trigger, the exit and the number of order replacements of a whole price
+    array at once.
+
+    The semantics match `BinanceTrailingStopLossBacktest` without `stop_loss_update_interval` and
+    `stop_loss_update_min_improvement`: The first price sets the stop/loss price with `stop_loss_start_limit` (or
+    `stop_loss_limit`), every later price raises it to the running maximum of `calculate_stop_loss_price()`, and the
+    order is triggered by the first price at or below the trigger price of the stop/loss price of the previous tick.
+    If the triggering price is below the limit price, the exit is the limit price at the first later price reaching it.
+
+    Because `calculate_stop_loss_price()` is monotonic, the running maximum of the stop/loss prices is computed with
+    `np.maximum.accumulate()`. The trigger prices are only calculated once per distinct stop/loss price with
+    `BinanceTrailingStopLossManager.calculate_stop_loss_trigger_price()`.
+
+    :param prices: The prices in trade order.
+    :type prices: np.ndarray
+    :param stop_loss_limit: The limit in float or percent.
+    :type stop_loss_limit: str
+    :param stop_loss_start_limit: The limit of the first stop/loss order in float or percent.
+    :type stop_loss_start_limit: str
+    :param stop_loss_trigger_gap: Gap between stopPrice and limit order price, use integer or percent values.
+    :type stop_loss_trigger_gap: str
+    :param stop_loss_price: The price of an already placed stop/loss order, used to continue a trajectory over
+                            multiple price arrays. `stop_loss_start_limit` is ignored if provided.
+    :type stop_loss_price: float
+    :param precision: Decimal places of the trigger price without `SymbolQuantizer`.
+    :type precision: int
+
+    :return: dict with `stop_loss_prices` (np.ndarray, stop/loss price after each tick), `trigger_index`,
+             `trigger_price`, `exit_index`, `exit_price` and `replacements`. An empty price array returns an empty
+             trajectory without trigger.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    result = {'stop_loss_prices': np.empty(0, dtype=np.float64),
+              'trigger_index': None,
+              'trigger_price': None,
+              'exit_index': None,
+              'exit_price': None,
+              'replacements': 0}
+    if len(prices) == 0:
+        return result
+    sl_prices = calculate_stop_loss_prices(prices, stop_loss_limit)
+    if stop_loss_price is None:
+        sl_prices[0] = calculate_stop_loss_prices(prices[:1], stop_loss_start_limit or stop_loss_limit)[0]
+        initial_stop_loss_price = -np.inf
+    else:
+        sl_prices[0] = max(sl_prices[0], stop_loss_price)
+        initial_stop_loss_price = stop_loss_price
+    stop_loss_prices = np.maximum.accumulate(sl_prices)
+    # Stop/loss price that is active while a tick arrives
+    active = np.empty_like(stop_loss_prices)
+    active[0] = initial_stop_loss_price
+    active[1:] = stop_loss_prices[:-1]
+    # Distinct stop/loss prices are contiguous segments because the trajectory is monotonic
+    starts = np.flatnonzero(np.concatenate(([True], active[1:] != active[:-1])))
+    calculate_trigger_price = BinanceTrailingStopLossManager.calculate_stop_loss_trigger_price
+    segment_trigger_prices = np.array([calculate_trigger_price(stop_loss_price=float(value),
+                                                               trigger_gap=stop_loss_trigger_gap,
+                                                               precision=precision) if np.isfinite(value) else -np.inf
+                                       for value in active[starts]], dtype=np.float64)
+    trigger_prices = np.repeat(segment_trigger_prices, np.diff(np.append(starts, len(active))))
+    triggered = prices <= trigger_prices
+    result['stop_loss_prices'] = stop_loss_prices
+    if triggered.any():
+        trigger_index = int(np.argmax(triggered))
+        limit_price = float(active[trigger_index])
+        stop_loss_prices[trigger_index:] = limit_price
+        result['trigger_index'] = trigger_index
+        result['trigger_price'] = float(trigger_prices[trigger_index])
+        if prices[trigger_index] >= limit_price:
+            result['exit_index'] = trigger_index
+            result['exit_price'] = float(prices[trigger_index])
+        else:
+            filled = prices[trigger_index + 1:] >= limit_price
+            if filled.any():
+                result['exit_index'] = trigger_index + 1 + int(np.argmax(filled))
+                result['exit_price'] = limit_price
+        end = trigger_index
+    else:
+        end = len(prices)
+    changes = int(np.count_nonzero(stop_loss_prices[1:end] != stop_loss_prices[:end - 1])) if end > 1 else 0
+    if stop_loss_price is not None and end > 0 and stop_loss_prices[0] != stop_loss_price:
+        changes += 1
+    result['replacements'] = changes
+    return result
@@ -18,14 +18,47 @@
 # Copyright (c) 2022-2023, LUCIT Systems and Development (https://www.lucit.tech)
 # All rights reserved.
 
+from unicorn_binance_trailing_stop_loss.backtest import BinanceTrailingStopLossBacktest
 from unicorn_binance_trailing_stop_loss.cli import main
+from unicorn_binance_trailing_stop_loss.exchanges import get_exchange_adapter, ExchangeAdapter, \
+    IsolatedMarginExchangeAdapter, SpotExchangeAdapter
+from unicorn_binance_trailing_stop_loss.fleet import BinanceTrailingStopLossFleetManager
+from unicorn_binance_trailing_stop_loss.journal import BinanceTrailingStopLossJournal
 from unicorn_binance_trailing_stop_loss.manager import BinanceTrailingStopLossManager
+from unicorn_binance_trailing_stop_loss.metrics import MetricsCounter, MetricsHistogram, MetricsRegistry, USED_WEIGHT
+from unicorn_binance_trailing_stop_loss.mock_exchange import BinanceMockExchange
+from unicorn_binance_trailing_stop_loss.notifications import BinanceTrailingStopLossNotificationDispatcher
+from unicorn_binance_trailing_stop_loss.portfolio_manager import BinanceTrailingStopLossPortfolioManager
+from unicorn_binance_trailing_stop_loss.quantizer import SymbolQuantizer
+from unicorn_binance_trailing_stop_loss.rate_limit_scheduler import get_rate_limit_scheduler, \
+    set_rate_limit_utilization, RateLimitScheduler, PRIORITY_DEFAULT, PRIORITY_PROTECTIVE, PRIORITY_RECONCILIATION
+from unicorn_binance_rest_api import BinanceAPIException
+from unittest.mock import patch
+import json
 import logging
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
 import os
+import zipfile
+
+try:
+    import numpy as np
+    from unicorn_binance_trailing_stop_loss.sweep import BinanceTrailingStopLossSweep, SWEEP_RESULT_KEYS
+    from unicorn_binance_trailing_stop_loss.trailing_kernel import calculate_stop_loss_prices, \
+        calculate_trailing_stop_loss
+except ImportError:
+    np = None
 
 BINANCE_COM_API_KEY = ""
 BINANCE_COM_API_SECRET = ""
+# Cumulative import time of `unicorn_binance_trailing_stop_loss.cli` in microseconds
+CLI_IMPORT_TIME_BUDGET = 250000
 
 logging.getLogger("unicorn_binance_trailing_stop_loss.unicorn_binance_trailing_stop_loss_engine_manager")
 logging.basicConfig(level=logging.DEBUG,
@@ -46,6 +79,132 @@ def callback_finished(msg):
     UBTSL.stop_manager()
 
 
+class LicensingManagerStub(object):
+    """
+    Stand-in of the `LucitLicensingManager` for managers trading on a `BinanceMockExchange`.
+    """
+    @staticmethod
+    def close(*args, **kwargs) -> dict:
+        return {}
+
+    @staticmethod
+    def get_license_exception():
+        return None
+
+
+class MockExchangeRestApi(object):
+    """
+    Stand-in of the `BinanceRestApiManager` that passes the requests of the manager in-process to a
+    `BinanceMockExchange`.
+    """
+    def __init__(self, mock_exchange: BinanceMockExchange = None):
+        self.mock_exchange = mock_exchange
+
+    def _post(self, path: str = None, signed: bool = False, **kwargs) -> dict:
+        return self.request("POST", f"/api/v3/{path}", kwargs.get('data'))
+
+    def cancel_order(self, **params) -> dict:
+        return self.request("DELETE", "/api/v3/order", params)
+
+    def create_order(self, **params) -> dict:
+        return self.request("POST", "/api/v3/order", params)
+
+    def get_account(self, **params) -> dict:
+        return self.request("GET", "/api/v3/account", params)
+
+    def get_exchange_info(self, **params) -> dict:
+        return self.request("GET", "/api/v3/exchangeInfo", params)
+
+    def get_open_orders(self, **params) -> list:
+        return self.request("GET", "/api/v3/openOrders", params)
+
+    @staticmethod
+    def get_used_weight(cached: bool = True) -> dict:
+        return {}
+
+    def request(self, method: str = None, path: str = None, params: dict = None):
+        status_code, headers, response = self.mock_exchange.process_rest_request(method=method, path=path,
+                                                                                 params=params or {})
+        if status_code != 200:
+            raise BinanceAPIException(MockResponse(status_code=status_code, headers=headers, body=response))
+        return response
+
+    @staticmethod
+    def stop_manager() -> bool:
+        return True
+
+
+class MockResponse(object):
+    """
+    Stand-in of the `requests.Response` a `BinanceAPIException` is created from.
+    """
+    def __init__(self, status_code: int = 200, headers: dict = None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = json.dumps(body)
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class WebSocketApiStub(object):
+    """
+    Stand-in of the `BinanceWebSocketApiManager`, the tests pass the stream data directly to the manager.
+    """
+    def __init__(self):
+        self.streams: list = []
+        self.subscriptions: list = []
+
+    def create_stream(self, *args, **kwargs) -> int:
+        self.streams.append((args, kwargs))
+        return len(self.streams)
+
+    def subscribe_to_stream(self, stream_id=None, markets=None) -> bool:
+        self.subscriptions.append(("subscribe", stream_id, markets))
+        return True
+
+    def unsubscribe_from_stream(self, stream_id=None, markets=None) -> bool:
+        self.subscriptions.append(("unsubscribe", stream_id, markets))
+        return True
+
+    @staticmethod
+    def wait_till_stream_has_started(stream_id=None) -> bool:
+        return True
+
+    @staticmethod
+    def stop_manager() -> bool:
+        return True
+
+
+def create_mock_exchange_manager(mock_exchange: BinanceMockExchange = None, **kwargs) -> BinanceTrailingStopLossManager:
+    kwargs.setdefault('stop_loss_limit', "1%")
+    manager = BinanceTrailingStopLossManager(api_key="mock_exchange",
+                                             api_secret="mock_exchange",
+                                             exchange="binance.com",
+                                             llm_manager=LicensingManagerStub(),
+                                             market="BTCUSDT",
+                                             start_engine=False,
+                                             ubra_manager=MockExchangeRestApi(mock_exchange),
+                                             ubwa_manager=WebSocketApiStub(),
+                                             warn_on_update=False,
+                                             **kwargs)
+    manager.exchange_info_cache.cache_path = tempfile.mkdtemp()
+    return manager
+
+
+def get_execution_report(order: dict = None, status: str = None) -> dict:
+    return {'event_type': "executionReport",
+            'symbol': order['symbol'],
+            'order_id': order['orderId'],
+            'side': order['side'],
+            'order_type': order['type'],
+            'current_order_status': status or order['status'],
+            'order_price': order['price'],
+            'stop_price': order.get('stopPrice', "0"),
+            'order_quantity': order['origQty'],
+            'cumulative_filled_quantity': order['executedQty']}
+
+
 UBTSL = BinanceTrailingStopLossManager(callback_error=callback_error,
                                        callback_finished=callback_finished,
                                        api_key="aaa",
@@ -66,6 +225,52 @@ UBTSL = BinanceTrailingStopLossManager(callback_error=callback_error,
                                        telegram_send_to="telegram_send_to")
 
 
+class TestBacktest(unittest.TestCase):
+    def test_replay(self):
+        temp_dir = tempfile.mkdtemp()
+        csv_file = os.path.join(temp_dir, "BTCUSDT-aggTrades-2023-11-14.csv")
+        with open(csv_file, "w") as fh_csv:
+            fh_csv.write("agg_trade_id,price,quantity,first_trade_id,last_trade_id,transact_time,is_buyer_maker\n")
+            for index, price in enumerate((100.0, 102.0, 104.0, 103.0, 101.5, 101.8, 102.5, 90.0)):
+                fh_csv.write(f"{index},{price},0.1,{index},{index},{1700000000000 + index * 1000},true\n")
+        zip_file = os.path.join(temp_dir, "BTCUSDT-aggTrades-2023-11-14.zip")
+        with zipfile.ZipFile(zip_file, "w") as archive:
+            archive.write(csv_file, arcname=os.path.basename(csv_file))
+        for file_path, vectorized in ((csv_file, False), (zip_file, False), (csv_file, True)):
+            result = BinanceTrailingStopLossBacktest(stop_loss_limit="2",
+                                                     vectorized=vectorized).run(file_path, chunk_size=3)
+            # Triggered at 101.5 below the limit price, filled at the limit price as soon as a trade reaches it
+            self.assertEqual({key: result[key] for key in ('entry_price', 'high_price', 'replacements',
+                                                           'stop_loss_price', 'trigger_index', 'trigger_price',
+                                                           'trigger_time', 'exit_price', 'exit_time', 'ticks')},
+                             {'entry_price': 100.0, 'high_price': 104.0, 'replacements': 2, 'stop_loss_price': 102.0,
+                              'trigger_index': 4, 'trigger_price': 102.01, 'trigger_time': 1700000004.0,
+                              'exit_price': 102.0, 'exit_time': 1700000006.0, 'ticks': 7})
+            self.assertAlmostEqual(result['slippage'], 0.01)
+
+
+class TestBalanceBook(unittest.TestCase):
+    def test_update_and_reconcile(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}, trades_per_second=0)
+        manager = create_mock_exchange_manager(mock_exchange, balance_reconciliation_interval=60.0)
+        self.assertTrue(manager.load_startup_state())
+        self.assertEqual(manager.get_owning_amount_from_balance_book(base_asset="BTC"), (1.0, 1.0))
+        self.assertEqual(mock_exchange.statistics['requests'].get("GET /api/v3/account"), 1)
+        manager.process_userdata_stream({'event_type': "outboundAccountPosition",
+                                         'balances': [{'asset': "BTC", 'free': "0.4", 'locked': "0.6"},
+                                                      {'asset': "USDT", 'free': "500.0", 'locked': "0.0"}]})
+        # The locked amount of spot accounts is not part of the owning amount
+        self.assertEqual(manager.get_owning_amount_from_balance_book(base_asset="BTC"), (0.4, 0.4))
+        self.assertEqual(manager.balance_book["USDT"]['free'], 500.0)
+        # Only due reconciliations request the account
+        manager.process_stop_loss_order_request()
+        self.assertEqual(mock_exchange.statistics['requests'].get("GET /api/v3/account"), 1)
+        manager.balance_book_last_reconciliation = time.time() - 61.0
+        manager.process_stop_loss_order_request()
+        self.assertEqual(mock_exchange.statistics['requests'].get("GET /api/v3/account"), 2)
+        self.assertEqual(manager.get_owning_amount_from_balance_book(base_asset="BTC"), (1.0, 1.0))
+
+
 class TestBinanceComManager(unittest.TestCase):
     def test_stop(self):
         self.assertTrue(UBTSL.stop_manager())
@@ -77,5 +282,577 @@ class TestBinanceComManager(unittest.TestCase):
             pass
 
 
+class TestCancelReplace(unittest.TestCase):
+    def test_replace_stop_loss_order(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}, trades_per_second=0)
+        manager = create_mock_exchange_manager(mock_exchange)
+        order = manager.exchange_adapter.create_order(side="SELL", type="STOP_LOSS_LIMIT", price="29000.00",
+                                                      stopPrice="29000.01", quantity="0.5", timeInForce="GTC")
+        manager.stop_loss_order_id = order['orderId']
+        manager.stop_loss_quantity = 0.5
+        manager.stop_loss_price = 29500.0
+        self.assertTrue(manager.replace_stop_loss_order(stop_loss_price=29500.0))
+        self.assertEqual(mock_exchange.statistics['requests'].get("POST /api/v3/order/cancelReplace"), 1)
+        open_orders = mock_exchange.process_rest_request(method="GET", path="/api/v3/openOrders", params={})[2]
+        self.assertEqual([(item['orderId'], float(item['price'])) for item in open_orders],
+                         [(manager.stop_loss_order_id, 29500.0)])
+        # The CANCELED report of the replaced order arrives after `stop_loss_order_id` changed
+        manager.process_userdata_stream(get_execution_report(order, status="CANCELED"))
+        self.assertEqual(manager.stop_loss_order_ids_replaced, set())
+        self.assertFalse(manager.stop_loss_order_recreate_request)
+
+    def test_replace_stop_loss_order_error(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}, trades_per_second=0)
+        manager = create_mock_exchange_manager(mock_exchange)
+        order = manager.exchange_adapter.create_order(side="SELL", type="STOP_LOSS_LIMIT", price="29000.00",
+                                                      stopPrice="29000.01", quantity="0.5", timeInForce="GTC")
+        manager.stop_loss_order_id = order['orderId']
+        manager.stop_loss_quantity = 0.5
+        manager.stop_loss_price = 29500.0
+        mock_exchange.inject_error(code=-2010, path="/api/v3/order/cancelReplace")
+        # The caller falls back to cancel the order and create a new one
+        self.assertFalse(manager.replace_stop_loss_order(stop_loss_price=29500.0))
+        self.assertEqual(manager.stop_loss_order_id, order['orderId'])
+        self.assertEqual(manager.stop_loss_order_ids_replaced, set())
+
+
+class TestExchangeAdapter(unittest.TestCase):
+    def test_get_exchange_adapter(self):
+        self.assertIsInstance(get_exchange_adapter(exchange="binance.com-testnet"), SpotExchangeAdapter)
+        self.assertIsInstance(get_exchange_adapter(exchange="binance.com-isolated_margin"),
+                              IsolatedMarginExchangeAdapter)
+        adapter = get_exchange_adapter(exchange="binance.org")
+        self.assertIs(type(adapter), ExchangeAdapter)
+        self.assertFalse(adapter.supported)
+        self.assertIsNone(adapter.get_symbol_info(symbol="BTCUSDT"))
+
+    def test_normalize_symbol_info(self):
+        symbol_info = ExchangeAdapter.normalize_symbol_info({'symbol': "BTCUSDT", 'base': "BTC", 'quote': "USDT"},
+                                                            base_asset_key="base",
+                                                            quote_asset_key="quote")
+        self.assertEqual(symbol_info['base_asset'], "BTC")
+        self.assertEqual(symbol_info['quote_asset'], "USDT")
+
+
+class TestFleetManager(unittest.TestCase):
+    def test_get_resume_kwargs(self):
+        profiles = {'jump': {'engine': "jump-in-and-trail", 'market': "BTCUSDT"},
+                    'native': {'engine': "native-trail", 'market': "ETHUSDT"},
+                    'trail': {'market': "BNBUSDT", 'stop_loss_price': 300.0}}
+        fleet = BinanceTrailingStopLossFleetManager(profiles=profiles, workers=1)
+        self.assertEqual(fleet.get_resume_kwargs("jump")['engine'], "trail")
+        self.assertEqual(fleet.get_resume_kwargs("native")['engine'], "native-trail")
+        self.assertEqual(fleet.get_resume_kwargs("trail"), {'market': "BNBUSDT",
+                                                            'reset_stop_loss_price': False,
+                                                            'stop_loss_price': 0.0})
+
+    def test_rebalance_handoff(self):
+        profiles = {name: {'market': f"{name.upper()}USDT"} for name in ("ada", "bnb", "btc", "eth", "sol")}
+        fleet = BinanceTrailingStopLossFleetManager(profiles=profiles, workers=2)
+        self.assertEqual([worker['shard'] for worker in fleet.workers], [{"ada", "btc", "sol"}, {"bnb", "eth"}])
+        fleet.event_queue = queue.Queue()
+        for worker in fleet.workers:
+            worker['command_queue'] = queue.Queue()
+        fleet.event_queue.put(("finished", 1, "bnb", ""))
+        fleet.event_queue.put(("error", 1, "eth", ""))
+        fleet.process_events()
+        fleet.rebalance_shards()
+        self.assertEqual([worker['shard'] for worker in fleet.workers], [{"ada", "btc"}, {"sol"}])
+        self.assertEqual(fleet.workers[0]['command_queue'].get_nowait(), ("remove", "sol"))
+        self.assertEqual([fleet.workers[1]['command_queue'].get_nowait() for _ in range(2)],
+                         [("remove", "bnb"), ("remove", "eth")])
+        # No `add` before the old worker confirmed the removal
+        self.assertTrue(fleet.workers[1]['command_queue'].empty())
+        fleet.event_queue.put(("removed", 1, "bnb", ""))
+        fleet.event_queue.put(("removed", 0, "sol", ""))
+        fleet.process_events()
+        self.assertEqual(fleet.workers[1]['command_queue'].get_nowait(),
+                         ("add", "sol", {'market': "SOLUSDT", 'reset_stop_loss_price': False,
+                                         'stop_loss_price': 0.0}))
+        self.assertEqual(fleet.handoffs, {})
+
+    def test_rebalance_handoff_finished(self):
+        profiles = {name: {'market': f"{name.upper()}USDT"} for name in ("ada", "bnb", "btc")}
+        fleet = BinanceTrailingStopLossFleetManager(profiles=profiles, workers=2)
+        fleet.event_queue = queue.Queue()
+        for worker in fleet.workers:
+            worker['command_queue'] = queue.Queue()
+        fleet.event_queue.put(("finished", 1, "bnb", ""))
+        fleet.process_events()
+        fleet.rebalance_shards()
+        self.assertEqual(fleet.handoffs, {"btc": {'source': 0, 'target': 1}})
+        # The profile finishes on the old worker before it got the `remove` command
+        fleet.event_queue.put(("finished", 0, "btc", ""))
+        fleet.event_queue.put(("removed", 0, "btc", ""))
+        fleet.process_events()
+        self.assertEqual([worker['shard'] for worker in fleet.workers], [{"ada"}, set()])
+        self.assertEqual(fleet.handoffs, {})
+        self.assertEqual(fleet.workers[1]['command_queue'].get_nowait(), ("remove", "bnb"))
+        self.assertTrue(fleet.workers[1]['command_queue'].empty())
+
+
+class TestMockExchange(unittest.TestCase):
+    def test_stop_loss_order(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}, trades_per_second=0)
+        status_code, _, order = mock_exchange.process_rest_request(method="POST",
+                                                                   path="/api/v3/order",
+                                                                   params={'symbol': "BTCUSDT",
+                                                                           'side': "SELL",
+                                                                           'type': "STOP_LOSS_LIMIT",
+                                                                           'quantity': "0.5",
+                                                                           'price': "29690",
+                                                                           'stopPrice': "29700",
+                                                                           'timeInForce': "GTC"})
+        self.assertEqual((status_code, order['status']), (200, "NEW"))
+        mock_exchange.process_trade(symbol="BTCUSDT", price=29600.0)
+        _, _, open_orders = mock_exchange.process_rest_request(method="GET", path="/api/v3/openOrders", params={})
+        self.assertEqual(len(open_orders), 1)
+        mock_exchange.process_trade(symbol="BTCUSDT", price=29800.0)
+        _, _, account = mock_exchange.process_rest_request(method="GET", path="/api/v3/account", params={})
+        balances = {balance['asset']: float(balance['free']) for balance in account['balances']}
+        self.assertEqual(balances, {'BTC': 0.5, 'USDT': 100000.0 + 0.5 * 29690})
+        mock_exchange.inject_error(code=-1003)
+        status_code, headers, response = mock_exchange.process_rest_request(method="GET",
+                                                                            path="/api/v3/account",
+                                                                            params={})
+        self.assertEqual((status_code, response['code'], headers['Retry-After']), (429, -1003, "1"))
+
+    def test_create_stop_loss_order_retry(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}, trades_per_second=0)
+        manager = create_mock_exchange_manager(mock_exchange)
+        self.assertTrue(manager.load_startup_state())
+        mock_exchange.inject_error(code=-2010, path="/api/v3/order")
+
+        def sleep(seconds):
+            # A higher stop/loss price arrives while the order worker waits for the retry
+            manager.stop_loss_price_pending = 29800.0
+
+        with patch("unicorn_binance_trailing_stop_loss.manager.time.sleep", side_effect=sleep) as sleep_mock:
+            self.assertTrue(manager.create_stop_loss_order(29700.0))
+        sleep_mock.assert_called_once_with(5)
+        self.assertEqual(mock_exchange.statistics['requests'].get("POST /api/v3/order"), 2)
+        open_orders = mock_exchange.process_rest_request(method="GET", path="/api/v3/openOrders", params={})[2]
+        self.assertEqual([(item['orderId'], float(item['price'])) for item in open_orders],
+                         [(manager.stop_loss_order_id, 29800.0)])
+        self.assertEqual(manager.stop_loss_price, 29800.0)
+
+
+class TestImportTime(unittest.TestCase):
+    def test_cli_import_time(self):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                                 "import unicorn_binance_trailing_stop_loss.cli"],
+                                capture_output=True, check=True, text=True)
+        cumulative_times = {}
+        for line in result.stderr.splitlines():
+            # import time: <self us> | <cumulative us> | <module>
+            fields = line.replace("import time:", "").split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit():
+                cumulative_times[fields[2].strip()] = int(fields[1])
+        for module in ("cython", "smtplib", "unicorn_binance_rest_api", "unicorn_binance_websocket_api",
+                       "unicorn_binance_trailing_stop_loss.licensing_manager",
+                       "unicorn_binance_trailing_stop_loss.manager"):
+            self.assertNotIn(module, cumulative_times)
+        self.assertLess(cumulative_times['unicorn_binance_trailing_stop_loss.cli'], CLI_IMPORT_TIME_BUDGET)
+
+
+class TestJournal(unittest.TestCase):
+    def test_replay(self):
+        with tempfile.TemporaryDirectory() as journal_path:
+            file_path = os.path.join(journal_path, "binance.com_BTCUSDT.jsonl")
+            journal = BinanceTrailingStopLossJournal(file_path=file_path, compaction_threshold=5)
+            journal.open()
+            journal.append("order", sync=True, order_id=1, stop_loss_price=29000.0, stop_loss_quantity=0.5)
+            journal.append("balance", asset="BTC", total=0.5, free=0.0)
+            for stop_loss_price in (29100.0, 29200.0, 29300.0):
+                journal.append("stop_loss_price", stop_loss_price=stop_loss_price)
+            journal.append("order", sync=True, order_id=2, stop_loss_price=29400.0, stop_loss_quantity=0.5)
+            journal.close()
+            with open(file_path, "ab") as fh_journal:
+                fh_journal.write(b'{"type":"stop_loss_price","stop_lo')
+            state = BinanceTrailingStopLossJournal(file_path=file_path).open()
+            self.assertEqual((state['stop_loss_order_id'], state['stop_loss_price'], state['stop_loss_quantity']),
+                             (2, 29400.0, 0.5))
+            self.assertEqual(state['balances'], {'BTC': {'total': 0.5, 'free': 0.0}})
+            with open(file_path, "rb") as fh_journal:
+                self.assertEqual(len(fh_journal.readlines()), 2)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self):
+        registry = MetricsRegistry()
+        counter = registry.add_metric(MetricsCounter("ubtsl_test_total", "Test counter.", ("market", )))
+        histogram = registry.add_metric(MetricsHistogram("ubtsl_test_seconds", "Test histogram.", ("market", ),
+                                                         buckets=(0.1, 1.0)))
+        counter.labels("BTCUSDT").inc()
+        counter.labels("BTCUSDT").inc(2)
+        for value in (0.05, 0.5, 5.0):
+            histogram.labels("BTCUSDT").observe(value)
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE ubtsl_test_total counter", lines)
+        self.assertIn('ubtsl_test_total{market="BTCUSDT"} 3', lines)
+        self.assertIn('ubtsl_test_seconds_bucket{market="BTCUSDT",le="0.1"} 1', lines)
+        self.assertIn('ubtsl_test_seconds_bucket{market="BTCUSDT",le="1.0"} 2', lines)
+        self.assertIn('ubtsl_test_seconds_bucket{market="BTCUSDT",le="+Inf"} 3', lines)
+        self.assertIn('ubtsl_test_seconds_count{market="BTCUSDT"} 3', lines)
+
+    def test_update_used_weight_metric(self):
+        manager = create_mock_exchange_manager(BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}},
+                                                                   trades_per_second=0))
+        calls = []
+        manager.ubra.get_used_weight = lambda cached=False: calls.append(cached) or {'weight': "12"}
+        self.assertTrue(manager.update_used_weight_metric())
+        # Only the weight of the last response is read, no extra request
+        self.assertEqual(calls, [True])
+        self.assertEqual(USED_WEIGHT.labels("binance.com").value, 12.0)
+
+
+class TestNativeTrailing(unittest.TestCase):
+    def test_native_trailing_percent(self):
+        self.assertEqual(BinanceTrailingStopLossManager.calculate_native_trailing_percent("1.5%"), 1.5)
+        self.assertEqual(BinanceTrailingStopLossManager.calculate_native_trailing_percent("25", price=1000), 2.5)
+        self.assertIsNone(BinanceTrailingStopLossManager.calculate_native_trailing_percent("25"))
+
+
+class TestNotificationDispatcher(unittest.TestCase):
+    def test_batching(self):
+        sent = []
+
+        class RecordingDispatcher(BinanceTrailingStopLossNotificationDispatcher):
+            def send_email(self, message=None):
+                sent.append(("email", message))
+                return True
+
+            def send_telegram(self, message=None):
+                sent.append(("telegram", message))
+                return True
+
+        dispatcher = RecordingDispatcher(send_to_email_address="to@example.com",
+                                         send_from_email_address="from@example.com",
+                                         send_from_email_server="smtp.example.com",
+                                         send_from_email_port=465,
+                                         telegram_bot_token="token",
+                                         telegram_send_to="receiver",
+                                         max_queue_size=4)
+        for i in range(3):
+            dispatcher.send_notification(f"Subject: Test {i}\n\nText {i}")
+        dispatcher.start()
+        dispatcher.stop_manager()
+        self.assertEqual([channel for channel, _ in sent], ["email", "telegram"])
+        self.assertTrue(sent[0][1].startswith("Subject: unicorn-binance-trailing-stop-loss (2 notifications)"))
+        self.assertNotIn("Text 0", sent[1][1])
+        self.assertIn("Text 2", sent[1][1])
+
+
+class TestOrderCache(unittest.TestCase):
+    def test_execution_reports_and_resync(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}, trades_per_second=0)
+        manager = create_mock_exchange_manager(mock_exchange)
+        manager.user_stream_id = 1
+        manager.process_stream_signals(signal_type="CONNECT", stream_id=1)
+        self.assertTrue(manager.load_startup_state())
+        self.assertEqual(manager.order_cache, {})
+        order = manager.exchange_adapter.create_order(side="SELL", type="STOP_LOSS_LIMIT", price="29000.00",
+                                                      stopPrice="29000.01", quantity="0.5", timeInForce="GTC")
+        manager.process_userdata_stream(get_execution_report(order, status="NEW"))
+        self.assertEqual([(item['order_id'], item['price'], item['quantity'])
+                          for item in manager.get_open_stop_loss_orders()], [(order['orderId'], 29000.0, 0.5)])
+        manager.exchange_adapter.cancel_order(order_id=order['orderId'])
+        manager.process_userdata_stream(get_execution_report(order, status="CANCELED"))
+        self.assertEqual(manager.order_cache, {})
+        # The execution report of this order gets lost during a reconnect of the userData stream
+        order = manager.exchange_adapter.create_order(side="SELL", type="STOP_LOSS_LIMIT", price="29100.00",
+                                                      stopPrice="29100.01", quantity="0.5", timeInForce="GTC")
+        manager.process_stream_signals(signal_type="CONNECT", stream_id=1)
+        self.assertTrue(manager.order_cache_resync_request)
+        manager.process_stop_loss_order_request()
+        self.assertFalse(manager.order_cache_resync_request)
+        self.assertEqual(list(manager.order_cache), [order['orderId']])
+        self.assertEqual(manager.order_cache[order['orderId']]['price'], 29100.0)
+
+
+class TestOrderWorker(unittest.TestCase):
+    def test_mailbox_keeps_newest_price(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}}, trades_per_second=0)
+        manager = create_mock_exchange_manager(mock_exchange)
+        self.assertTrue(manager.load_startup_state())
+        for price in (30000.0, 30200.0, 30100.0, 30150.0):
+            manager.process_price_update(price=price)
+        self.assertEqual(manager.stop_loss_price_pending, 29898.0)
+        self.assertTrue(manager.process_stop_loss_order_request())
+        self.assertEqual(mock_exchange.statistics['requests'].get("POST /api/v3/order"), 1)
+        open_orders = mock_exchange.process_rest_request(method="GET", path="/api/v3/openOrders", params={})[2]
+        self.assertEqual([float(item['price']) for item in open_orders], [29898.0])
+        # The placed price is not submitted again
+        self.assertFalse(manager.process_stop_loss_order_request())
+        self.assertEqual(mock_exchange.statistics['requests'].get("POST /api/v3/order"), 1)
+
+
+class TestPortfolioManager(unittest.TestCase):
+    def test_dispatch_and_markets(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}, "ETHUSDT": {'price': 2000.0}},
+                                            trades_per_second=0)
+        ubwa = WebSocketApiStub()
+        # The managers of the markets are not started, only the dispatching is tested
+        with patch("unicorn_binance_trailing_stop_loss.portfolio_manager.LucitLicensingManager",
+                   return_value=LicensingManagerStub()), patch.object(BinanceTrailingStopLossManager, "start"):
+            portfolio = BinanceTrailingStopLossPortfolioManager(api_key="mock_exchange",
+                                                                api_secret="mock_exchange",
+                                                                ubra_manager=MockExchangeRestApi(mock_exchange),
+                                                                ubwa_manager=ubwa,
+                                                                warn_on_update=False)
+            btc = portfolio.add_market(market="BTCUSDT", stop_loss_limit="1%")
+            eth = portfolio.add_market(market="ETHUSDT", stop_loss_limit="1%")
+            self.assertIsNone(portfolio.add_market(market="BTCUSDT", stop_loss_limit="2%"))
+            self.assertIsNone(portfolio.add_market(market="BNBUSDT", price_source="bookTicker"))
+        self.assertEqual(portfolio.get_markets(), ["BTCUSDT", "ETHUSDT"])
+        # One userData stream and one price feed for all markets
+        self.assertEqual(len(ubwa.streams), 2)
+        self.assertEqual(ubwa.subscriptions, [("subscribe", 2, "ETHUSDT")])
+        self.assertEqual((btc.user_stream_id, btc.trade_stream_id), (1, 2))
+        self.assertEqual((eth.user_stream_id, eth.trade_stream_id), (1, 2))
+        self.assertTrue(portfolio.process_price_feed_stream({'symbol': "ETHUSDT", 'price': "2000.0"}))
+        self.assertEqual((btc.current_price, eth.current_price), (0.0, "2000.0"))
+        self.assertEqual(eth.stop_loss_price_pending, 1980.0)
+        self.assertFalse(portfolio.process_price_feed_stream({'symbol': "BNBUSDT", 'price': "300.0"}))
+        order = MockExchangeRestApi(mock_exchange).create_order(symbol="BTCUSDT", side="SELL", type="STOP_LOSS_LIMIT",
+                                                                price="29000.00", stopPrice="29000.01",
+                                                                quantity="0.5", timeInForce="GTC")
+        portfolio.process_userdata_stream(get_execution_report(order, status="NEW"))
+        self.assertEqual((list(btc.order_cache), list(eth.order_cache)), ([order['orderId']], []))
+        btc.stop_loss_asset_name = "BTC"
+        portfolio.register_stop_loss_asset(market="BTCUSDT", asset="BTC")
+        portfolio.process_userdata_stream({'event_type': "outboundAccountPosition",
+                                           'balances': [{'asset': "BTC", 'free': "0.5", 'locked': "0.5"}]})
+        self.assertEqual(btc.balance_book["BTC"]['free'], 0.5)
+        self.assertEqual(eth.balance_book, {})
+        self.assertTrue(portfolio.remove_market(market="ETHUSDT"))
+        self.assertFalse(portfolio.remove_market(market="ETHUSDT"))
+        self.assertTrue(eth.is_manager_stopping())
+        self.assertEqual(portfolio.get_markets(), ["BTCUSDT"])
+        self.assertEqual(ubwa.subscriptions[-1], ("unsubscribe", 2, "ETHUSDT"))
+        self.assertFalse(portfolio.process_price_feed_stream({'symbol': "ETHUSDT", 'price': "2100.0"}))
+        portfolio.stop_manager()
+        self.assertTrue(btc.is_manager_stopping())
+
+
+class TestPriceSource(unittest.TestCase):
+    def test_price_extractors(self):
+        get_price_extractor = BinanceTrailingStopLossManager.get_price_extractor
+        self.assertEqual(get_price_extractor("aggTrade")({'price': "100.5"}), "100.5")
+        self.assertEqual(get_price_extractor("bookTicker")({'best_bid_price': "100.4",
+                                                            'best_ask_price': "100.6"}), "100.4")
+        self.assertEqual(get_price_extractor("kline_1s")({'kline': {'close_price': "100.3"}}), "100.3")
+        self.assertEqual(get_price_extractor("markPrice")({'mark_price': "100.2"}), "100.2")
+        self.assertEqual(get_price_extractor("miniTicker")({'data': [{'close_price': "100.1"}]}), "100.1")
+        self.assertIsNone(get_price_extractor("miniTicker")({'result': None}))
+
+    def test_raw_price_feed(self):
+        get_value_from_raw_data = BinanceTrailingStopLossManager.get_value_from_raw_data
+        frame = '{"stream":"btcusdt@aggTrade","data":{"e":"aggTrade","E":1672515782136,"s":"BTCUSDT","a":12345,' \
+                '"p":"16542.11","q":"0.001","f":100,"l":105,"T":1672515782136,"m":true,"M":true}}'
+        self.assertEqual(get_value_from_raw_data(frame, '"p":'), "16542.11")
+        self.assertEqual(get_value_from_raw_data(frame, '"E":'), "1672515782136")
+        self.assertEqual(get_value_from_raw_data(frame, '"s":'), "BTCUSDT")
+        self.assertEqual(get_value_from_raw_data('{"e":"markPriceUpdate","E":123}', '"E":'), "123")
+        self.assertIsNone(get_value_from_raw_data('{"result":null,"id":1}', '"p":'))
+
+
+class TestRateLimitScheduler(unittest.TestCase):
+    def test_priority_and_fifo(self):
+        scheduler = RateLimitScheduler()
+        scheduler.blocked_until = time.time() + 0.3
+        executed = []
+        threads = []
+        for name, priority in (("default_1", PRIORITY_DEFAULT), ("reconciliation", PRIORITY_RECONCILIATION),
+                               ("default_2", PRIORITY_DEFAULT), ("protective", PRIORITY_PROTECTIVE)):
+            threads.append(threading.Thread(target=scheduler.execute, args=(executed.append, name),
+                                            kwargs={'priority': priority}))
+            threads[-1].start()
+            while len(scheduler.waiting) < len(threads):
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(executed, ["protective", "default_1", "default_2", "reconciliation"])
+
+    def test_retry_after(self):
+        scheduler = RateLimitScheduler()
+
+        def get_rate_limited():
+            raise BinanceAPIException(MockResponse(status_code=429, headers={'Retry-After': "0.3"},
+                                                   body={'code': -1003, 'msg': "Too many requests"}))
+
+        with self.assertRaises(BinanceAPIException):
+            scheduler.execute(get_rate_limited)
+        start_time = time.time()
+        scheduler.execute(time.time)
+        self.assertGreaterEqual(time.time() - start_time, 0.25)
+
+    def test_token_bucket(self):
+        scheduler = RateLimitScheduler(rate_limits=[{'rateLimitType': "REQUEST_WEIGHT", 'interval': "SECOND",
+                                                     'intervalNum': 1, 'limit': 10}],
+                                       utilization=1.0)
+        self.assertLess(scheduler.acquire(weight=10), 0.1)
+        # The bucket is empty and refills with 10 tokens per second
+        self.assertGreaterEqual(scheduler.acquire(weight=3), 0.25)
+
+    def test_utilization(self):
+        # Each of 4 fleet workers
+        set_rate_limit_utilization(0.2)
+        try:
+            scheduler = get_rate_limit_scheduler(api_key="test_utilization", exchange="binance.com")
+        finally:
+            set_rate_limit_utilization()
+        self.assertEqual([bucket['capacity'] for bucket in scheduler.buckets], [240.0, 10.0, 32000.0])
+
+
+class TestStartupState(unittest.TestCase):
+    def test_no_order_before_startup_state(self):
+        mock_exchange = BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0, 'tick_size': 0.5}},
+                                            trades_per_second=0)
+        manager = create_mock_exchange_manager(mock_exchange)
+        manager.start_order_worker()
+        manager.process_price_update(price=30000.3)
+        time.sleep(0.2)
+        self.assertIsNone(mock_exchange.statistics['requests'].get("POST /api/v3/order"))
+        self.assertFalse(manager.stop_loss_order_id)
+        self.assertTrue(manager.load_startup_state())
+        deadline = time.time() + 5
+        while not manager.stop_loss_order_id and time.time() < deadline:
+            time.sleep(0.01)
+        manager.stop_manager()
+        self.assertEqual(manager.stop_loss_asset_name, "BTC")
+        self.assertEqual(mock_exchange.statistics['requests'].get("POST /api/v3/order"), 1)
+        open_orders = mock_exchange.process_rest_request(method="GET", path="/api/v3/openOrders", params={})[2]
+        self.assertEqual([(item['orderId'], float(item['price']), float(item['origQty'])) for item in open_orders],
+                         [(manager.stop_loss_order_id, 29700.0, manager.stop_loss_quantity)])
+
+
+class TestStopLossUpdate(unittest.TestCase):
+    def test_min_improvement(self):
+        self.assertEqual(BinanceTrailingStopLossManager.calculate_stop_loss_min_improvement(20000.0, None), 0.0)
+        self.assertAlmostEqual(BinanceTrailingStopLossManager.calculate_stop_loss_min_improvement(20000.0, "0.05%"),
+                               10.0)
+        self.assertAlmostEqual(BinanceTrailingStopLossManager.calculate_stop_loss_min_improvement(20000.0, "5bps"),
+                               10.0)
+        self.assertAlmostEqual(BinanceTrailingStopLossManager.calculate_stop_loss_min_improvement(20000.0, "3ticks",
+                                                                                                  tick_size=0.5),
+                               1.5)
+        self.assertAlmostEqual(BinanceTrailingStopLossManager.calculate_stop_loss_min_improvement(20000.0, "2.5"), 2.5)
+        manager = create_mock_exchange_manager(BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}},
+                                                                   trades_per_second=0),
+                                               stop_loss_update_min_improvement="5bps")
+        manager.stop_loss_price = 20000.0
+        self.assertFalse(manager.is_stop_loss_update_due(20000.0))
+        self.assertFalse(manager.is_stop_loss_update_due(20009.5))
+        self.assertTrue(manager.is_stop_loss_update_due(20010.0))
+
+    def test_update_interval(self):
+        manager = create_mock_exchange_manager(BinanceMockExchange(markets={"BTCUSDT": {'price': 30000.0}},
+                                                                   trades_per_second=0),
+                                               stop_loss_update_interval=10.0)
+        manager.stop_loss_price = 20000.0
+        manager.stop_loss_update_last_timestamp = time.time() - 8.0
+        # Ticks within the interval are coalesced in the mailbox
+        for price in (20300.0, 20500.0, 20400.0):
+            manager.process_price_update(price=price)
+        self.assertEqual(manager.stop_loss_price_pending, 20295.0)
+        self.assertFalse(manager.is_stop_loss_update_due(manager.stop_loss_price_pending))
+        self.assertLessEqual(manager.get_stop_loss_order_request_timeout(), 2.0)
+        manager.stop_loss_update_last_timestamp = time.time() - 10.0
+        self.assertTrue(manager.is_stop_loss_update_due(manager.stop_loss_price_pending))
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestSweep(unittest.TestCase):
+    def test_result_rows(self):
+        data_dir = tempfile.mkdtemp()
+        trades = {"BTCUSDT-aggTrades-2023-11-14.csv": (100.0, 102.0, 104.0, 103.0, 101.5, 101.8, 102.5),
+                  "BTCUSDT-aggTrades-2023-11-15.csv": (90.0, 95.0),
+                  "ETHUSDT-aggTrades-2023-11-14.csv": (10.0, 11.0, 12.0)}
+        for file_name, prices in trades.items():
+            with open(os.path.join(data_dir, file_name), "w") as fh_csv:
+                for index, price in enumerate(prices):
+                    fh_csv.write(f"{index},{price},0.1,{index},{index},{1699920000000 + index * 1000},true\n")
+        sweep = BinanceTrailingStopLossSweep(data_dir=data_dir,
+                                             date_ranges=[("2023-11-14", "2023-11-14"), ("2023-11-15", None)],
+                                             stop_loss_limits=["2", "5"],
+                                             workers=1)
+        results = sweep.run()
+        self.assertEqual([(result['market'], result['date_from'], result['stop_loss_limit']) for result in results],
+                         [("BTCUSDT", "2023-11-14", "2"), ("BTCUSDT", "2023-11-14", "5"),
+                          ("BTCUSDT", "2023-11-15", "2"), ("BTCUSDT", "2023-11-15", "5"),
+                          ("ETHUSDT", "2023-11-14", "2"), ("ETHUSDT", "2023-11-14", "5")])
+        self.assertTrue(all(tuple(result) == SWEEP_RESULT_KEYS for result in results))
+        # Triggered at 101.5 and filled at the limit price 102.0
+        self.assertEqual({key: results[0][key] for key in ('entry_price', 'high_price', 'trigger_price', 'exit_price',
+                                                           'exit_time', 'replacements')},
+                         {'entry_price': 100.0, 'high_price': 104.0, 'trigger_price': 102.01, 'exit_price': 102.0,
+                          'exit_time': 1699920006.0, 'replacements': 2})
+        self.assertAlmostEqual(results[0]['profit_percent'], 2.0)
+        # Not triggered, the position is valued with the last price
+        self.assertIsNone(results[1]['exit_price'])
+        self.assertAlmostEqual(results[1]['profit_percent'], 2.5)
+        self.assertEqual(BinanceTrailingStopLossSweep.get_best_parameters(results)["BTCUSDT"]['stop_loss_limit'], "5")
+        output_file = os.path.join(data_dir, "sweep.csv")
+        self.assertTrue(BinanceTrailingStopLossSweep.save_results(results, output_file))
+        with open(output_file) as fh_csv:
+            self.assertEqual(len(fh_csv.readlines()), len(results) + 1)
+
+
+class TestSymbolQuantizer(unittest.TestCase):
+    def test_quantize(self):
+        quantizer = SymbolQuantizer.from_filters({'PRICE_FILTER': {'tickSize': "0.00000001"},
+                                                  'LOT_SIZE': {'stepSize': "1.00000000", 'minQty': "1.00000000"},
+                                                  'NOTIONAL': {'minNotional': "5.00000000"}})
+        self.assertEqual(quantizer.format_price(0.0000123456), "0.00001234")
+        self.assertEqual(quantizer.format_quantity(123456.9), "123456")
+        self.assertFalse(quantizer.is_order_valid(price=0.00001234, quantity=400000))
+        self.assertTrue(quantizer.is_order_valid(price=0.00001234, quantity=500000))
+        quantizer = SymbolQuantizer(tick_size="0.01000000", step_size="0.00001000")
+        self.assertEqual(quantizer.quantize_price(0.29), 0.29)
+        self.assertEqual(quantizer.format_quantity(0.3), "0.30000")
+        self.assertEqual(BinanceTrailingStopLossManager.calculate_stop_loss_trigger_price(stop_loss_price=0.29,
+                                                                                          trigger_gap="0.01",
+                                                                                          quantizer=quantizer), 0.3)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestTrailingKernel(unittest.TestCase):
+    def test_stop_loss_prices(self):
+        prices = np.round(np.random.default_rng(1).uniform(0.01, 70000.0, 10000), 2)
+        for limit in ("1.5%", "0.3%", "25", "0.07"):
+            expected = [BinanceTrailingStopLossManager.calculate_stop_loss_price(price, limit)
+                        for price in prices.tolist()]
+            self.assertEqual(calculate_stop_loss_prices(prices, limit).tolist(), expected)
+
+    def test_empty_prices(self):
+        result = calculate_trailing_stop_loss([], stop_loss_limit="1%")
+        self.assertEqual(result['stop_loss_prices'].tolist(), [])
+        self.assertIsNone(result['trigger_index'])
+        self.assertIsNone(result['exit_price'])
+        self.assertEqual(result['replacements'], 0)
+
+    def test_equivalence_with_backtest(self):
+        rng = np.random.default_rng(2)
+        for _ in range(200):
+            prices = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.002, int(rng.integers(1, 2000))))), 2).tolist()
+            timestamps = list(range(len(prices)))
+            stop_loss_limit = random.choice(["1%", "0.5%", "2.5%", "0.3", "1.7"])
+            stop_loss_start_limit = random.choice([None, "0.1%", "0.2", "3%"])
+            backtest = BinanceTrailingStopLossBacktest(stop_loss_limit=stop_loss_limit,
+                                                       stop_loss_start_limit=stop_loss_start_limit,
+                                                       vectorized=False)
+            backtest.process_trades(prices=prices, timestamps=timestamps)
+            result = calculate_trailing_stop_loss(prices,
+                                                  stop_loss_limit=stop_loss_limit,
+                                                  stop_loss_start_limit=stop_loss_start_limit)
+            self.assertEqual(result['trigger_index'], backtest.trigger_index)
+            self.assertEqual(result['trigger_price'], backtest.trigger_price)
+            self.assertEqual(result['exit_price'], backtest.exit_price)
+            self.assertEqual(result['replacements'], backtest.replacements)
+            if result['trigger_index'] is None:
+                self.assertEqual(float(result['stop_loss_prices'][-1]), backtest.stop_loss_price)
+
+
 if __name__ == '__main__':
     unittest.main()